@@ -5,9 +5,13 @@ import json
 import subprocess
 import os
 import time
-import re
+import queue
+import threading
+
+from src.common.progresso import EstadoProgresso, LeitorEventos
 
 CONFIG_FILE = 'config.json'
+ARQUIVO_EVENTOS = os.path.join('logs', 'progresso_interface.jsonl')
 
 # Função para carregar a configuração atual
 def carregar_config():
@@ -108,7 +112,6 @@ with st.container(border=True):
     if st.button("Salvar Configurações e Iniciar Extração", type="primary"):
         # Atualiza o dicionário de configuração
         anos_lista = [ano.strip() for ano in anos_texto.split(',') if ano.strip()]
-        meses_lista = meses_para_processar if meses_para_processar is not None else []
 
         config["prefeituras_para_processar"] = cidades_selecionadas
         config["anos_para_processar"] = anos_lista
@@ -123,7 +126,7 @@ with st.container(border=True):
         st.success(f"Configurações salvas no arquivo '{CONFIG_FILE}'!")
         
         # Prepara o comando de execução
-        comando = ["python", "-X", "utf8", "-u", "main.py"]
+        comando = ["python", "-X", "utf8", "-u", "main.py", "--eventos", ARQUIVO_EVENTOS]
         if modo_visual:
             comando.append("--visual")
         
@@ -135,21 +138,17 @@ with st.container(border=True):
         # 1. Prepara todos os placeholders de uma só vez
         st.subheader("Progresso Geral")
         barra_progresso = st.progress(0, text="Aguardando início da extração...")
+        cidades_placeholder = st.empty()
         spinner_placeholder = st.empty()
         st.subheader("Log Detalhado da Execução")
         log_container = st.container(height=400)
         log_placeholder = log_container.empty()
         
-        # 2. Prepara os contadores
-        is_pacatuba_anual = "pacatuba" in cidades_selecionadas and not meses_lista
-        if is_pacatuba_anual:
-            total_de_tarefas = len(anos_lista) * max_workers
-        else:
-            num_meses_por_ano = len(meses_lista) if meses_lista else 12
-            total_de_tarefas = len(cidades_selecionadas) * len(anos_lista) * num_meses_por_ano
-            
-        tarefas_concluidas = 0
-        paginas_concluidas = 0
+        # 2. Prepara o acompanhamento: os eventos de progresso (JSONL) vêm do main.py
+        estado = EstadoProgresso()
+        leitor_eventos = LeitorEventos(ARQUIVO_EVENTOS)
+        if os.path.exists(ARQUIVO_EVENTOS):
+            os.remove(ARQUIVO_EVENTOS)  # Não reaproveita eventos de uma execução anterior
         start_time = time.time()
         
         # 3. Executa o processo e atualiza a UI
@@ -161,40 +160,50 @@ with st.container(border=True):
                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
                         text=True, encoding='utf-8', errors='replace'
                     )
+                    # O log é lido em uma thread própria para que a barra avance mesmo sem novas linhas
+                    fila_log = queue.Queue()
+                    def ler_log():
+                        for linha in iter(processo.stdout.readline, ''):
+                            fila_log.put(linha)
+                    leitor_log = threading.Thread(target=ler_log, daemon=True)
+                    leitor_log.start()
                     
                     log_output = ""
-                    for linha in iter(processo.stdout.readline, ''):
-                        log_output += linha
-                        log_placeholder.code(log_output, language='log')
-                        
-                        # Gatilhos de progresso
-                        if "Extraindo dados da página" in linha:
-                            paginas_concluidas += 1
-                        
-                        gatilho_mensal = "Dados salvos para" in linha or "Nenhum registro de royalties foi extraído" in linha
-                        gatilho_pacatuba_anual = "[PROGRESSO]" in linha
-
-                        if gatilho_mensal or gatilho_pacatuba_anual:
-                            tarefas_concluidas += 1
-                        
-                        # Atualiza a barra de progresso e o texto
-                        progresso_percentual = min(1.0, tarefas_concluidas / total_de_tarefas) if total_de_tarefas > 0 else 0
-                        elapsed_time = time.time() - start_time
-                        texto_progresso = ""
-                        
-                        if tarefas_concluidas > 0:
-                            avg_time_per_task = elapsed_time / tarefas_concluidas
-                            remaining_tasks = total_de_tarefas - tarefas_concluidas
-                            etr_seconds = remaining_tasks * avg_time_per_task
-                            etr_mins, etr_secs = divmod(int(etr_seconds), 60)
-                            etr_formatted = f"{etr_mins}min {etr_secs}s"
-                            texto_progresso = f"Concluído: {tarefas_concluidas}/{total_de_tarefas} ({progresso_percentual:.0%}). Restante: ~{etr_formatted}"
-                        elif paginas_concluidas > 0:
-                            avg_time_per_page = elapsed_time / paginas_concluidas
-                            texto_progresso = f"Processando... ({paginas_concluidas} páginas | Média: {avg_time_per_page:.1f}s por página)"
-
-                        if texto_progresso:
-                            barra_progresso.progress(progresso_percentual, text=texto_progresso)
+                    while True:
+                        terminou = not leitor_log.is_alive()  # O stdout só fecha quando o processo termina
+                        novas_linhas = []
+                        while not fila_log.empty():
+                            novas_linhas.append(fila_log.get_nowait())
+                        if novas_linhas:
+                            log_output += "".join(novas_linhas)
+                            log_placeholder.code(log_output, language='log')
+
+                        for evento in leitor_eventos.novos():
+                            estado.aplicar(evento)
+                        resumo = estado.resumo()
+                        total = resumo.pop("_total")
+                        if resumo:
+                            texto_progresso = f"Concluído: {total['fracao']:.0%}."
+                            if total["eta_s"] is not None:
+                                etr_mins, etr_secs = divmod(int(total["eta_s"]), 60)
+                                texto_progresso += f" Restante: ~{etr_mins}min {etr_secs}s"
+                            barra_progresso.progress(min(1.0, total["fracao"]), text=texto_progresso)
+                            cidades_placeholder.table([
+                                {
+                                    "Cidade": cidade,
+                                    "Tarefas": f"{dados['concluidas']}/{dados['tarefas']}",
+                                    "Páginas": dados["paginas"],
+                                    "Linhas": dados["linhas_processadas"],
+                                    "Royalties": dados["linhas_mantidas"],
+                                    "Linhas/s": dados["linhas_por_s"],
+                                    "Restante": "-" if dados["eta_s"] is None else f"{int(dados['eta_s']) // 60}min {int(dados['eta_s']) % 60}s",
+                                }
+                                for cidade, dados in resumo.items()
+                            ])
+
+                        if terminou and fila_log.empty():
+                            break
+                        time.sleep(0.5)
 
                     processo.wait()
                     
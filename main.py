@@ -1,11 +1,26 @@
 # Em: main.py
 
 
+import os
 import json
 import logging
 import argparse
+from functools import partial
 
+from webdriver_manager.chrome import ChromeDriverManager
+
+from src.common.agendador_global import AgendadorGlobal
+from src.common.armazem import configurar_armazem, fechar_armazem
+from src.common.browser_profile import comparar_perfis
+from src.common.checkpoint import CAMINHO_MANIFESTO_PADRAO, ManifestoCheckpoint
+from src.common.classificacao import reclassificar_ano
+from src.common.concorrencia import configurar_controladores, salvar_estado as salvar_estado_concorrencia
+from src.common.driver_pool import DriverPool
 from src.common.logging_setup import setup_logging
+from src.common.metricas import configurar_metricas, exportar_metricas
+from src.common.perfilador import configurar_perfilador, exportar_perfilador
+from src.common import progresso
+from src.common.retentativas import configurar_politicas, relatar_tempo_dormindo
 # Importa os módulos scraper com seus novos nomes
 from src.scrapers import aracaju_barra_pirambu_scraper, pacatuba_scraper
 
@@ -25,24 +40,214 @@ def main():
         action='store_true',  # Transforma o argumento em um booleano (True se presente)
         help="Executa os navegadores em modo visual (não-headless) para depuração."
     )
+    parser.add_argument(
+        '--comparar-perfis',
+        action='store_true',
+        help="Compara bytes transferidos e tempo de carregamento por cidade entre os perfis 'padrao' e 'enxuto' do navegador, sem extrair dados."
+    )
+    parser.add_argument(
+        '--reiniciar',
+        action='store_true',
+        help="Descarta o checkpoint da execução anterior e extrai tudo novamente."
+    )
+    parser.add_argument(
+        '--reclassificar',
+        action='store_true',
+        help="Refaz a classificação de royalties a partir das capturas brutas (data/raw), sem acessar os portais."
+    )
+    parser.add_argument(
+        '--eventos',
+        help=f"Arquivo JSONL dos eventos de progresso (padrão: chave 'progresso' do config.json ou {progresso.CAMINHO_EVENTOS_PADRAO})."
+    )
     args = parser.parse_args()
     
     # Define o modo headless com base no argumento (True por padrão, False se --visual for passado)
     headless_mode = not args.visual 
     
+    with open('config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
     # Usa o novo nome do logger
-    logger = setup_logging(log_file="logs/main_execution.log")
+    logger = setup_logging(log_file="logs/main_execution.log", config_logging=config.get("logging"))
     logger.info("Iniciando processo de extração unificado.")
 
-   
-    with open('config.json', 'r', encoding='utf-8') as f:
-        config = json.load(f)
     anos = config["anos_para_processar"]
     cidades = config["prefeituras_para_processar"]
     meses = config.get("meses_para_processar", None)
     max_workers = config["configuracoes_paralelismo"]["max_workers"]
-    
-    
+    pre_aquecer = config["configuracoes_paralelismo"].get("pre_aquecer_drivers", max_workers)
+    perfil = config.get("perfil_navegador", "padrao")
+    formato_saida = config.get("formato_saida", "csv")
+    captura_bruta = config.get("captura_bruta", False)
+    for cidade_config in config["configuracoes_cidades"].values():
+        cidade_config.setdefault("perfil_navegador", perfil)
+        cidade_config.setdefault("formato_saida", formato_saida)
+        cidade_config.setdefault("captura_bruta", captura_bruta)
+
+    if args.comparar_perfis:
+        executar_comparacao_perfis(config, cidades, headless_mode)
+        return
+
+    if args.reclassificar:
+        configurar_armazem(config.get("armazem"))
+        try:
+            executar_reclassificacao(config, cidades, anos)
+        finally:
+            fechar_armazem()
+        return
+
+    # Checkpoint: permite retomar uma execução interrompida sem refazer meses, páginas e links já concluídos
+    if args.reiniciar:
+        for caminho in (CAMINHO_MANIFESTO_PADRAO, CAMINHO_MANIFESTO_PADRAO + ".jsonl"):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+        logger.info("Checkpoint anterior descartado (--reiniciar).")
+    manifesto = ManifestoCheckpoint()
+
+    # Concorrência adaptativa: cada portal começa no nível salvo na última execução. O teto do
+    # controlador é o de workers (não o de 'limites_por_portal', que já limita as tarefas do
+    # portal no agendador global), para não prender a Fase 2 anual de Pacatuba em 1 lote por vez
+    configurar_controladores(
+        {modulo.PORTAL: max_workers for modulo in SCRAPER_MODULES.values()},
+        config["configuracoes_paralelismo"].get("concorrencia_adaptativa")
+    )
+    # Retentativas: backoff com jitter, orçamento e disjuntor por portal
+    configurar_politicas(config["configuracoes_paralelismo"].get("retentativas"))
+    # Armazém local (SQLite) que recebe os registros de todas as cidades
+    configurar_armazem(config.get("armazem"))
+    # Histogramas de duração por etapa (inicialização do driver, filtros, páginas, linhas, detalhes)
+    configurar_metricas(config.get("metricas"))
+    # Perfilador de comandos do WebDriver (opcional, desligado por padrão)
+    configurar_perfilador(config.get("perfilador"))
+    # Eventos de progresso (JSONL) consumidos pelo painel (interface.py)
+    progresso.configurar_progresso(args.eventos or config.get("progresso", {}).get("caminho", progresso.CAMINHO_EVENTOS_PADRAO))
+
+    # Pool único de navegadores, compartilhado por todas as cidades, anos e fases
+    driver_path = None
+    try:
+        driver_path = ChromeDriverManager().install()
+        fabricas = _fabricas_pre_aquecimento(config, cidades, driver_path, headless_mode)
+        pool = DriverPool(fabrica=next(iter(fabricas), None), tamanho_maximo=max_workers)
+        if fabricas:
+            # O pré-aquecimento é dividido entre os portais/perfis que vão de fato abrir navegadores
+            for indice, fabrica in enumerate(fabricas):
+                pool.pre_aquecer(pre_aquecer // len(fabricas) + (indice < pre_aquecer % len(fabricas)), fabrica)
+        else:
+            logger.info("Nenhuma cidade usa o navegador como motor principal; o pool não será pré-aquecido.")
+    except Exception as e:
+        logger.error(f"Não foi possível preparar o pool de navegadores ({e}). Cada worker abrirá o seu próprio.")
+        pool = None
+
+    try:
+        if config["configuracoes_paralelismo"].get("agendador_global", True):
+            executar_agendador_global(config, cidades, anos, meses, max_workers, headless_mode, pool, manifesto, driver_path)
+        else:
+            executar_cidades(config, cidades, anos, meses, max_workers, headless_mode, pool, manifesto)
+    finally:
+        salvar_estado_concorrencia()
+        relatar_tempo_dormindo()
+        exportar_metricas()
+        exportar_perfilador()
+        progresso.emitir("execucao_concluida")
+        progresso.fechar_progresso()
+        fechar_armazem()
+        manifesto.compactar()
+        if pool:
+            pool.fechar()
+
+def _fabricas_pre_aquecimento(config: dict, cidades: list, driver_path: str, headless_mode: bool) -> list:
+    """Uma fábrica por combinação de portal e perfil das cidades que usam navegador, na ordem das cidades."""
+    fabricas = {}
+    for cidade_nome in cidades:
+        cidade_config = config["configuracoes_cidades"].get(cidade_nome)
+        scraper_module = SCRAPER_MODULES.get(cidade_config["scraper_module"]) if cidade_config else None
+        if scraper_module is not None and scraper_module.usa_navegador(cidade_config):
+            fabricas.setdefault((scraper_module.PORTAL, cidade_config["perfil_navegador"]),
+                                scraper_module.fabrica_navegador(cidade_config, driver_path, headless_mode))
+    return list(fabricas.values())
+
+def executar_comparacao_perfis(config: dict, cidades: list, headless_mode: bool):
+    """Mede o carregamento da página de cada cidade com os perfis 'padrao' e 'enxuto' e salva o resultado."""
+    logger = logging.getLogger('exdrop_osr')
+    driver_path = ChromeDriverManager().install()
+    urls = {nome: config["configuracoes_cidades"][nome]["url"] for nome in cidades if nome in config["configuracoes_cidades"]}
+    fabricas = {
+        nome_perfil: partial(aracaju_barra_pirambu_scraper.start_driver_aracaju_family, headless=headless_mode,
+                             executable_path=driver_path, perfil=nome_perfil, capturar_rede=True)
+        for nome_perfil in ("padrao", "enxuto")
+    }
+    resultados = comparar_perfis(urls, fabricas)
+
+    caminho_saida = os.path.join("logs", "comparacao_perfis.json")
+    with open(caminho_saida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    logger.info(f"Comparação de perfis salva em: {caminho_saida}")
+
+def executar_reclassificacao(config: dict, cidades: list, anos: list):
+    """Reclassifica as capturas brutas de cada cidade e ano com a lista de termos atual."""
+    logger = logging.getLogger('exdrop_osr')
+    for cidade_nome in cidades:
+        cidade_config = config["configuracoes_cidades"].get(cidade_nome)
+        scraper_module = SCRAPER_MODULES.get(cidade_config["scraper_module"]) if cidade_config else None
+        if scraper_module is None:
+            logger.warning(f"Configuração para a cidade '{cidade_nome}' não encontrada.")
+            continue
+        cidade_config['nome'] = cidade_nome
+        for ano in anos:
+            reclassificar_ano(cidade_nome, ano, scraper_module.termos_royalties(cidade_config), cidade_config["formato_saida"])
+
+def executar_agendador_global(config: dict, cidades: list, anos: list, meses: list, max_workers: int, headless_mode: bool,
+                              pool, manifesto=None, driver_path: str | None = None):
+    """
+    Transforma a configuração inteira em tarefas (cidade, ano, mês) e as executa em um único
+    pool, com limite de navegadores/conexões simultâneos por portal ('limites_por_portal').
+    Uma tarefa que abre vários navegadores (o ano inteiro de Pacatuba) usa no máximo o
+    limite do portal e reserva essa quantidade de vagas no agendador.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    limites_por_portal = config["configuracoes_paralelismo"].get("limites_por_portal") or {}
+    agendador = AgendadorGlobal(max_workers, limites_por_portal)
+    tarefas_por_cidade = []
+    tarefas_planejadas = {}
+    for cidade_nome in cidades:
+        if cidade_nome not in config["configuracoes_cidades"]:
+            logger.warning(f"Configuração para a cidade '{cidade_nome}' não encontrada.")
+            continue
+        cidade_config = config["configuracoes_cidades"][cidade_nome]
+        scraper_module = SCRAPER_MODULES.get(cidade_config["scraper_module"])
+        if scraper_module is None:
+            logger.error(f"Módulo scraper '{cidade_config['scraper_module']}' não encontrado.")
+            continue
+        cidade_config['nome'] = cidade_nome
+
+        workers_da_tarefa = min(max_workers, limites_por_portal.get(scraper_module.PORTAL, max_workers))
+        tarefas, finalizadores = scraper_module.planejar_tarefas(
+            cidade_config, anos, meses, workers_da_tarefa, driver_path, headless_mode, pool=pool, manifesto=manifesto
+        )
+        tarefas_por_cidade.append([(chave, scraper_module.PORTAL, funcao, (cidade_nome, chave[1]), peso) for chave, funcao, peso in tarefas])
+        tarefas_planejadas[cidade_nome] = len(tarefas)
+        for ano, finalizador in finalizadores.items():
+            agendador.ao_concluir_grupo((cidade_nome, ano), finalizador)
+
+    progresso.emitir("execucao_iniciada", modo="global", tarefas=tarefas_planejadas)
+    for chave, portal, funcao, grupo, peso in AgendadorGlobal.intercalar(tarefas_por_cidade):
+        agendador.adicionar(chave, portal, funcao, grupo, peso)
+    agendador.executar()
+
+def _tarefas_planejadas(scraper_module, anos: list, meses: list | None) -> int:
+    """Tarefas que o scraper executará: uma por ano no modo anual de Pacatuba, uma por mês nos demais casos."""
+    if not meses and scraper_module is pacatuba_scraper:
+        return len(anos)
+    return len(anos) * len(meses or range(12))
+
+def executar_cidades(config: dict, cidades: list, anos: list, meses: list, max_workers: int, headless_mode: bool, pool, manifesto=None):
+    """Executa o scraper de cada cidade configurada, em sequência."""
+    logger = logging.getLogger('exdrop_osr')
+    progresso.emitir("execucao_iniciada", modo="sequencial", tarefas={
+        cidade_nome: _tarefas_planejadas(SCRAPER_MODULES[config["configuracoes_cidades"][cidade_nome]["scraper_module"]], anos, meses)
+        for cidade_nome in cidades
+        if config["configuracoes_cidades"].get(cidade_nome, {}).get("scraper_module") in SCRAPER_MODULES
+    })
     for cidade_nome in cidades:
         if cidade_nome in config["configuracoes_cidades"]:
             cidade_config = config["configuracoes_cidades"][cidade_nome]
@@ -57,7 +262,9 @@ def main():
                     anos_para_processar=anos,
                     meses_para_processar=meses,
                     max_workers=max_workers,
-                    headless=headless_mode)
+                    headless=headless_mode,
+                    pool=pool,
+                    manifesto=manifesto)
             else:
                 logger.error(f"Módulo scraper '{scraper_module_name}' não encontrado.")
         else:
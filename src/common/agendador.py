@@ -0,0 +1,119 @@
+# src/common/agendador.py
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from src.common.logging_setup import log_context
+
+
+class AgendadorLotes:
+    """
+    Distribui itens em lotes pequenos por uma fila compartilhada.
+
+    Em vez de dividir os itens em uma fatia fixa por worker, cada worker pega o
+    próximo lote livre assim que termina o anterior, então um worker lento ou com
+    falha não atrasa o trabalho dos outros. Os itens que 'processar_lote' não
+    conseguir concluir voltam para a fila, até 'tentativas' vezes cada um.
+    Com 'limite_dinamico', os workers excedentes ficam parados enquanto o limite
+    (ex.: o do ControladorAIMD do portal) estiver abaixo do número de threads;
+    'notificar_limite' os acorda quando o limite sobe.
+    """
+
+    def __init__(self, itens: Iterable, tamanho_lote: int = 10, tentativas: int = 3, rotulo: str = "Worker",
+                 limite_dinamico: Optional[Callable[[], int]] = None):
+        itens = list(itens)
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.tentativas = tentativas
+        self.rotulo = rotulo
+        self.limite_dinamico = limite_dinamico  # Se informado, limita quantos lotes rodam ao mesmo tempo
+        self._fila = deque(itens[i:i + self.tamanho_lote] for i in range(0, len(itens), self.tamanho_lote))
+        self._tentativas_por_item = {}
+        self._em_andamento = 0
+        self._condicao = threading.Condition()
+        self.total_lotes = len(self._fila)
+        self.lotes_concluidos = 0
+        self.abandonados = []
+        self.vazao_por_worker = {}
+
+    def _proximo_lote(self):
+        with self._condicao:
+            while self._em_andamento and (not self._fila or (self.limite_dinamico and self._em_andamento >= self.limite_dinamico())):
+                self._condicao.wait()
+            if not self._fila:
+                return None
+            self._em_andamento += 1
+            return self._fila.popleft()
+
+    def notificar_limite(self):
+        """Acorda os workers parados para que reavaliem 'limite_dinamico'."""
+        with self._condicao:
+            self._condicao.notify_all()
+
+    def _finalizar_lote(self, lote: list, concluidos: set):
+        logger = logging.getLogger('exdrop_osr')
+        falhas = [item for item in lote if item not in concluidos]
+        with self._condicao:
+            self._em_andamento -= 1
+            self.lotes_concluidos += 1
+            reenfileirar = []
+            for item in falhas:
+                tentativa = self._tentativas_por_item.get(item, 1)
+                if tentativa < self.tentativas:
+                    self._tentativas_por_item[item] = tentativa + 1
+                    reenfileirar.append(item)
+                else:
+                    self.abandonados.append(item)
+            # Cada item com falha volta sozinho, para que um item problemático não derrube os vizinhos
+            self._fila.extend([item] for item in reenfileirar)
+            self.total_lotes += len(reenfileirar)
+            concluidos_agora, total_agora = self.lotes_concluidos, self.total_lotes
+            self._condicao.notify_all()
+
+        if reenfileirar:
+            logger.warning(f"{len(reenfileirar)} item(ns) com falha voltaram para a fila.")
+        logger.info(f"[PROGRESSO] Lote {concluidos_agora} de {total_agora} concluído")
+
+    def executar(self, processar_lote: Callable[[list], Tuple[list, set]], num_workers: int) -> List:
+        """
+        Executa 'processar_lote(lote) -> (resultados, itens_concluidos)' com 'num_workers'
+        threads até a fila esvaziar e retorna todos os resultados.
+        """
+        logger = logging.getLogger('exdrop_osr')
+        resultados = []
+        trava_resultados = threading.Lock()
+        task_id_origem = getattr(log_context, 'task_id', 'Main')
+
+        def trabalhar(indice: int):
+            nome_worker = f"{self.rotulo}-{indice}"
+            log_context.task_id = nome_worker
+            processados, ocupado = 0, 0.0
+            while (lote := self._proximo_lote()) is not None:
+                inicio = time.perf_counter()
+                try:
+                    resultado, concluidos = processar_lote(lote)
+                except Exception as e:
+                    logger.error(f"Falha ao processar um lote de {len(lote)} item(ns): {e}")
+                    resultado, concluidos = [], set()
+                ocupado += time.perf_counter() - inicio
+                processados += len(concluidos)
+                if resultado:
+                    with trava_resultados:
+                        resultados.extend(resultado)
+                self._finalizar_lote(lote, concluidos)
+            self.vazao_por_worker[nome_worker] = (processados, ocupado)
+
+        threads = [threading.Thread(target=trabalhar, args=(i + 1,), daemon=True) for i in range(max(1, num_workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        log_context.task_id = task_id_origem
+        for worker, (processados, ocupado) in sorted(self.vazao_por_worker.items()):
+            logger.info(f"{worker}: {processados} item(ns) em {ocupado:.1f}s ({processados / ocupado if ocupado else 0:.2f} itens/s).")
+        if self.abandonados:
+            logger.error(f"{len(self.abandonados)} item(ns) abandonados após {self.tentativas} tentativas.")
+        return resultados
@@ -0,0 +1,129 @@
+# src/common/agendador_global.py
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+from typing import Callable, Dict, List, Optional
+
+from src.common.concorrencia import obter_controlador
+from src.common.logging_setup import log_context
+
+
+class AgendadorGlobal:
+    """
+    Executa as tarefas (cidade, ano, mês) de todas as cidades em um único pool de threads.
+
+    Em vez de cada cidade esvaziar o próprio pool a cada ano, todas as tarefas
+    entram em uma fila única. Cada tarefa ocupa 'peso' vagas (os navegadores ou
+    conexões que ela usa ao mesmo tempo; 1 por mês) e só é iniciada se houver vagas
+    no total ('max_workers', o tamanho do pool de navegadores) e no limite do portal
+    dela ('limites_por_portal'), para aproveitar a máquina sem sobrecarregar um único
+    servidor e sem que as tarefas disputem mais navegadores do que o pool tem. Uma
+    tarefa mais pesada que o limite só roda com o portal (ou o agendador) ocioso. Se
+    o portal tiver um ControladorAIMD configurado, o limite dele também é respeitado. Quando todas as
+    tarefas de um grupo (cidade, ano) terminam, o callback do grupo é executado
+    (ex.: consolidação dos CSVs mensais).
+    """
+
+    def __init__(self, max_workers: int, limites_por_portal: Optional[Dict[str, int]] = None):
+        self.max_workers = max(1, max_workers)
+        self.limites_por_portal = limites_por_portal or {}
+        self._pendentes = []
+        self._vagas_por_portal = {}
+        self._vagas_ocupadas = 0
+        self._restantes_por_grupo = {}
+        self._ao_concluir_grupo = {}
+        self._ativas = 0
+        self._condicao = threading.Condition()
+
+    def adicionar(self, chave: tuple, portal: str, funcao: Callable, grupo: Optional[tuple] = None, peso: int = 1):
+        """Agenda 'funcao()' identificada por 'chave' (ex.: ('aracaju', '2025', '01')), ocupando 'peso' vagas."""
+        self._pendentes.append({"chave": chave, "portal": portal, "funcao": funcao, "grupo": grupo, "peso": max(1, peso)})
+        if grupo is not None:
+            self._restantes_por_grupo[grupo] = self._restantes_por_grupo.get(grupo, 0) + 1
+
+    def ao_concluir_grupo(self, grupo: tuple, callback: Callable):
+        self._ao_concluir_grupo[grupo] = callback
+
+    @staticmethod
+    def intercalar(listas: List[list]) -> list:
+        """Intercala listas de tarefas (uma por cidade) para que os portais avancem juntos."""
+        vazio = object()
+        return [item for item in chain.from_iterable(zip_longest(*listas, fillvalue=vazio)) if item is not vazio]
+
+    def _limite(self, portal: str) -> int:
+        limite = self.limites_por_portal.get(portal, self.max_workers)
+        if controlador := obter_controlador(portal):
+            limite = min(limite, controlador.limite)
+        return limite
+
+    def _cabe(self, tarefa: dict) -> bool:
+        ocupadas_portal = self._vagas_por_portal.get(tarefa["portal"], 0)
+        cabe_no_portal = ocupadas_portal + tarefa["peso"] <= self._limite(tarefa["portal"]) or not ocupadas_portal
+        cabe_no_total = self._vagas_ocupadas + tarefa["peso"] <= self.max_workers or not self._ativas
+        return cabe_no_portal and cabe_no_total
+
+    def _proxima_elegivel(self):
+        for indice, tarefa in enumerate(self._pendentes):
+            if self._cabe(tarefa):
+                return self._pendentes.pop(indice)
+        return None
+
+    def _executar_tarefa(self, tarefa: dict):
+        logger = logging.getLogger('exdrop_osr')
+        try:
+            tarefa["funcao"]()
+        except Exception as e:
+            log_context.task_id = "-".join(str(parte) for parte in tarefa["chave"] if parte)
+            logger.error(f"A tarefa {tarefa['chave']} falhou: {e}")
+
+        callback = None
+        with self._condicao:
+            grupo = tarefa["grupo"]
+            if grupo is not None:
+                self._restantes_por_grupo[grupo] -= 1
+                if self._restantes_por_grupo[grupo] == 0:
+                    callback = self._ao_concluir_grupo.get(grupo)
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Falha ao finalizar o grupo {grupo}: {e}")
+
+        with self._condicao:
+            self._ativas -= 1
+            self._vagas_ocupadas -= tarefa["peso"]
+            self._vagas_por_portal[tarefa["portal"]] -= tarefa["peso"]
+            self._condicao.notify_all()
+
+    def _notificar_limite(self):
+        with self._condicao:
+            self._condicao.notify_all()
+
+    def executar(self):
+        """Despacha as tarefas respeitando os limites e retorna quando todas terminarem."""
+        logger = logging.getLogger('exdrop_osr')
+        total = len(self._pendentes)
+        logger.info(f"Agendador global: {total} tarefa(s), até {self.max_workers} simultâneas, limites por portal: {self.limites_por_portal or 'nenhum'}.")
+
+        # Se o controlador de um portal subir o limite, o despacho é reavaliado na hora
+        controladores = [c for c in {obter_controlador(tarefa["portal"]) for tarefa in self._pendentes} if c is not None]
+        for controlador in controladores:
+            controlador.observar(self._notificar_limite)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                with self._condicao:
+                    while self._pendentes or self._ativas:
+                        tarefa = self._proxima_elegivel() if self._ativas < self.max_workers else None
+                        if tarefa is None:
+                            self._condicao.wait()
+                            continue
+                        self._ativas += 1
+                        self._vagas_ocupadas += tarefa["peso"]
+                        self._vagas_por_portal[tarefa["portal"]] = self._vagas_por_portal.get(tarefa["portal"], 0) + tarefa["peso"]
+                        executor.submit(self._executar_tarefa, tarefa)
+        finally:
+            for controlador in controladores:
+                controlador.deixar_de_observar(self._notificar_limite)
+        logger.info("Agendador global: todas as tarefas foram concluídas.")
@@ -0,0 +1,220 @@
+# src/common/armazem.py
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+CAMINHO_ARMAZEM_PADRAO = os.path.join("data", "armazem", "pagamentos.sqlite")
+
+# CPF/CNPJ formatado dentro de um texto (Pacatuba não tem coluna própria; o documento pode vir no credor)
+RE_DOCUMENTO = re.compile(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}|\d{3}\.\d{3}\.\d{3}-\d{2}')
+RE_NAO_DIGITO = re.compile(r'\D')
+
+COLUNAS_CONSULTA = ("cidade", "ano", "mes", "data", "empenho", "processo", "credor", "cpf_cnpj",
+                    "fonte_de_recurso", "valor_centavos", "registro")
+
+
+def _centavos(valor: Optional[str]) -> Optional[int]:
+    """'R$ 1.234,56' -> 123456 (None se vazio ou inválido)."""
+    if not valor:
+        return None
+    texto = re.sub(r'[R$\s.]', '', str(valor)).replace(',', '.')
+    try:
+        return round(float(texto) * 100)
+    except ValueError:
+        return None
+
+def _data_iso(valor: Optional[str]) -> Optional[str]:
+    try:
+        return datetime.strptime(str(valor).strip(), "%d/%m/%Y").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+class ArmazemPagamentos:
+    """
+    Armazém local (SQLite) com os pagamentos extraídos de todas as cidades.
+
+    Cada gravação substitui o período extraído (cidade, ano e, se informado, mês):
+    reprocessar um mês apaga as linhas antigas dele e grava as atuais, então não há
+    duplicatas e pagamentos corrigidos ou removidos pelo portal também somem daqui.
+    Não há chave natural: dois pagamentos iguais no mesmo período são mantidos, e
+    linhas sem empenho, data ou valor legíveis ficam com esses campos nulos.
+    Os campos usados em consultas (período, CPF/CNPJ e credor) têm colunas indexadas;
+    o registro original completo fica em JSON.
+    """
+
+    def __init__(self, caminho: str = CAMINHO_ARMAZEM_PADRAO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.row_factory = sqlite3.Row
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._criar_tabela()
+
+    def _criar_tabela(self):
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS pagamentos (
+                cidade TEXT NOT NULL,
+                ano INTEGER NOT NULL,
+                mes INTEGER,
+                empenho TEXT,
+                processo TEXT,
+                data TEXT,
+                valor_centavos INTEGER,
+                credor TEXT COLLATE NOCASE,
+                cpf_cnpj TEXT,
+                fonte_de_recurso TEXT,
+                registro TEXT NOT NULL,
+                atualizado_em REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_pagamentos_periodo ON pagamentos (cidade, ano, mes);
+            CREATE INDEX IF NOT EXISTS idx_pagamentos_cpf_cnpj ON pagamentos (cpf_cnpj);
+            CREATE INDEX IF NOT EXISTS idx_pagamentos_credor ON pagamentos (credor);
+        """)
+        self._conexao.commit()
+
+    @classmethod
+    def da_config(cls, config_armazem: Optional[dict]) -> Optional["ArmazemPagamentos"]:
+        """Cria o armazém a partir da chave 'armazem' do config.json (None se desativado)."""
+        config_armazem = config_armazem or {}
+        if not config_armazem.get("ativo", True):
+            return None
+        return cls(config_armazem.get("caminho", CAMINHO_ARMAZEM_PADRAO))
+
+    @staticmethod
+    def _linha(registro: dict, cidade: str, ano: str, mes: Optional[str], agora: float) -> tuple:
+        """
+        Extrai as colunas indexadas de um registro de qualquer um dos portais. 'ano' e
+        'mes' são os do período extraído; sem mês (modo anual), o mês vem da data.
+        """
+        data_iso = _data_iso(registro.get('data') or registro.get('data_nota'))
+        valor = _centavos(registro.get('pago') or registro.get('valor_pago'))
+        documento = registro.get('cpf_cnpj')
+        if not documento:
+            achado = RE_DOCUMENTO.search(registro.get('credor') or '')
+            documento = achado.group(0) if achado else None
+        return (
+            cidade,
+            int(ano),
+            int(mes) if mes else (int(data_iso[5:7]) if data_iso else None),
+            (registro.get('empenho') or '').strip() or None,
+            (registro.get('processo') or '').strip() or None,
+            data_iso,
+            valor,
+            (registro.get('credor') or '').strip() or None,
+            RE_NAO_DIGITO.sub('', documento) if documento else None,
+            registro.get('fonte_de_recurso') or registro.get('fonte_recurso'),
+            json.dumps(registro, ensure_ascii=False),
+            agora,
+        )
+
+    def gravar(self, registros: List[dict], cidade: str, ano: str, mes: Optional[str] = None) -> int:
+        """
+        Substitui, em uma única transação, as linhas do período (cidade, ano e mês; o ano
+        inteiro se 'mes' for None) pelos registros e retorna quantos foram gravados.
+        Com a lista vazia, o período fica sem linhas.
+        """
+        agora = time.time()
+        linhas = [self._linha(registro, cidade, ano, mes, agora) for registro in registros]
+        periodo = "cidade = ? AND ano = ?" + (" AND mes = ?" if mes else "")
+        with self._lock, self._conexao:
+            self._conexao.execute(f"DELETE FROM pagamentos WHERE {periodo}", [cidade, int(ano)] + ([int(mes)] if mes else []))
+            self._conexao.executemany("""
+                INSERT INTO pagamentos (cidade, ano, mes, empenho, processo, data, valor_centavos, credor,
+                                        cpf_cnpj, fonte_de_recurso, registro, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, linhas)
+        return len(linhas)
+
+    @staticmethod
+    def _filtros(cidade=None, ano=None, mes=None, cpf_cnpj=None, credor=None, fonte_de_recurso=None) -> tuple[str, list]:
+        condicoes, parametros = [], []
+        if cidade:
+            condicoes.append("cidade = ?"); parametros.append(cidade)
+        if ano:
+            condicoes.append("ano = ?"); parametros.append(int(ano))
+        if mes:
+            condicoes.append("mes = ?"); parametros.append(int(mes))
+        if cpf_cnpj:
+            condicoes.append("cpf_cnpj = ?"); parametros.append(RE_NAO_DIGITO.sub('', cpf_cnpj))
+        if credor:  # Prefixo, sem diferenciar maiúsculas (usa o índice NOCASE)
+            condicoes.append("credor LIKE ?"); parametros.append(f"{credor}%")
+        if fonte_de_recurso:  # Trecho em qualquer posição (sem índice: percorre as linhas que os demais filtros deixarem)
+            condicoes.append("fonte_de_recurso LIKE ?"); parametros.append(f"%{fonte_de_recurso}%")
+        return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", parametros
+
+    def consultar(self, limite: Optional[int] = None, **filtros) -> List[dict]:
+        """
+        Retorna os pagamentos que atendem aos filtros (cidade, ano, mes, cpf_cnpj,
+        credor, fonte_de_recurso), com 'valor' em reais (None se ilegível) e o registro original em 'registro'.
+        """
+        onde, parametros = self._filtros(**filtros)
+        sql = f"SELECT {', '.join(COLUNAS_CONSULTA)} FROM pagamentos{onde} ORDER BY data, cidade"
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(int(limite))
+        with self._lock:
+            linhas = self._conexao.execute(sql, parametros).fetchall()
+        resultado = []
+        for linha in linhas:
+            item = dict(linha)
+            centavos = item.pop("valor_centavos")
+            item["valor"] = centavos / 100 if centavos is not None else None
+            item["registro"] = json.loads(item["registro"])
+            resultado.append(item)
+        return resultado
+
+    def total_pago(self, agrupar_por: Optional[str] = None, **filtros):
+        """Soma dos valores pagos (em reais) que atendem aos filtros, opcionalmente por 'cidade', 'ano', 'mes' ou 'credor'."""
+        onde, parametros = self._filtros(**filtros)
+        if agrupar_por:
+            if agrupar_por not in ("cidade", "ano", "mes", "credor", "cpf_cnpj"):
+                raise ValueError(f"Não é possível agrupar por '{agrupar_por}'.")
+            sql = f"SELECT {agrupar_por}, SUM(valor_centavos) FROM pagamentos{onde} GROUP BY {agrupar_por} ORDER BY {agrupar_por}"
+            with self._lock:
+                return {chave: (total or 0) / 100 for chave, total in self._conexao.execute(sql, parametros)}
+        with self._lock:
+            total = self._conexao.execute(f"SELECT SUM(valor_centavos) FROM pagamentos{onde}", parametros).fetchone()[0]
+        return (total or 0) / 100
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+
+_armazem: Optional[ArmazemPagamentos] = None
+
+
+def configurar_armazem(config_armazem: Optional[dict] = None):
+    """Abre o armazém usado por 'registrar_pagamentos' (ou nenhum, se desativado)."""
+    global _armazem
+    _armazem = ArmazemPagamentos.da_config(config_armazem)
+
+def registrar_pagamentos(registros: List[dict], cidade: str, ano: str, mes: Optional[str] = None):
+    """
+    Substitui no armazém configurado o período (cidade, ano, mês) pelos registros,
+    mesmo que a lista esteja vazia; sem armazém, não faz nada.
+    """
+    if _armazem is None:
+        return
+    try:
+        gravados = _armazem.gravar(registros, cidade, ano, mes)
+        logging.getLogger('exdrop_osr').info(f"Armazém: {gravados} registro(s) gravados para {cidade} - {f'{mes}/' if mes else ''}{ano} (período substituído).")
+    except sqlite3.Error as e:
+        logging.getLogger('exdrop_osr').error(f"Falha ao gravar no armazém de pagamentos: {e}")
+
+def fechar_armazem():
+    global _armazem
+    if _armazem is not None:
+        _armazem.fechar()
+        _armazem = None
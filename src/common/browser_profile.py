@@ -0,0 +1,99 @@
+# src/common/browser_profile.py
+
+import json
+import logging
+import time
+
+# Recursos que não são necessários para ler as tabelas dos portais.
+# Os padrões seguem a sintaxe do CDP 'Network.setBlockedURLs' (curinga '*').
+RECURSOS_BLOQUEAVEIS = {
+    "imagens": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp"],
+    "fontes": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*fonts.googleapis.com*", "*fonts.gstatic.com*"],
+    "css": ["*.css", "*.css?*"],
+    "rastreadores": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*facebook.net*", "*hotjar.com*", "*clarity.ms*", "*vlibras.gov.br*",
+    ],
+}
+BLOQUEIO_PADRAO = ["imagens", "fontes", "css", "rastreadores"]
+
+ARGUMENTOS_ENXUTOS = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--no-first-run",
+    "--mute-audio",
+    "--blink-settings=imagesEnabled=false",
+]
+
+def aplicar_perfil_enxuto(options):
+    """Configura as opções do Chrome para o perfil 'enxuto' (sem extensões, rede em segundo plano ou imagens)."""
+    options.page_load_strategy = 'eager'  # Não espera imagens/folhas de estilo para liberar o driver.get()
+    for argumento in ARGUMENTOS_ENXUTOS:
+        options.add_argument(argumento)
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+def ativar_bloqueio_recursos(driver, categorias: list | None = None):
+    """Bloqueia via CDP as URLs de imagens, fontes, CSS e rastreadores no driver já iniciado."""
+    padroes = [padrao for categoria in (categorias or BLOQUEIO_PADRAO) for padrao in RECURSOS_BLOQUEAVEIS[categoria]]
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": padroes})
+
+def medir_carregamento(driver, url: str, seletor_pronto: str = "table") -> dict:
+    """
+    Abre 'url' e mede o tempo até a página estar pronta (elemento 'seletor_pronto'
+    presente) e os bytes transferidos, somados a partir do log de performance
+    do Chrome (o driver precisa ter sido criado com 'capturar_rede=True').
+    """
+    driver.get_log("performance")  # Descarta eventos anteriores
+
+    inicio = time.perf_counter()
+    driver.get(url)
+    while not driver.execute_script("return document.querySelector(arguments[0]) !== null;", seletor_pronto):
+        if time.perf_counter() - inicio > 120:
+            break
+        time.sleep(0.05)
+    tempo_pronto = time.perf_counter() - inicio
+
+    bytes_transferidos = 0
+    requisicoes = 0
+    bloqueadas = 0
+    for entrada in driver.get_log("performance"):
+        mensagem = json.loads(entrada["message"])["message"]
+        if mensagem["method"] == "Network.loadingFinished":
+            bytes_transferidos += mensagem["params"].get("encodedDataLength", 0)
+            requisicoes += 1
+        elif mensagem["method"] == "Network.loadingFailed" and mensagem["params"].get("blockedReason"):
+            bloqueadas += 1
+
+    return {
+        "tempo_pronto_s": round(tempo_pronto, 3),
+        "bytes_transferidos": int(bytes_transferidos),
+        "requisicoes": requisicoes,
+        "requisicoes_bloqueadas": bloqueadas,
+    }
+
+def comparar_perfis(cidades: dict, fabricas: dict, repeticoes: int = 1) -> list:
+    """
+    Mede, para cada cidade, o carregamento da página inicial com cada perfil.
+    'cidades' mapeia nome -> url; 'fabricas' mapeia perfil -> função que cria o driver.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    resultados = []
+    for perfil, fabrica in fabricas.items():
+        driver = fabrica()
+        try:
+            for cidade_nome, url in cidades.items():
+                for _ in range(repeticoes):
+                    medicao = medir_carregamento(driver, url)
+                    medicao.update({"cidade": cidade_nome, "perfil": perfil})
+                    resultados.append(medicao)
+                    logger.info(f"[{perfil}] {cidade_nome}: {medicao['bytes_transferidos'] / 1024:.0f} KiB, "
+                                f"{medicao['requisicoes']} requisições ({medicao['requisicoes_bloqueadas']} bloqueadas), "
+                                f"pronta em {medicao['tempo_pronto_s']:.2f}s")
+        finally:
+            driver.quit()
+    return resultados
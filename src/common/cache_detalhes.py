@@ -0,0 +1,156 @@
+# src/common/cache_detalhes.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import List, Optional
+
+CAMINHO_CACHE_PADRAO = os.path.join("data", "cache", "detalhes_pacatuba.sqlite")
+
+
+class CacheDetalhes:
+    """
+    Cache em disco (SQLite) dos registros já extraídos das páginas de detalhe.
+
+    A chave é a URL do detalhe; o valor é o registro extraído da página (só a fonte
+    de recurso, para links que não são de royalties), nunca o resultado da
+    classificação: quem lê o cache classifica de novo, então mudar os termos de
+    royalties não exige expirar nada. O hash é do registro extraído (não do HTML) e
+    serve para detectar campos alterados quando uma entrada é renovada. Entradas de
+    períodos "fechados" (mais antigos que 'meses_imutavel') nunca expiram; as demais
+    valem por 'ttl_horas'. Quando o cache passa de 'max_entradas', as menos acessadas
+    recentemente são removidas.
+    """
+
+    def __init__(self, caminho: str = CAMINHO_CACHE_PADRAO, ttl_horas: float = 168,
+                 max_entradas: int = 500_000, meses_imutavel: int = 3):
+        self.caminho = caminho
+        self.ttl_segundos = ttl_horas * 3600
+        self.max_entradas = max_entradas
+        self.meses_imutavel = meses_imutavel
+        self.acertos = 0
+        self.faltas = 0
+        self.alterados = 0
+        self._insercoes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS detalhes (
+                url TEXT PRIMARY KEY,
+                registro TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                periodo TEXT NOT NULL,
+                gravado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            )
+        """)
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_detalhes_acessado ON detalhes (acessado_em)")
+        self._conexao.commit()
+
+    @classmethod
+    def da_config(cls, config_cache: Optional[dict]) -> Optional["CacheDetalhes"]:
+        """Cria o cache a partir da chave 'cache_detalhes' da cidade (None se ausente ou desativado)."""
+        if not config_cache or not config_cache.get("ativo", True):
+            return None
+        parametros = {chave: valor for chave, valor in config_cache.items() if chave != "ativo"}
+        return cls(**parametros)
+
+    def _periodo_fechado(self, periodo: str) -> bool:
+        ano, mes = (int(parte) for parte in periodo.split("-"))
+        hoje = date.today()
+        return (hoje.year - ano) * 12 + (hoje.month - mes) >= self.meses_imutavel
+
+    @staticmethod
+    def _hash(registro: dict) -> str:
+        return hashlib.sha256(json.dumps(registro, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def obter(self, url: str) -> Optional[dict]:
+        """Retorna o registro em cache para a URL, ou None se ausente ou expirado."""
+        agora = time.time()
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT registro, periodo, gravado_em FROM detalhes WHERE url = ?", (url,)
+            ).fetchone()
+            if linha is None or (not self._periodo_fechado(linha[1]) and agora - linha[2] > self.ttl_segundos):
+                self.faltas += 1
+                return None
+            self._conexao.execute("UPDATE detalhes SET acessado_em = ? WHERE url = ?", (agora, url))
+            self.acertos += 1
+        return json.loads(linha[0])
+
+    def guardar(self, url: str, registro: dict, ano: str, mes: Optional[str] = None):
+        """
+        Grava o registro extraído de 'url'. O período é o mês informado ou, sem ele,
+        dezembro do ano (no modo anual o ano só é "fechado" depois de terminar).
+        """
+        periodo = f"{int(ano):04d}-{int(mes or 12):02d}"
+        novo_hash = self._hash(registro)
+        agora = time.time()
+        with self._lock:
+            anterior = self._conexao.execute("SELECT hash FROM detalhes WHERE url = ?", (url,)).fetchone()
+            if anterior and anterior[0] != novo_hash:
+                self.alterados += 1
+                logging.getLogger('exdrop_osr').debug(f"Cache: conteúdo do detalhe mudou desde a última extração: {url}")
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO detalhes (url, registro, hash, periodo, gravado_em, acessado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, json.dumps(registro, ensure_ascii=False), novo_hash, periodo, agora, agora),
+            )
+            self._insercoes += 1
+            if self._insercoes % 200 == 0:
+                self._conexao.commit()
+                self._despejar()
+
+    def _despejar(self):
+        """Remove entradas expiradas e, acima do limite de tamanho, as menos acessadas."""
+        limite = time.time() - self.ttl_segundos
+        hoje = date.today()
+        indice_mes = hoje.year * 12 + hoje.month - 1 - self.meses_imutavel
+        periodo_fechado = f"{indice_mes // 12:04d}-{indice_mes % 12 + 1:02d}"
+        self._conexao.execute("DELETE FROM detalhes WHERE gravado_em < ? AND periodo > ?", (limite, periodo_fechado))
+
+        excesso = self._conexao.execute("SELECT COUNT(*) FROM detalhes").fetchone()[0] - self.max_entradas
+        if excesso > 0:
+            self._conexao.execute(
+                "DELETE FROM detalhes WHERE url IN (SELECT url FROM detalhes ORDER BY acessado_em LIMIT ?)", (excesso,)
+            )
+        self._conexao.commit()
+
+    def separar(self, links: List[str]) -> tuple[List[str], dict]:
+        """Divide os links em (pendentes, {link: registro em cache})."""
+        pendentes, em_cache = [], {}
+        for link in links:
+            registro = self.obter(link)
+            if registro is None:
+                pendentes.append(link)
+            else:
+                em_cache[link] = registro
+        return pendentes, em_cache
+
+    def razao_acertos(self) -> float:
+        total = self.acertos + self.faltas
+        return self.acertos / total if total else 0.0
+
+    def relatar(self):
+        logging.getLogger('exdrop_osr').info(
+            f"Cache de detalhes: {self.acertos} acerto(s), {self.faltas} falta(s) "
+            f"(taxa de acerto {self.razao_acertos():.1%}), {self.alterados} entrada(s) com conteúdo alterado."
+        )
+
+    def persistir(self):
+        """Grava as inserções pendentes e aplica a política de despejo."""
+        with self._lock:
+            self._despejar()
+
+    def fechar(self):
+        with self._lock:
+            self._despejar()
+            self._conexao.close()
@@ -0,0 +1,144 @@
+# src/common/checkpoint.py
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+from typing import Any, Optional
+
+CAMINHO_MANIFESTO_PADRAO = os.path.join("data", "checkpoints", "manifesto.json")
+
+
+def periodo_em_aberto(ano: str, mes: Optional[str] = None, hoje: Optional[date] = None) -> bool:
+    """True para o mês atual (ou o ano atual, sem 'mes') e para períodos futuros: o portal ainda pode acrescentar pagamentos."""
+    hoje = hoje or date.today()
+    if mes:
+        return (int(ano), int(mes)) >= (hoje.year, hoje.month)
+    return int(ano) >= hoje.year
+
+
+class ManifestoCheckpoint:
+    """
+    Manifesto de progresso que permite retomar uma execução interrompida.
+
+    As chaves são caminhos como 'aracaju/2025/09', 'aracaju/2025/09/pagina/3' ou
+    'pacatuba/2025/link/<url>'. Cada marcação é anexada a um diário (.jsonl) com
+    fsync, e o diário é periodicamente compactado no manifesto JSON, que é sempre
+    reescrito de forma atômica (arquivo temporário + os.replace). Uma queda no meio
+    da escrita perde no máximo a última linha do diário, que é ignorada na leitura.
+    """
+
+    def __init__(self, caminho: str = CAMINHO_MANIFESTO_PADRAO, intervalo_compactacao: int = 500):
+        self.caminho = caminho
+        self.caminho_diario = caminho + ".jsonl"
+        self.intervalo_compactacao = intervalo_compactacao
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._pendentes = 0
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._carregar()
+
+    @staticmethod
+    def _chave(partes) -> str:
+        return "/".join(str(parte) for parte in partes)
+
+    def _carregar(self):
+        logger = logging.getLogger('exdrop_osr')
+        if os.path.exists(self.caminho):
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                self._entradas = json.load(f)
+
+        if os.path.exists(self.caminho_diario):
+            with open(self.caminho_diario, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        evento = json.loads(linha)
+                    except json.JSONDecodeError:
+                        logger.warning("Checkpoint: linha incompleta no diário ignorada (provável interrupção).")
+                        continue
+                    self._aplicar(evento)
+            self.compactar()
+
+        if self._entradas:
+            logger.info(f"Checkpoint carregado de '{self.caminho}' com {len(self._entradas)} entrada(s).")
+
+    def _aplicar(self, evento: dict):
+        if evento.get("remover"):
+            prefixo = evento["chave"]
+            for chave in [c for c in self._entradas if c == prefixo or c.startswith(prefixo + "/")]:
+                del self._entradas[chave]
+        else:
+            self._entradas[evento["chave"]] = {"dados": evento.get("dados"), "em": evento.get("em")}
+
+    def _registrar(self, evento: dict):
+        with self._lock:
+            self._aplicar(evento)
+            with open(self.caminho_diario, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(evento, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._pendentes += 1
+            if self._pendentes >= self.intervalo_compactacao:
+                self._compactar_sem_lock()
+
+    def _compactar_sem_lock(self):
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self._entradas, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+        # Só depois que o manifesto novo está no lugar o diário pode ser descartado
+        if os.path.exists(self.caminho_diario):
+            os.remove(self.caminho_diario)
+        self._pendentes = 0
+
+    def compactar(self):
+        """Incorpora o diário ao manifesto JSON (escrita atômica)."""
+        with self._lock:
+            self._compactar_sem_lock()
+
+    def marcar(self, *partes, dados: Any = None):
+        """Marca a chave como concluída, guardando 'dados' opcionais (ex.: registros de uma página)."""
+        self._registrar({"chave": self._chave(partes), "dados": dados, "em": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    def remover(self, *partes):
+        """Remove a chave e todas as chaves abaixo dela."""
+        self._registrar({"chave": self._chave(partes), "remover": True})
+
+    def concluir_periodo(self, *periodo, dados: Any = None, pendentes: int = 0, intermediarias: tuple = ()) -> bool:
+        """
+        Marca o período (cidade, ano[, mes]) como concluído e descarta as marcações
+        intermediárias dele (ex.: 'pagina', 'link'). Não marca nada se houver itens
+        'pendentes' (as marcações ficam para a próxima execução retomar só o que faltou)
+        nem se o período ainda estiver em aberto no portal (ver 'periodo_em_aberto'),
+        que é extraído de novo por inteiro na próxima execução. Retorna True se marcou.
+        """
+        logger = logging.getLogger('exdrop_osr')
+        rotulo = self._chave(periodo)
+        if pendentes:
+            logger.warning(f"Checkpoint: {rotulo} ficou com {pendentes} item(ns) pendente(s) e não foi marcado como concluído; "
+                           f"a próxima execução retoma a partir deles.")
+            return False
+        for intermediaria in intermediarias:
+            self.remover(*periodo, intermediaria)
+        if periodo_em_aberto(*periodo[1:3]):
+            logger.info(f"Checkpoint: {rotulo} ainda está em aberto no portal e não foi marcado como concluído.")
+            return False
+        self.marcar(*periodo, dados=dados)
+        return True
+
+    def concluido(self, *partes) -> bool:
+        return self._chave(partes) in self._entradas
+
+    def dados(self, *partes) -> Optional[Any]:
+        entrada = self._entradas.get(self._chave(partes))
+        return entrada["dados"] if entrada else None
+
+    def itens(self, *prefixo) -> dict:
+        """Retorna {sufixo: dados} de todas as chaves logo abaixo do prefixo informado."""
+        base = self._chave(prefixo) + "/"
+        with self._lock:
+            return {chave[len(base):]: entrada["dados"] for chave, entrada in self._entradas.items() if chave.startswith(base)}
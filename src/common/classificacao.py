@@ -0,0 +1,147 @@
+# src/common/classificacao.py
+
+import glob
+import logging
+import os
+import re
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+CAMINHO_BRUTOS_PADRAO = os.path.join("data", "raw")
+
+# Nome da coluna com a fonte de recurso em cada família de portal
+COLUNAS_FONTE = ("fonte_de_recurso", "fonte_recurso")
+TAMANHO_BLOCO_CLASSIFICACAO = 100_000
+
+
+def normalizar_serie(serie: pd.Series) -> pd.Series:
+    """Versão vetorizada de 'normalizar' dos scrapers: sem acentos, sem pontuação e em minúsculas."""
+    return (
+        serie.fillna("").astype(str)
+        .str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+        .str.replace(r"[^a-zA-Z0-9\s]", "", regex=True)
+        .str.lower()
+    )
+
+@lru_cache(maxsize=32)
+def _compilar(termos: tuple) -> re.Pattern:
+    termos_normalizados = normalizar_serie(pd.Series(list(termos), dtype=object))
+    # Uma única alternância; termos mais longos primeiro para o motor de regex parar cedo
+    alternativas = sorted({termo for termo in termos_normalizados if termo}, key=len, reverse=True)
+    return re.compile("|".join(re.escape(termo) for termo in alternativas))
+
+def classificar_serie(fontes: pd.Series, termos: List[str]) -> np.ndarray:
+    """
+    Máscara booleana das fontes de recurso que contêm algum dos termos. A fonte tem
+    poucos valores distintos, então a normalização e a busca rodam só sobre eles.
+    """
+    if not termos:
+        return np.zeros(len(fontes), dtype=bool)
+    codigos, unicos = pd.factorize(fontes)
+    acertos = normalizar_serie(pd.Series(unicos, dtype=object)).str.contains(_compilar(tuple(termos)), regex=True).to_numpy(dtype=bool)
+    return np.where(codigos >= 0, acertos[codigos] if len(acertos) else False, False)
+
+def classificar(df: pd.DataFrame, termos: List[str]) -> np.ndarray:
+    """Retorna uma máscara booleana com as linhas cuja fonte de recurso contém algum dos termos."""
+    coluna = next((nome for nome in COLUNAS_FONTE if nome in df.columns), None)
+    if coluna is None:
+        return np.zeros(len(df), dtype=bool)
+    return classificar_serie(df[coluna], termos)
+
+def filtrar_royalties(registros: List[dict], termos: List[str]) -> List[dict]:
+    """Mantém apenas os registros de royalties (classificação em lote, sem laço por termo)."""
+    if not registros:
+        return []
+    fontes = pd.Series([next((registro[nome] for nome in COLUNAS_FONTE if nome in registro), None) for registro in registros], dtype=object)
+    mascara = classificar_serie(fontes, termos)
+    return [registro for registro, manter in zip(registros, mascara) if manter]
+
+def _caminho_bruto(cidade_nome: str, ano: str, mes: Optional[str] = None, base: str = CAMINHO_BRUTOS_PADRAO) -> str:
+    sufixo = f"{ano}_{mes}" if mes else ano
+    return os.path.join(base, cidade_nome, f"{cidade_nome}_bruto_{sufixo}.csv")
+
+def salvar_brutos(registros: List[dict], cidade_nome: str, ano: str, mes: Optional[str] = None) -> str:
+    """Salva todas as linhas capturadas (royalties ou não) em data/raw/<cidade>/ e retorna o caminho."""
+    caminho = _caminho_bruto(cidade_nome, ano, mes)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    pd.DataFrame(registros).to_csv(caminho, index=False, sep=';', encoding='utf-8-sig')
+    return caminho
+
+def separar_brutos(registros: List[dict], cidade_nome: str, ano: str, mes: Optional[str], termos: List[str]) -> List[dict]:
+    """Modo de captura bruta: guarda todas as linhas e devolve só as de royalties."""
+    logger = logging.getLogger('exdrop_osr')
+    caminho = salvar_brutos(registros, cidade_nome, ano, mes)
+    royalties = filtrar_royalties(registros, termos)
+    logger.info(f"Captura bruta: {len(registros)} linha(s) salvas em {caminho}; {len(royalties)} classificada(s) como royalties.")
+    return royalties
+
+def _salvar_classificados(registros: List[dict], cidade_nome: str, ano: str, mes: Optional[str], formato: str):
+    """
+    Regrava as saídas do período (mês, ou ano no modo anual). Se, com a nova lista de
+    termos, o período não tiver mais royalties, o CSV mensal e a partição Parquet são
+    apagados; o período no armazém é sempre substituído (esvaziado, se for o caso).
+    """
+    from src.common.armazem import registrar_pagamentos
+    from src.common.file_utils import salvar_registros_mes
+    from src.common.parquet_utils import remover_parquet, salvar_parquet
+
+    if mes:
+        if registros:
+            salvar_registros_mes(registros, cidade_nome, ano, mes, formato)
+        else:
+            if os.path.exists(antigo := os.path.join("data", "processed", cidade_nome, f"{cidade_nome}_royalties_{ano}_{mes}.csv")):
+                os.remove(antigo)
+            remover_parquet(cidade_nome, ano, mes)
+    else:
+        if formato in ('csv', 'ambos'):
+            caminho = os.path.join("data", "processed", cidade_nome, f"{cidade_nome}_royalties_{ano}.csv")
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            pd.DataFrame(registros).to_csv(caminho, index=False, sep=';', encoding='utf-8-sig')
+        if formato in ('parquet', 'ambos') and registros:
+            salvar_parquet(registros, cidade_nome, ano)  # Regrava o ano inteiro: meses que ficaram vazios somem
+        elif not registros:
+            remover_parquet(cidade_nome, ano)
+    registrar_pagamentos(registros, cidade_nome, ano, mes)
+
+def reclassificar_ano(cidade_nome: str, ano: str, termos: List[str], formato: str = 'csv') -> int:
+    """
+    Refaz a classificação de royalties a partir das linhas brutas já salvas, sem
+    acessar o portal, e regrava as saídas do ano. Retorna o total de royalties.
+    """
+    from src.common.file_utils import unir_csvs_por_ano
+
+    logger = logging.getLogger('exdrop_osr')
+    pasta = os.path.join(CAMINHO_BRUTOS_PADRAO, cidade_nome)
+    arquivos = sorted(glob.glob(os.path.join(pasta, f"{cidade_nome}_bruto_{ano}_??.csv")))
+    arquivos += glob.glob(os.path.join(pasta, f"{cidade_nome}_bruto_{ano}.csv"))
+    if not arquivos:
+        logger.warning(f"Reclassificação: nenhuma captura bruta encontrada para {cidade_nome} em {ano}.")
+        return 0
+
+    inicio = time.perf_counter()
+    total_linhas, total_royalties, mensal = 0, 0, False
+    for arquivo in arquivos:
+        sufixo = os.path.basename(arquivo)[:-len(".csv")].split(f"_bruto_{ano}", 1)[1]
+        mes = sufixo.lstrip("_") or None
+        mensal = mensal or mes is not None
+        partes = []
+        try:
+            for bloco in pd.read_csv(arquivo, sep=';', engine='c', dtype=str, keep_default_na=False,
+                                     encoding='utf-8-sig', chunksize=TAMANHO_BLOCO_CLASSIFICACAO):
+                total_linhas += len(bloco)
+                partes.append(bloco[classificar(bloco, termos)])
+        except pd.errors.EmptyDataError:
+            pass
+        registros = pd.concat(partes, ignore_index=True).to_dict('records') if partes else []
+        total_royalties += len(registros)
+        _salvar_classificados(registros, cidade_nome, ano, mes, formato)
+
+    if mensal and formato in ('csv', 'ambos'):
+        unir_csvs_por_ano(cidade_nome=cidade_nome, ano=ano)
+    logger.info(f"Reclassificação de {cidade_nome} - {ano}: {total_royalties} de {total_linhas} linha(s) são de royalties "
+                f"({len(arquivos)} arquivo(s) em {time.perf_counter() - inicio:.1f}s).")
+    return total_royalties
@@ -0,0 +1,155 @@
+# src/common/concorrencia.py
+
+import json
+import logging
+import os
+import statistics
+import threading
+from typing import Callable, Dict, Optional
+
+CAMINHO_ESTADO_PADRAO = os.path.join("data", "estado", "concorrencia.json")
+
+
+class ControladorAIMD:
+    """
+    Ajusta o número de workers ativos de um portal conforme a reação do servidor
+    (aumento aditivo, redução multiplicativa).
+
+    A cada 'janela' observações, se a taxa de timeouts ou de retentativas passar do
+    limite, ou se a latência mediana passar de 'latencia_alvo', o limite é
+    multiplicado por 'fator_reducao'; caso contrário, cresce em 1 até 'maximo'.
+    Quem espera por vaga (ex.: AgendadorLotes) pode se registrar com 'observar'
+    para ser avisado quando o limite mudar.
+    """
+
+    def __init__(self, portal: str, inicial: int, minimo: int = 1, maximo: int = 8, latencia_alvo: float = 15.0,
+                 janela: int = 10, fator_reducao: float = 0.5, taxa_falhas_maxima: float = 0.1):
+        self.portal = portal
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.latencia_alvo = latencia_alvo
+        self.janela = janela
+        self.fator_reducao = fator_reducao
+        self.taxa_falhas_maxima = taxa_falhas_maxima
+        self._limite = min(self.maximo, max(self.minimo, inicial))
+        self._latencias = []
+        self._timeouts = 0
+        self._retentativas = 0
+        self._observadores = []
+        self._trava = threading.Lock()
+
+    @property
+    def limite(self) -> int:
+        return self._limite
+
+    def observar(self, callback: Callable[[], None]):
+        """Registra 'callback()', chamado (fora da trava) sempre que o limite mudar."""
+        with self._trava:
+            self._observadores.append(callback)
+
+    def deixar_de_observar(self, callback: Callable[[], None]):
+        with self._trava:
+            if callback in self._observadores:
+                self._observadores.remove(callback)
+
+    def registrar_latencia(self, segundos: float):
+        with self._trava:
+            self._latencias.append(segundos)
+            mudou = self._avaliar()
+        self._notificar(mudou)
+
+    def registrar_timeout(self):
+        with self._trava:
+            self._timeouts += 1
+            mudou = self._avaliar()
+        self._notificar(mudou)
+
+    def registrar_retentativa(self):
+        with self._trava:
+            self._retentativas += 1
+            mudou = self._avaliar()
+        self._notificar(mudou)
+
+    def _notificar(self, mudou: bool):
+        if not mudou:
+            return
+        with self._trava:
+            observadores = list(self._observadores)
+        for callback in observadores:
+            callback()
+
+    def _avaliar(self) -> bool:
+        """Fecha a janela, se estiver completa, e retorna True se o limite mudou."""
+        observacoes = len(self._latencias) + self._timeouts
+        if observacoes < self.janela:
+            return False
+        taxa_timeouts = self._timeouts / observacoes
+        taxa_retentativas = self._retentativas / observacoes
+        latencia_mediana = statistics.median(self._latencias) if self._latencias else 0.0
+
+        anterior = self._limite
+        if (taxa_timeouts > self.taxa_falhas_maxima or taxa_retentativas > self.taxa_falhas_maxima
+                or latencia_mediana > self.latencia_alvo):
+            self._limite = max(self.minimo, int(self._limite * self.fator_reducao))
+        else:
+            self._limite = min(self.maximo, self._limite + 1)
+
+        if self._limite != anterior:
+            logging.getLogger('exdrop_osr').info(
+                f"Concorrência de '{self.portal}': {anterior} -> {self._limite} workers "
+                f"(latência mediana {latencia_mediana:.1f}s, timeouts {taxa_timeouts:.0%}, retentativas {taxa_retentativas:.0%})."
+            )
+        self._latencias, self._timeouts, self._retentativas = [], 0, 0
+        return self._limite != anterior
+
+
+_controladores: Dict[str, ControladorAIMD] = {}
+
+
+def configurar_controladores(maximos_por_portal: Dict[str, int], config_adaptativa: Optional[dict] = None,
+                             caminho_estado: str = CAMINHO_ESTADO_PADRAO):
+    """
+    Cria um controlador por portal. O teto é 'maximo' da configuração adaptativa,
+    se houver, ou o de 'maximos_por_portal'. O nível inicial é o salvo na execução
+    anterior (em 'caminho_estado') ou, sem histórico, o teto.
+    """
+    config_adaptativa = dict(config_adaptativa or {})
+    if not config_adaptativa.pop("ativo", True):
+        return
+    maximo_configurado = config_adaptativa.pop("maximo", None)
+    estado = {}
+    if os.path.exists(caminho_estado):
+        with open(caminho_estado, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+
+    logger = logging.getLogger('exdrop_osr')
+    for portal, maximo in maximos_por_portal.items():
+        maximo = maximo_configurado or maximo
+        inicial = estado.get(portal, maximo)
+        _controladores[portal] = ControladorAIMD(portal, inicial=inicial, maximo=maximo, **config_adaptativa)
+        logger.info(f"Concorrência adaptativa de '{portal}': começando com {_controladores[portal].limite} de até {maximo} workers.")
+
+def obter_controlador(portal: str) -> Optional[ControladorAIMD]:
+    return _controladores.get(portal)
+
+def registrar_latencia(portal: str, segundos: float):
+    if controlador := _controladores.get(portal):
+        controlador.registrar_latencia(segundos)
+
+def registrar_timeout(portal: str):
+    if controlador := _controladores.get(portal):
+        controlador.registrar_timeout()
+
+def registrar_retentativa(portal: str):
+    if controlador := _controladores.get(portal):
+        controlador.registrar_retentativa()
+
+def salvar_estado(caminho_estado: str = CAMINHO_ESTADO_PADRAO):
+    """Grava o nível final de cada portal, usado como ponto de partida na próxima execução."""
+    if not _controladores:
+        return
+    os.makedirs(os.path.dirname(caminho_estado) or ".", exist_ok=True)
+    temporario = f"{caminho_estado}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({portal: controlador.limite for portal, controlador in _controladores.items()}, f, indent=2)
+    os.replace(temporario, caminho_estado)
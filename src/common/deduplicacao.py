@@ -0,0 +1,102 @@
+# src/common/deduplicacao.py
+
+import hashlib
+import logging
+from collections import deque
+from typing import Iterable, List, Optional, Union
+
+import pandas as pd
+
+# Campos que identificam um pagamento. Em Pacatuba o link do detalhe já é único;
+# nos portais municipioonline, as colunas da tabela mais os campos do detalhe, já que
+# um mesmo empenho pode ter linhas que só diferem na fonte de recurso ou no histórico.
+CAMPO_LINK = "link_detalhe"
+CAMPOS_IDENTIFICADORES = ("orgao", "unidade", "data", "empenho", "processo", "credor",
+                          "cpf_cnpj", "pago", "retido", "anulacao",
+                          "fonte_de_recurso", "elemento_de_despesa", "historico")
+# Cada hash guardado custa cerca de 75 bytes (o objeto, a vaga no set e a na fila de
+# expiração), então o padrão limita o índice a ~40 MB
+MAX_ENTRADAS_PADRAO = 500_000
+
+
+def _normalizar_valor(valor) -> str:
+    return "" if valor is None or (isinstance(valor, float) and valor != valor) else str(valor).strip()
+
+def campos_identificadores(colunas: Iterable[str]) -> List[str]:
+    """Campos usados na chave, conforme as colunas disponíveis (todas, se nenhuma for conhecida)."""
+    colunas = list(colunas)
+    if CAMPO_LINK in colunas:
+        return [CAMPO_LINK]
+    conhecidos = [campo for campo in CAMPOS_IDENTIFICADORES if campo in colunas]
+    return conhecidos or colunas
+
+
+class IndiceDeduplicacao:
+    """
+    Índice em fluxo que descarta registros repetidos.
+
+    Guarda apenas um hash de 8 bytes de cada registro (ou link), calculado sobre os
+    campos identificadores, e no máximo 'max_entradas' hashes: acima disso, os
+    mais antigos são esquecidos. Com as estruturas do Python, cada hash ocupa cerca
+    de 75 bytes (MAX_ENTRADAS_PADRAO). Como o índice é criado por mês (scrapers) ou
+    por ano (consolidação), a memória não cresce com o número de anos processados.
+    """
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS_PADRAO, rotulo: str = ""):
+        self.max_entradas = max_entradas
+        self.rotulo = rotulo
+        self.descartados = 0
+        self._vistos = set()
+        self._ordem = deque()
+
+    @staticmethod
+    def _hash(texto: str) -> bytes:
+        return hashlib.blake2b(texto.encode("utf-8"), digest_size=8).digest()
+
+    def _chave(self, item: Union[dict, str]) -> bytes:
+        if isinstance(item, str):
+            return self._hash(item)
+        campos = campos_identificadores(item.keys())
+        return self._hash("\x1f".join(_normalizar_valor(item.get(campo)) for campo in campos))
+
+    def _adicionar(self, chave) -> bool:
+        if chave in self._vistos:
+            self.descartados += 1
+            return False
+        self._vistos.add(chave)
+        self._ordem.append(chave)
+        if len(self._ordem) > self.max_entradas:
+            self._vistos.discard(self._ordem.popleft())
+        return True
+
+    def registrar(self, item: Union[dict, str]) -> bool:
+        """Registra o item e retorna True se ele ainda não tinha sido visto."""
+        return self._adicionar(self._chave(item))
+
+    def filtrar(self, itens: List[Union[dict, str]]) -> list:
+        """Retorna só os itens inéditos, na ordem original."""
+        return [item for item in itens if self.registrar(item)]
+
+    @staticmethod
+    def _hashes_df(df: pd.DataFrame, campos: Optional[List[str]] = None):
+        campos = campos or campos_identificadores(df.columns)
+        normalizados = df[campos].fillna("").astype(str).apply(lambda coluna: coluna.str.strip())
+        return pd.util.hash_pandas_object(normalizados, index=False).to_numpy()
+
+    def filtrar_df(self, df: pd.DataFrame, campos: Optional[List[str]] = None) -> pd.DataFrame:
+        """Versão vetorizada para blocos de um CSV: o hash é calculado pelo pandas para o bloco inteiro."""
+        mascara = [self._adicionar(int(valor)) for valor in self._hashes_df(df, campos)]
+        return df[mascara]
+
+    def semear_df(self, df: pd.DataFrame, campos: Optional[List[str]] = None):
+        """Registra registros já gravados (ex.: meses copiados na consolidação) sem contá-los como descartados."""
+        descartados = self.descartados
+        for valor in self._hashes_df(df, campos):
+            self._adicionar(int(valor))
+        self.descartados = descartados
+
+    def relatar(self):
+        if self.descartados:
+            logging.getLogger('exdrop_osr').info(
+                f"Deduplicação{f' ({self.rotulo})' if self.rotulo else ''}: {self.descartados} registro(s) duplicado(s) descartado(s)."
+            )
@@ -0,0 +1,244 @@
+# src/common/driver_pool.py
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Optional
+
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchWindowException, WebDriverException
+
+# Trechos da mensagem do ChromeDriver quando o navegador (e não só um comando) se perdeu
+MENSAGENS_SESSAO_PERDIDA = ("invalid session id", "session deleted", "chrome not reachable", "disconnected",
+                            "no such window", "target window already closed", "tab crashed")
+
+
+class DriverPool:
+    """
+    Pool de sessões do Chrome compartilhado entre meses, cidades e fases.
+
+    Em vez de cada worker abrir e fechar o próprio navegador, os drivers são
+    emprestados ('emprestar') e devolvidos ('devolver'). Entre um empréstimo e
+    outro o estado do navegador é limpo (cookies, storage, iframe, janelas extras
+    e navegação). O número de navegadores vivos nunca passa de 'tamanho_maximo'.
+
+    Cada empréstimo pode informar a 'fabrica' do worker (portal e perfil do
+    navegador); os ociosos ficam separados por fábrica, e só um navegador criado
+    pela mesma fábrica é reaproveitado. Sem vaga livre, um ocioso de outra fábrica
+    é encerrado para abrir o pedido. Sem 'fabrica', vale a informada ao criar o pool.
+    """
+
+    def __init__(self, fabrica: Optional[Callable], tamanho_maximo: int, usos_por_driver: int = 200):
+        self._fabrica = fabrica
+        self.tamanho_maximo = tamanho_maximo
+        self.usos_por_driver = usos_por_driver  # Recicla o navegador depois de N empréstimos
+        self._ociosos = {}  # chave da fábrica -> navegadores ociosos criados por ela
+        self._fabricas = {}  # id(driver) -> chave da fábrica que o criou
+        self._usos = {}
+        self._vivos = 0
+        self._fechado = False
+        self._condicao = threading.Condition()
+        self.drivers_criados = 0
+        self.emprestimos = 0
+
+    @staticmethod
+    def _chave(fabrica: Callable):
+        """Fábricas 'partial' com a mesma função e os mesmos argumentos criam navegadores equivalentes."""
+        if isinstance(fabrica, partial):
+            return (fabrica.func, fabrica.args, tuple(sorted(fabrica.keywords.items())))
+        return fabrica
+
+    def pre_aquecer(self, quantidade: int, fabrica: Optional[Callable] = None):
+        """Inicia 'quantidade' navegadores em paralelo com 'fabrica' e os deixa ociosos no pool."""
+        logger = logging.getLogger('exdrop_osr')
+        fabrica = fabrica or self._fabrica
+        if fabrica is None:
+            return
+        with self._condicao:
+            quantidade = min(quantidade, self.tamanho_maximo - self._vivos)
+            self._vivos += quantidade
+        if quantidade <= 0:
+            return
+
+        logger.info(f"Pré-aquecendo {quantidade} navegador(es) do pool...")
+        with ThreadPoolExecutor(max_workers=quantidade) as executor:
+            futures = [executor.submit(self._criar_driver, fabrica) for _ in range(quantidade)]
+        for future in futures:
+            with self._condicao:
+                try:
+                    self._ociosos.setdefault(self._chave(fabrica), []).append(future.result())
+                except Exception as e:
+                    logger.error(f"Falha ao pré-aquecer navegador: {e}")
+                    self._vivos -= 1
+                self._condicao.notify()
+
+    def _criar_driver(self, fabrica: Callable):
+        driver = fabrica()
+        with self._condicao:
+            self._usos[id(driver)] = 0
+            self._fabricas[id(driver)] = self._chave(fabrica)
+            self.drivers_criados += 1
+        return driver
+
+    def _ocioso_de_outra_fabrica(self, chave):
+        """Retira (com a trava) um ocioso criado por outra fábrica, para liberar a vaga dele."""
+        for outra, ociosos in self._ociosos.items():
+            if outra != chave and ociosos:
+                driver = ociosos.pop()
+                self._usos.pop(id(driver), None)
+                self._fabricas.pop(id(driver), None)
+                return driver
+        return None
+
+    def emprestar(self, timeout: Optional[float] = None, fabrica: Optional[Callable] = None):
+        """
+        Retorna um driver ocioso da mesma fábrica, cria um novo se houver vaga (ou
+        trocando um ocioso de outra fábrica) ou espera uma devolução.
+        """
+        fabrica = fabrica or self._fabrica
+        if fabrica is None:
+            raise ValueError("O pool não tem fábrica padrão; informe a fábrica do navegador.")
+        chave = self._chave(fabrica)
+        substituido = None
+        with self._condicao:
+            while True:
+                if self._fechado:
+                    raise RuntimeError("O pool de drivers já foi fechado.")
+                if self._ociosos.get(chave):
+                    driver = self._ociosos[chave].pop()
+                    break
+                if self._vivos < self.tamanho_maximo:
+                    self._vivos += 1
+                    driver = None
+                    break
+                substituido = self._ocioso_de_outra_fabrica(chave)
+                if substituido is not None:
+                    driver = None  # A vaga do ocioso encerrado passa para o novo navegador
+                    break
+                if not self._condicao.wait(timeout):
+                    raise TimeoutError(f"Nenhum navegador livre no pool após {timeout}s.")
+
+        if substituido is not None:
+            self._encerrar(substituido)
+        if driver is None:
+            try:
+                driver = self._criar_driver(fabrica)
+            except Exception:
+                with self._condicao:
+                    self._vivos -= 1
+                    self._condicao.notify()
+                raise
+
+        with self._condicao:
+            self._usos[id(driver)] += 1
+            self.emprestimos += 1
+        return driver
+
+    def devolver(self, driver, descartar: bool = False):
+        """Limpa o estado do driver e o devolve ao pool (ou o encerra, se estiver quebrado)."""
+        with self._condicao:
+            usos = self._usos.get(id(driver), 0)
+        if not descartar and usos < self.usos_por_driver:
+            descartar = not self._resetar(driver)
+        else:
+            descartar = True
+
+        if descartar:
+            self._encerrar(driver)
+
+        with self._condicao:
+            if descartar or self._fechado:
+                self._vivos -= 1
+                self._usos.pop(id(driver), None)
+                self._fabricas.pop(id(driver), None)
+            else:
+                self._ociosos.setdefault(self._fabricas.get(id(driver)), []).append(driver)
+            self._condicao.notify()
+
+        if self._fechado and not descartar:
+            self._encerrar(driver)
+
+    @staticmethod
+    def _sessao_perdida(erro: WebDriverException) -> bool:
+        """Timeouts e elementos ausentes não dizem nada sobre o navegador; só a sessão perdida o inutiliza."""
+        if isinstance(erro, (InvalidSessionIdException, NoSuchWindowException)):
+            return True
+        mensagem = (getattr(erro, "msg", None) or str(erro)).lower()
+        return any(trecho in mensagem for trecho in MENSAGENS_SESSAO_PERDIDA)
+
+    @contextmanager
+    def sessao(self, fabrica: Optional[Callable] = None):
+        """
+        Empresta um driver durante o bloco 'with'. Drivers com a sessão perdida são
+        descartados; depois de outros erros, o driver volta ao pool se a limpeza funcionar.
+        """
+        driver = self.emprestar(fabrica=fabrica)
+        descartar = False
+        try:
+            yield driver
+        except WebDriverException as e:
+            descartar = self._sessao_perdida(e)
+            raise
+        finally:
+            self.devolver(driver, descartar=descartar)
+
+    def _resetar(self, driver) -> bool:
+        logger = logging.getLogger('exdrop_osr')
+        try:
+            # Fecha janelas extras e volta ao documento principal (sai de iframes)
+            for handle in driver.window_handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(driver.window_handles[0])
+            driver.switch_to.default_content()
+
+            driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+            try:
+                # Limpa os cookies de todos os domínios, não só o da página atual
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            except Exception:
+                driver.delete_all_cookies()
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logger.warning(f"Falha ao limpar o navegador para reutilização, descartando-o: {e}")
+            return False
+
+    def _encerrar(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def fechar(self):
+        """Encerra todos os navegadores ociosos. Os emprestados são encerrados ao serem devolvidos."""
+        logger = logging.getLogger('exdrop_osr')
+        with self._condicao:
+            self._fechado = True
+            ociosos = [driver for lista in self._ociosos.values() for driver in lista]
+            self._ociosos = {}
+            self._vivos -= len(ociosos)
+            self._condicao.notify_all()
+        for driver in ociosos:
+            self._encerrar(driver)
+        logger.info(f"Pool de drivers fechado: {self.drivers_criados} navegador(es) criados para {self.emprestimos} empréstimo(s).")
+
+
+@contextmanager
+def obter_driver(pool: Optional[DriverPool], fabrica: Callable):
+    """
+    Empresta um driver criado por 'fabrica' do pool, se houver; senão cria um
+    navegador exclusivo com 'fabrica' e o encerra ao final (comportamento original
+    dos workers). A fábrica define o portal e o perfil do navegador.
+    """
+    if pool is not None:
+        with pool.sessao(fabrica) as driver:
+            yield driver
+        return
+
+    driver = fabrica()
+    try:
+        yield driver
+    finally:
+        driver.quit()
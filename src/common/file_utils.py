@@ -2,14 +2,125 @@
 
 import os
 import glob
+import json
+import codecs
 import logging
 import pandas as pd
-import csv # Importe o csv caso queira usar a Solução 2 no futuro
+import csv
+from typing import Optional
+
+from src.common.deduplicacao import IndiceDeduplicacao, campos_identificadores
+
+TAMANHO_BLOCO_CSV = 50_000  # Linhas lidas por vez ao consolidar
+TAMANHO_BLOCO_COPIA = 1 << 20  # Bytes copiados por vez ao reaproveitar um mês já consolidado
+
+def _ler_cabecalho(arquivo: str) -> tuple[str, list]:
+    """Lê só a primeira linha do CSV e retorna (separador, colunas)."""
+    with open(arquivo, 'r', encoding='utf-8-sig', newline='') as f:
+        linha = f.readline()
+    separador = ';' if linha.count(';') >= linha.count(',') else ','  # Arquivos antigos podem usar ','
+    return separador, next(csv.reader([linha], delimiter=separador), [])
+
+def _assinatura(arquivo: str) -> list:
+    info = os.stat(arquivo)
+    return [info.st_size, info.st_mtime_ns]
+
+def _carregar_estado_consolidacao(caminho_estado: str) -> Optional[dict]:
+    try:
+        with open(caminho_estado, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def _salvar_estado_consolidacao(caminho_estado: str, estado: dict):
+    temporario = f"{caminho_estado}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=2)
+    os.replace(temporario, caminho_estado)
+
+def _anexar_mes(arquivo: str, separador: str, colunas: list, destino, indice: IndiceDeduplicacao) -> tuple[int, int, int]:
+    """
+    Lê o CSV mensal em blocos (engine C, tudo como texto) e o escreve em 'destino'
+    (aberto em modo binário) no esquema consolidado, sem as linhas repetidas
+    segundo 'indice' (chave calculada já no esquema consolidado, a mesma dos meses
+    copiados). Retorna (início, fim, linhas).
+    Em caso de erro, o que já foi escrito deste mês é descartado.
+    """
+    inicio, linhas = destino.tell(), 0
+    blocos = pd.read_csv(
+        arquivo, sep=separador, engine='c', dtype=str, keep_default_na=False,
+        encoding='utf-8-sig', chunksize=TAMANHO_BLOCO_CSV, on_bad_lines='warn'
+    )
+    try:
+        for bloco in blocos:
+            bloco = indice.filtrar_df(bloco.reindex(columns=colunas, fill_value=''), campos_identificadores(colunas))
+            destino.write(bloco.to_csv(sep=';', index=False, header=False, lineterminator='\n').encode('utf-8'))
+            linhas += len(bloco)
+    except Exception:
+        destino.seek(inicio)
+        destino.truncate()  # Descarta o mês pela metade
+        raise
+    return inicio, destino.tell(), linhas
+
+class _Trecho:
+    """Arquivo somente leitura restrito aos bytes [inicio, fim) de 'origem', para o pandas ler um mês copiado."""
+
+    def __init__(self, origem, inicio: int, fim: int):
+        self._origem = origem
+        self._posicao, self._fim = inicio, fim
+
+    def read(self, tamanho: int = -1) -> bytes:
+        restante = self._fim - self._posicao
+        tamanho = restante if tamanho is None or tamanho < 0 else min(tamanho, restante)
+        self._origem.seek(self._posicao)
+        dados = self._origem.read(tamanho)
+        self._posicao += len(dados)
+        return dados
+
+    def __iter__(self):
+        return iter(self.read().splitlines(keepends=True))
+
+def _semear_indice(caminho: str, intervalos: list, colunas: list, indice: IndiceDeduplicacao):
+    """
+    Registra no índice as linhas dos meses reaproveitados do consolidado anterior,
+    lendo só os campos identificadores, para que um mês relido não repita registros deles.
+    """
+    campos = campos_identificadores(colunas)
+    with open(caminho, 'rb') as origem:
+        for inicio, fim in intervalos:
+            if fim <= inicio:
+                continue
+            blocos = pd.read_csv(
+                _Trecho(origem, inicio, fim), sep=';', engine='c', header=None, names=colunas, usecols=campos,
+                dtype=str, keep_default_na=False, encoding='utf-8', chunksize=TAMANHO_BLOCO_CSV
+            )
+            for bloco in blocos:
+                indice.semear_df(bloco, campos)
+
+def _copiar_intervalo(origem, inicio: int, fim: int, destino) -> int:
+    """Copia os bytes [inicio, fim) do consolidado anterior sem reprocessar o CSV."""
+    novo_inicio = destino.tell()
+    origem.seek(inicio)
+    restante = fim - inicio
+    while restante > 0:
+        dados = origem.read(min(TAMANHO_BLOCO_COPIA, restante))
+        if not dados:
+            break
+        destino.write(dados)
+        restante -= len(dados)
+    return novo_inicio
 
 def unir_csvs_por_ano(cidade_nome: str, ano: str):
     """
-    Busca todos os arquivos CSV mensais de uma cidade e ano específicos,
-    os une e salva um arquivo consolidado, detectando o separador automaticamente.
+    Une os CSVs mensais de uma cidade e ano em um arquivo consolidado, em fluxo
+    (memória constante, independente do volume).
+
+    Cada mês é lido em blocos com o separador detectado no cabeçalho e o esquema
+    do consolidado é a união dos cabeçalhos. Um arquivo de estado ao lado do
+    consolidado guarda o tamanho/data de cada CSV mensal e o trecho (em bytes) que
+    ele ocupa no consolidado. Assim, se nada mudou a consolidação é pulada; se só
+    entraram meses novos, eles são acrescentados ao final; e, nos demais casos, só
+    os meses alterados são relidos, enquanto os outros são copiados byte a byte.
     """
     logger = logging.getLogger('exdrop_osr')
     
@@ -25,35 +136,113 @@ def unir_csvs_por_ano(cidade_nome: str, ano: str):
     if not lista_de_arquivos:
         logger.warning(f"Consolidação: Nenhum arquivo mensal encontrado para {cidade_nome} no ano de {ano}.")
         return
-    
-    logger.info(f"Consolidando {len(lista_de_arquivos)} arquivo(s) para {cidade_nome} - {ano}.")
 
-    lista_de_dataframes = []
+    cabecalhos = {}
     for arquivo in lista_de_arquivos:
         try:
-            # --- MUDANÇA PRINCIPAL AQUI ---
-            # Pandas irá detectar automaticamente se o separador é ',' ou ';'
-            df_mensal = pd.read_csv(
-                arquivo, 
-                sep=None, 
-                engine='python', 
-                encoding='utf-8-sig',
-                on_bad_lines='warn' # Adiciona um aviso para linhas malformadas
-            )
-            lista_de_dataframes.append(df_mensal)
+            cabecalhos[os.path.basename(arquivo)] = _ler_cabecalho(arquivo)
         except Exception as e:
             logger.error(f"Erro ao ler o arquivo '{os.path.basename(arquivo)}': {e}")
-
-    if not lista_de_dataframes:
+    if not cabecalhos:
         logger.error("Nenhum arquivo mensal pôde ser lido com sucesso. Consolidação abortada.")
         return
 
-    df_consolidado = pd.concat(lista_de_dataframes, ignore_index=True)
+    # Esquema fixo: união dos cabeçalhos, na ordem em que as colunas aparecem
+    colunas = list(dict.fromkeys(coluna for _, cabecalho in cabecalhos.values() for coluna in cabecalho))
+    nomes = list(cabecalhos)
+    assinaturas = {nome: _assinatura(os.path.join(caminho_da_pasta, nome)) for nome in nomes}
 
-    nome_arquivo_saida = f"{cidade_nome}_royalties_{ano}_consolidado.csv"
-    caminho_saida = os.path.join(caminho_da_pasta, nome_arquivo_saida)
-    
-    # Salva o arquivo consolidado sempre com ';' para padronização
-    df_consolidado.to_csv(caminho_saida, index=False, sep=';', encoding='utf-8-sig')
+    caminho_saida = os.path.join(caminho_da_pasta, f"{cidade_nome}_royalties_{ano}_consolidado.csv")
+    caminho_estado = f"{caminho_saida}.estado.json"
+    estado = _carregar_estado_consolidacao(caminho_estado)
+    reaproveitavel = (
+        estado is not None and estado.get("colunas") == colunas and os.path.exists(caminho_saida)
+        and os.path.getsize(caminho_saida) == estado.get("tamanho_saida")
+    )
+    anteriores = estado["meses"] if reaproveitavel else {}
+    inalterados = {nome for nome in nomes if nome in anteriores and anteriores[nome]["assinatura"] == assinaturas[nome]}
+
+    if reaproveitavel and inalterados == set(nomes) == set(anteriores):
+        logger.info(f"Consolidação de {cidade_nome} - {ano}: nenhum arquivo mensal mudou desde a última vez. Nada a fazer.")
+        return
+
+    meses = {}
+    # Os meses relidos passam por um índice de deduplicação; os copiados já foram deduplicados
+    # antes, mas entram no índice para que os relidos não repitam registros deles
+    indice = IndiceDeduplicacao(rotulo=f"consolidação {cidade_nome} {ano}")
+    if inalterados:
+        _semear_indice(caminho_saida, [(anteriores[nome]["inicio"], anteriores[nome]["fim"]) for nome in nomes if nome in inalterados],
+                       colunas, indice)
+    logger.info(f"Consolidando {len(nomes)} arquivo(s) para {cidade_nome} - {ano}.")
+    if reaproveitavel and list(anteriores) == nomes[:len(anteriores)] and inalterados >= set(anteriores):
+        # Caminho rápido: só entraram meses novos, depois dos já consolidados
+        novos = nomes[len(anteriores):]
+        logger.info(f"Acrescentando {len(novos)} mês(es) novo(s) ao consolidado existente.")
+        meses.update(anteriores)
+        with open(caminho_saida, 'ab') as destino:
+            for nome in novos:
+                try:
+                    inicio, fim, linhas = _anexar_mes(os.path.join(caminho_da_pasta, nome), cabecalhos[nome][0], colunas, destino, indice)
+                except Exception as e:
+                    logger.error(f"Erro ao ler o arquivo '{nome}': {e}")
+                    continue
+                meses[nome] = {"assinatura": assinaturas[nome], "inicio": inicio, "fim": fim, "linhas": linhas}
+    else:
+        reprocessados = len(nomes) - len(inalterados)
+        logger.info(f"{reprocessados} mês(es) novo(s) ou alterado(s) serão relidos; {len(inalterados)} reaproveitado(s) do consolidado anterior.")
+        temporario = f"{caminho_saida}.tmp"
+        origem = open(caminho_saida, 'rb') if inalterados else None
+        try:
+            with open(temporario, 'wb') as destino:
+                destino.write(codecs.BOM_UTF8)
+                destino.write(pd.DataFrame(columns=colunas).to_csv(sep=';', index=False, lineterminator='\n').encode('utf-8'))
+                for nome in nomes:
+                    if nome in inalterados:
+                        anterior = anteriores[nome]
+                        inicio = _copiar_intervalo(origem, anterior["inicio"], anterior["fim"], destino)
+                        fim, linhas = destino.tell(), anterior["linhas"]
+                    else:
+                        try:
+                            inicio, fim, linhas = _anexar_mes(os.path.join(caminho_da_pasta, nome), cabecalhos[nome][0], colunas, destino, indice)
+                        except Exception as e:
+                            logger.error(f"Erro ao ler o arquivo '{nome}': {e}")
+                            continue
+                    meses[nome] = {"assinatura": assinaturas[nome], "inicio": inicio, "fim": fim, "linhas": linhas}
+        finally:
+            if origem:
+                origem.close()
+        os.replace(temporario, caminho_saida)
+
+    _salvar_estado_consolidacao(caminho_estado, {
+        "colunas": colunas, "meses": meses, "tamanho_saida": os.path.getsize(caminho_saida)
+    })
+    indice.relatar()
+    total_linhas = sum(mes["linhas"] for mes in meses.values())
+    logger.info(f"✅ Arquivo consolidado salvo com sucesso em: {caminho_saida} ({total_linhas} registros)")
 
-    logger.info(f"✅ Arquivo consolidado salvo com sucesso em: {caminho_saida}")
\ No newline at end of file
+def gera_csv(cidade_config: dict) -> bool:
+    """Indica se a cidade grava CSV ('formato_saida' igual a 'csv' ou 'ambos')."""
+    return cidade_config.get('formato_saida', 'csv') in ('csv', 'ambos')
+
+def gera_parquet(cidade_config: dict) -> bool:
+    """Indica se a cidade grava a saída colunar ('formato_saida' igual a 'parquet' ou 'ambos')."""
+    return cidade_config.get('formato_saida', 'csv') in ('parquet', 'ambos')
+
+def salvar_registros_mes(registros: list, cidade_nome: str, ano: str, mes: str, formato: str = 'csv') -> str:
+    """
+    Salva os registros de um mês no CSV padrão da cidade
+    (data/processed/<cidade>/<cidade>_royalties_<ano>_<mes>.csv) e/ou em Parquet
+    (data/parquet/cidade=<cidade>/ano=<ano>/mes=<mes>), conforme 'formato', e
+    retorna o(s) caminho(s).
+    """
+    caminhos = []
+    if formato in ('csv', 'ambos'):
+        output_dir = os.path.join("data", "processed", cidade_nome)
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f"{cidade_nome}_royalties_{ano}_{mes}.csv")
+        pd.DataFrame(registros).to_csv(output_path, index=False, sep=';', encoding='utf-8-sig')
+        caminhos.append(output_path)
+    if formato in ('parquet', 'ambos'):
+        from src.common.parquet_utils import salvar_parquet
+        caminhos.append(salvar_parquet(registros, cidade_nome, ano, mes))
+    return ", ".join(caminhos)
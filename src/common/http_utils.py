@@ -0,0 +1,29 @@
+# src/common/http_utils.py
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT_PADRAO = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+def criar_sessao_http(tamanho_pool: int = 10, tentativas: int = 3) -> requests.Session:
+    """
+    Cria uma sessão HTTP com pool de conexões persistentes (keep-alive) e
+    retentativas automáticas para erros transitórios dos portais.
+    """
+    retry = Retry(
+        total=tentativas,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,  # Os portais usam POST para consultas idempotentes
+    )
+    adapter = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=retry)
+
+    sessao = requests.Session()
+    sessao.mount("http://", adapter)
+    sessao.mount("https://", adapter)
+    sessao.headers.update({"User-Agent": USER_AGENT_PADRAO})
+    return sessao
@@ -1,22 +1,122 @@
 # src/common/logging_steup
 
 import os
+import gzip
+import queue
+import atexit
+import shutil
 import logging
 import threading
+import time
+import logging.handlers
+from typing import Optional
 
 # Objeto de armazenamento de dados que é local (privado) para cada thread
 log_context = threading.local()
 
+TAMANHO_MAXIMO_MB_PADRAO = 20
+COPIAS_PADRAO = 5
+TAXA_AMOSTRAGEM_PADRAO = 20
+# Mensagens emitidas a cada linha ou página por todos os workers; só 1 a cada
+# 'taxa' é gravada. As mensagens lidas pela interface.py nunca entram aqui.
+PADROES_AMOSTRADOS_PADRAO = (
+    "Tentando navegar para a próxima página",
+    "Navegando para a próxima página",
+    "Royalties detectados",
+    "Royalties encontrados",
+    "Coletando links da página",
+)
+
 class TaskIdFilter(logging.Filter):
-    """Filtro para adicionar um ID de tarefa/thread aos registros de log."""
+    """Filtro para adicionar um ID de tarefa/thread e a etapa em andamento (ver src/common/metricas.py) aos registros de log."""
     def filter(self, record: logging.LogRecord) -> bool:
         record.task_id = getattr(log_context, 'task_id', 'MainThread')
+        record.etapa = getattr(log_context, 'etapa', None) or '-'
+        return True
+
+class AmostragemFiltro(logging.Filter):
+    """
+    Deixa passar apenas 1 a cada 'taxa' mensagens INFO/DEBUG que contenham cada um
+    dos padrões (a 1ª, a 'taxa'+1ª, ...). Avisos e erros nunca são descartados.
+    """
+    def __init__(self, padroes=PADROES_AMOSTRADOS_PADRAO, taxa: int = TAXA_AMOSTRAGEM_PADRAO):
+        super().__init__()
+        self.padroes = tuple(padroes)
+        self.taxa = max(1, int(taxa))
+        self.vistas = dict.fromkeys(self.padroes, 0)
+        self._trava = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.taxa == 1 or record.levelno >= logging.WARNING or not isinstance(record.msg, str):
+            return True
+        for padrao in self.padroes:
+            if padrao in record.msg:
+                with self._trava:
+                    vistas = self.vistas[padrao]
+                    self.vistas[padrao] = vistas + 1
+                return vistas % self.taxa == 0
         return True
 
-def setup_logging(log_file: str) -> logging.Logger:
-    """Configura o logger principal da aplicação."""
+    def suprimidas(self) -> int:
+        with self._trava:
+            return sum(vistas - -(-vistas // self.taxa) for vistas in self.vistas.values())
+
+class FilaHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que mede, na thread que registra a mensagem, quanto tempo ela gasta
+    com o log (filtros e enfileiramento). Cada thread acumula no próprio contador (a
+    trava só protege a criação dos contadores e a leitura dos totais), e a trava do
+    Handler é dispensada: a fila já é segura entre threads.
+    """
+    def __init__(self, fila):
+        super().__init__(fila)
+        self._por_thread = {}
+        self._trava_contadores = threading.Lock()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        inicio = time.perf_counter()
+        emitido = self.filter(record)
+        if emitido:
+            self.emit(record)
+        acumulado = self._por_thread.get(threading.get_ident())
+        if acumulado is None:
+            with self._trava_contadores:
+                acumulado = self._por_thread.setdefault(threading.get_ident(), [0, 0.0])
+        acumulado[0] += bool(emitido)
+        acumulado[1] += time.perf_counter() - inicio
+        return emitido
+
+    def totais(self) -> tuple:
+        with self._trava_contadores:
+            valores = [list(acumulado) for acumulado in self._por_thread.values()]
+        return sum(n for n, _ in valores), sum(t for _, t in valores)
+
+def _nome_comprimido(nome: str) -> str:
+    return f"{nome}.gz"
+
+def _rotacionar_comprimindo(origem: str, destino: str):
+    with open(origem, 'rb') as arquivo, gzip.open(destino, 'wb') as comprimido:
+        shutil.copyfileobj(arquivo, comprimido)
+    os.remove(origem)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_fila_handler: Optional[FilaHandler] = None
+_amostragem: Optional[AmostragemFiltro] = None
+
+def setup_logging(log_file: str, config_logging: Optional[dict] = None, nivel_console: int = logging.INFO) -> logging.Logger:
+    """
+    Configura o logger principal da aplicação.
+
+    Os workers só enfileiram os registros (QueueHandler); uma thread própria
+    (QueueListener) formata e grava no console e no arquivo. O arquivo é rotacionado
+    por tamanho e as cópias antigas são comprimidas (.gz); o log da execução anterior
+    vira a primeira cópia em vez de ser sobrescrito. Opções na chave 'logging' do config.json.
+    """
+    global _listener, _fila_handler, _amostragem
+    config_logging = config_logging or {}
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    
+    encerrar_logging(relatar=False)
+
     log_format = "[%(task_id)s] - %(asctime)s - %(levelname)s - [%(funcName)s] - %(message)s"
 
     logger = logging.getLogger('exdrop_osr') # Nome do projeto
@@ -26,24 +126,58 @@ def setup_logging(log_file: str) -> logging.Logger:
         logger.handlers.clear()
 
     formatter = logging.Formatter(log_format)
-    task_filter = TaskIdFilter()
 
-    # Handler para o arquivo de log
-    file_handler = logging.FileHandler(log_file, mode='w', encoding='utf-8')
+    # Handler para o arquivo de log, rotacionado por tamanho
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=int(config_logging.get('tamanho_maximo_mb', TAMANHO_MAXIMO_MB_PADRAO) * 1024 * 1024),
+        backupCount=config_logging.get('copias', COPIAS_PADRAO), encoding='utf-8'
+    )
+    if config_logging.get('comprimir', True):
+        file_handler.namer = _nome_comprimido
+        file_handler.rotator = _rotacionar_comprimindo
+    if os.path.getsize(log_file) > 0:
+        file_handler.doRollover()  # Preserva o log da execução anterior
     file_handler.setFormatter(formatter)
-    file_handler.addFilter(task_filter)
 
     # Handler para o console
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    console_handler.addFilter(task_filter)
+    console_handler.setLevel(config_logging.get('nivel_console', nivel_console))
+
+    # O task_id e a etapa são locais da thread: o filtro roda no QueueHandler, antes de enfileirar
+    amostragem = config_logging.get('amostragem', {})
+    _amostragem = AmostragemFiltro(amostragem.get('padroes', PADROES_AMOSTRADOS_PADRAO), amostragem.get('taxa', TAXA_AMOSTRAGEM_PADRAO))
+    _fila_handler = FilaHandler(queue.SimpleQueue())
+    _fila_handler.addFilter(_amostragem)
+    _fila_handler.addFilter(TaskIdFilter())
+    logger.addHandler(_fila_handler)
+
+    _listener = logging.handlers.QueueListener(_fila_handler.queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
     # Reduz o ruído de bibliotecas externas
     logging.getLogger('selenium').setLevel(logging.WARNING)
     logging.getLogger('urllib3').setLevel(logging.WARNING)
     logging.getLogger('WDM').setLevel(logging.WARNING)
 
-    return logger
\ No newline at end of file
+    return logger
+
+def estatisticas_logging() -> dict:
+    """Registros enfileirados, tempo gasto com log nas threads que os emitiram e mensagens descartadas pela amostragem."""
+    registros, tempo = _fila_handler.totais() if _fila_handler else (0, 0.0)
+    return {"registros": registros, "tempo_s": tempo, "suprimidas": _amostragem.suprimidas() if _amostragem else 0}
+
+def encerrar_logging(relatar: bool = True):
+    """Esvazia a fila (grava tudo o que falta) e para a thread do QueueListener."""
+    global _listener
+    if _listener is None:
+        return
+    suprimidas = _amostragem.suprimidas() if _amostragem else 0
+    if relatar and suprimidas:
+        logging.getLogger('exdrop_osr').info(
+            f"Amostragem de log: {suprimidas} mensagem(ns) repetitiva(s) por linha/página não gravada(s) (1 a cada {_amostragem.taxa})."
+        )
+    _listener.stop()
+    _listener = None
+
+atexit.register(encerrar_logging)
@@ -0,0 +1,177 @@
+# src/common/metricas.py
+
+import bisect
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from src.common.logging_setup import log_context
+
+CAMINHO_JSON_PADRAO = os.path.join("logs", "metricas_etapas.json")
+CAMINHO_PROMETHEUS_PADRAO = os.path.join("logs", "metricas_etapas.prom")
+
+# Limites (s) dos buckets, do clique em uma linha (dezenas de ms) a um mês inteiro de páginas
+LIMITES_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+TAMANHO_AMOSTRA = 2048  # Amostras guardadas por histograma para os percentis do resumo JSON
+NOME_METRICA = "exdrop_etapa_duracao_segundos"
+
+
+class HistogramaEtapa:
+    """
+    Histograma de durações de uma etapa em um portal: contagem por bucket (como no
+    Prometheus), soma, mínimo e máximo, além de uma amostra de tamanho fixo
+    (reservoir sampling) usada para estimar os percentis sem guardar todas as medições.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LIMITES_BUCKETS) + 1)  # O último é o +Inf
+        self.contagem = 0
+        self.soma = 0.0
+        self.minimo = float("inf")
+        self.maximo = 0.0
+        self.erros = 0
+        self._amostra = []
+
+    def observar(self, segundos: float, erro: bool = False):
+        self.buckets[bisect.bisect_left(LIMITES_BUCKETS, segundos)] += 1
+        self.contagem += 1
+        self.soma += segundos
+        self.minimo = min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+        self.erros += erro
+        if len(self._amostra) < TAMANHO_AMOSTRA:
+            self._amostra.append(segundos)
+        elif (posicao := random.randrange(self.contagem)) < TAMANHO_AMOSTRA:
+            self._amostra[posicao] = segundos
+
+    def percentil(self, p: float) -> float:
+        if not self._amostra:
+            return 0.0
+        ordenada = sorted(self._amostra)
+        return ordenada[min(len(ordenada) - 1, int(p * len(ordenada)))]
+
+    def resumo(self) -> dict:
+        return {
+            "contagem": self.contagem,
+            "erros": self.erros,
+            "total_s": round(self.soma, 3),
+            "media_s": round(self.soma / self.contagem, 4) if self.contagem else 0.0,
+            "min_s": round(self.minimo, 4) if self.contagem else 0.0,
+            "max_s": round(self.maximo, 4),
+            "p50_s": round(self.percentil(0.50), 4),
+            "p90_s": round(self.percentil(0.90), 4),
+            "p99_s": round(self.percentil(0.99), 4),
+            "buckets": {str(limite): quantidade for limite, quantidade in zip(LIMITES_BUCKETS + ("+Inf",), self.buckets)},
+        }
+
+
+_histogramas: Dict[tuple, HistogramaEtapa] = {}
+_trava = threading.Lock()
+_config = {"ativo": True, "caminho_json": CAMINHO_JSON_PADRAO, "caminho_prometheus": CAMINHO_PROMETHEUS_PADRAO}
+
+
+def configurar_metricas(config_metricas: Optional[dict] = None):
+    """Aplica a chave 'metricas' do config.json e zera as medições da execução anterior."""
+    _config.update(config_metricas or {})
+    with _trava:
+        _histogramas.clear()
+
+def registrar_duracao(etapa: str, portal: str, segundos: float, erro: bool = False):
+    """Registra uma duração já medida (p.ex. as latências do crawler assíncrono)."""
+    if not _config["ativo"]:
+        return
+    with _trava:
+        histograma = _histogramas.get((portal, etapa))
+        if histograma is None:
+            histograma = _histogramas[(portal, etapa)] = HistogramaEtapa()
+        histograma.observar(segundos, erro)
+
+@contextmanager
+def medir_etapa(etapa: str, portal: str):
+    """
+    Mede o bloco como uma ocorrência da etapa. Enquanto ele roda, 'log_context.etapa'
+    identifica a etapa (o TaskIdFilter a expõe como 'etapa' nos registros de log).
+    Uma exceção é contada como erro e propagada normalmente.
+    """
+    etapa_anterior = getattr(log_context, "etapa", None)
+    log_context.etapa = etapa
+    inicio = time.perf_counter()
+    erro = False
+    try:
+        yield
+    except BaseException:
+        erro = True
+        raise
+    finally:
+        registrar_duracao(etapa, portal, time.perf_counter() - inicio, erro)
+        log_context.etapa = etapa_anterior
+
+def cronometrar(etapa: str, portal: str):
+    """Decorador: cada chamada da função é medida como uma ocorrência da etapa."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir_etapa(etapa, portal):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+def resumo_metricas() -> dict:
+    """{portal: {etapa: resumo}} com as medições desta execução."""
+    resumo = {}
+    with _trava:
+        for (portal, etapa), histograma in sorted(_histogramas.items()):
+            resumo.setdefault(portal, {})[etapa] = histograma.resumo()
+    return resumo
+
+def _texto_prometheus() -> str:
+    linhas = [
+        f"# HELP {NOME_METRICA} Duração das etapas da extração, por portal.",
+        f"# TYPE {NOME_METRICA} histogram",
+    ]
+    with _trava:
+        for (portal, etapa), histograma in sorted(_histogramas.items()):
+            rotulos = f'portal="{portal}",etapa="{etapa}"'
+            acumulado = 0
+            for limite, quantidade in zip(LIMITES_BUCKETS + ("+Inf",), histograma.buckets):
+                acumulado += quantidade
+                linhas.append(f'{NOME_METRICA}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+            linhas.append(f"{NOME_METRICA}_sum{{{rotulos}}} {histograma.soma:.6f}")
+            linhas.append(f"{NOME_METRICA}_count{{{rotulos}}} {histograma.contagem}")
+        linhas.append("# HELP exdrop_etapa_erros_total Ocorrências das etapas que terminaram em exceção.")
+        linhas.append("# TYPE exdrop_etapa_erros_total counter")
+        for (portal, etapa), histograma in sorted(_histogramas.items()):
+            linhas.append(f'exdrop_etapa_erros_total{{portal="{portal}",etapa="{etapa}"}} {histograma.erros}')
+    return "\n".join(linhas) + "\n"
+
+def _gravar_atomico(caminho: str, conteudo: str):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)  # O coletor de textfile do Prometheus nunca lê um arquivo pela metade
+
+def exportar_metricas():
+    """
+    Grava o resumo JSON e o arquivo texto do Prometheus (para o coletor 'textfile'
+    do node_exporter) e registra no log as etapas que mais consumiram tempo.
+    """
+    if not _config["ativo"] or not _histogramas:
+        return
+    logger = logging.getLogger('exdrop_osr')
+    resumo = resumo_metricas()
+    _gravar_atomico(_config["caminho_json"], json.dumps(resumo, ensure_ascii=False, indent=2))
+    _gravar_atomico(_config["caminho_prometheus"], _texto_prometheus())
+
+    etapas = sorted(((dados["total_s"], portal, etapa, dados) for portal, por_etapa in resumo.items()
+                     for etapa, dados in por_etapa.items()), reverse=True)
+    logger.info(f"Métricas por etapa salvas em {_config['caminho_json']} e {_config['caminho_prometheus']}. Etapas com mais tempo acumulado:")
+    for total, portal, etapa, dados in etapas[:10]:
+        logger.info(f"  {portal}/{etapa}: {total:.1f}s em {dados['contagem']} ocorrência(s) "
+                    f"(p50={dados['p50_s'] * 1000:.0f}ms, p90={dados['p90_s'] * 1000:.0f}ms, {dados['erros']} erro(s)).")
@@ -0,0 +1,156 @@
+# src/common/parquet_utils.py
+
+import logging
+import os
+import shutil
+from typing import List, Optional
+
+import pandas as pd
+
+CAMINHO_PARQUET_PADRAO = os.path.join("data", "parquet")
+
+# Colunas convertidas na saída colunar (as demais ficam como texto)
+COLUNAS_MONETARIAS = ("pago", "retido", "anulacao", "valor_pago", "valor_retido")
+COLUNAS_DATA = ("data", "data_nota")
+COLUNAS_DICIONARIO = ("cpf_cnpj",)
+TIPO_MONETARIO_PRECISAO, TIPO_MONETARIO_ESCALA = 18, 2
+
+
+def converter_moeda(serie: pd.Series):
+    """
+    Converte valores no formato brasileiro ('R$ 1.234,56') em um array decimal do
+    pyarrow, sem laço em Python. Valores vazios ou inválidos viram nulos.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    texto = serie.astype("string").str.replace(r"[R$\s.]", "", regex=True).str.replace(",", ".", regex=False)
+    # Só o que cabe em decimal(18,2) sem arredondar: um valor fora disso faria o cast falhar para a coluna inteira
+    validos = texto.str.fullmatch(r"-?\d{1,16}(\.\d{1,2})?").fillna(False).astype(bool)
+    invalidos = int((~validos & texto.fillna("").ne("")).sum())
+    if invalidos:
+        logging.getLogger('exdrop_osr').warning(f"Parquet: {invalidos} valor(es) de '{serie.name}' não reconhecidos como moeda foram gravados como nulos.")
+    return pc.cast(pa.array(texto.where(validos), type=pa.string()),
+                   pa.decimal128(TIPO_MONETARIO_PRECISAO, TIPO_MONETARIO_ESCALA))
+
+def converter_data(serie: pd.Series):
+    """Converte datas 'dd/mm/aaaa' em um array date32 do pyarrow (inválidas viram nulas)."""
+    import pyarrow as pa
+
+    datas = pd.to_datetime(serie, format="%d/%m/%Y", errors="coerce")
+    invalidas = int((datas.isna() & serie.astype("string").fillna("").str.strip().ne("")).sum())
+    if invalidas:
+        logging.getLogger('exdrop_osr').warning(f"Parquet: {invalidas} data(s) de '{serie.name}' fora do formato dd/mm/aaaa foram gravadas como nulas.")
+    return pa.array(datas, type=pa.timestamp("ns")).cast(pa.date32())
+
+def tabela_tipada(registros: List[dict]):
+    """Monta uma tabela do pyarrow com moeda em decimal, datas em date32 e 'cpf_cnpj' como dicionário."""
+    import pyarrow as pa
+
+    df = pd.DataFrame(registros)
+    colunas, nomes = [], []
+    for nome in df.columns:
+        serie = df[nome]
+        if nome in COLUNAS_MONETARIAS:
+            coluna = converter_moeda(serie)
+        elif nome in COLUNAS_DATA:
+            coluna = converter_data(serie)
+        else:
+            coluna = pa.array(serie.astype("string"), type=pa.string())
+            if nome in COLUNAS_DICIONARIO:
+                coluna = coluna.dictionary_encode()
+        colunas.append(coluna)
+        nomes.append(nome)
+    return pa.Table.from_arrays(colunas, names=nomes)
+
+def _caminho_particao(cidade_nome: str, ano: str, mes: Optional[str] = None, base: str = CAMINHO_PARQUET_PADRAO) -> str:
+    caminho = os.path.join(base, f"cidade={cidade_nome}", f"ano={ano}")
+    return os.path.join(caminho, f"mes={mes}") if mes else caminho
+
+def _gravar_particao(tabela, caminho: str):
+    import pyarrow.parquet as pq
+
+    os.makedirs(caminho, exist_ok=True)
+    destino = os.path.join(caminho, "dados.parquet")
+    temporario = f"{destino}.tmp"
+    pq.write_table(tabela, temporario, compression="zstd")
+    os.replace(temporario, destino)  # Troca atômica: uma leitura concorrente nunca vê um arquivo pela metade
+
+def salvar_parquet(registros: List[dict], cidade_nome: str, ano: str, mes: Optional[str] = None,
+                   base: str = CAMINHO_PARQUET_PADRAO) -> str:
+    """
+    Salva os registros em Parquet, particionado como cidade=<c>/ano=<a>/mes=<m>
+    (estilo Hive). A partição é sobrescrita, então reprocessar um mês não duplica dados.
+
+    Sem 'mes' (modo anual de Pacatuba), o ano inteiro é regravado e o mês de cada
+    registro vem da coluna de data; registros sem data vão para 'mes=00'.
+    """
+    import pyarrow.compute as pc
+
+    tabela = tabela_tipada(registros)
+    if mes:
+        caminho = _caminho_particao(cidade_nome, ano, mes, base)
+        _gravar_particao(tabela, caminho)
+        return caminho
+
+    # O ano é montado em uma pasta temporária (ignorada pelos leitores, por começar com '.')
+    # e só então trocado pelo atual: uma falha no meio não apaga o ano já gravado
+    caminho_ano = _caminho_particao(cidade_nome, ano, base=base)
+    temporario = os.path.join(os.path.dirname(caminho_ano), f".ano={ano}.tmp")
+    if os.path.isdir(temporario):
+        shutil.rmtree(temporario)
+    coluna_data = next((nome for nome in COLUNAS_DATA if nome in tabela.column_names), None)
+    if coluna_data is None:
+        _gravar_particao(tabela, os.path.join(temporario, "mes=00"))
+    else:
+        meses = pc.fill_null(pc.utf8_lpad(pc.cast(pc.month(tabela.column(coluna_data)), "string"), 2, "0"), "00")
+        for valor in pc.unique(meses).to_pylist():
+            _gravar_particao(tabela.filter(pc.equal(meses, valor)), os.path.join(temporario, f"mes={valor}"))
+    _substituir_pasta(temporario, caminho_ano)
+    return caminho_ano
+
+def remover_parquet(cidade_nome: str, ano: str, mes: Optional[str] = None, base: str = CAMINHO_PARQUET_PADRAO) -> bool:
+    """Apaga a partição do mês (ou o ano inteiro, sem 'mes'). Retorna True se havia algo a apagar."""
+    caminho = _caminho_particao(cidade_nome, ano, mes, base)
+    if not os.path.isdir(caminho):
+        return False
+    shutil.rmtree(caminho)
+    return True
+
+def _substituir_pasta(nova: str, destino: str):
+    antiga = os.path.join(os.path.dirname(destino), f".{os.path.basename(destino)}.antigo")
+    if os.path.isdir(antiga):
+        shutil.rmtree(antiga)
+    if os.path.isdir(destino):
+        os.replace(destino, antiga)
+    os.replace(nova, destino)
+    shutil.rmtree(antiga, ignore_errors=True)
+
+def ler_parquet(cidade_nome: Optional[str] = None, ano: Optional[str] = None, colunas: Optional[List[str]] = None,
+                base: str = CAMINHO_PARQUET_PADRAO) -> pd.DataFrame:
+    """
+    Lê a saída colunar, lendo só as partições e colunas pedidas. Cada cidade é lida
+    como um conjunto de dados próprio, já que os portais têm colunas diferentes.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if cidade_nome:
+        cidades = [cidade_nome]
+    else:
+        cidades = sorted(nome.split("=", 1)[1] for nome in os.listdir(base) if nome.startswith("cidade="))
+
+    tabelas = []
+    for cidade in cidades:
+        caminho = os.path.join(base, f"cidade={cidade}")
+        if not os.path.isdir(caminho):
+            continue
+        dataset = ds.dataset(caminho, format="parquet", partitioning="hive")
+        filtro = (ds.field("ano") == int(ano)) if ano else None
+        selecao = [c for c in colunas if c in dataset.schema.names] if colunas else None
+        tabela = dataset.to_table(columns=selecao, filter=filtro)
+        tabelas.append(tabela.append_column("cidade", pa.array([cidade] * tabela.num_rows, type=pa.string())))
+
+    if not tabelas:
+        return pd.DataFrame(columns=colunas or [])
+    return pa.concat_tables(tabelas, promote_options="permissive").to_pandas()
@@ -0,0 +1,202 @@
+# src/common/perfilador.py
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from src.common.logging_setup import log_context
+
+CAMINHO_RELATORIO_PADRAO = os.path.join("logs", "perfilador_comandos.json")
+PASTA_CPROFILE_PADRAO = os.path.join("logs", "perfis")
+
+# Módulos que nunca são apontados como "chamador": a biblioteca do Selenium e os
+# invólucros do próprio projeto. A atribuição sobe a pilha até a função do scraper.
+MODULOS_IGNORADOS = ("selenium.", "src.common.perfilador", "src.common.metricas", "contextlib", "functools")
+RE_NOME_ARQUIVO = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class PerfiladorComandos:
+    """
+    Conta e cronometra cada comando do WebDriver (findElement, executeScript,
+    clickElement, ...) dos drivers perfilados e atribui cada um à função do
+    scraper que o originou, ao portal e à etapa em andamento (src/common/metricas.py).
+
+    Com as unidades registradas pelos scrapers ('linha' e 'pagina'), o relatório
+    mostra o "orçamento" de comandos: quantos comandos, e quanto tempo, cada linha
+    e cada página custam, por função e por etapa.
+    """
+
+    def __init__(self):
+        self._comandos: Dict[tuple, list] = {}
+        self._unidades: Dict[tuple, int] = {}
+        self._trava = threading.Lock()
+
+    @staticmethod
+    def _chamador() -> tuple:
+        frame = sys._getframe(3)
+        while frame is not None:
+            modulo = frame.f_globals.get("__name__", "")
+            nome = frame.f_code.co_name
+            if not modulo.startswith(MODULOS_IGNORADOS) and not nome.startswith("<"):
+                return frame.f_globals.get("PORTAL") or "-", f"{modulo.rsplit('.', 1)[-1]}.{nome}"
+            frame = frame.f_back
+        return "-", "?"
+
+    def registrar_comando(self, comando: str, segundos: float):
+        portal, funcao = self._chamador()
+        chave = (portal, funcao, comando, getattr(log_context, "etapa", None) or "-")
+        with self._trava:
+            acumulado = self._comandos.get(chave)
+            if acumulado is None:
+                acumulado = self._comandos[chave] = [0, 0.0]
+            acumulado[0] += 1
+            acumulado[1] += segundos
+
+    def registrar_unidade(self, unidade: str, portal: str, quantidade: int = 1):
+        with self._trava:
+            self._unidades[(portal, unidade)] = self._unidades.get((portal, unidade), 0) + quantidade
+
+    def envolver(self, driver):
+        """Substitui 'driver.execute' (por onde passam todos os comandos, inclusive os dos WebElements)."""
+        execute_original = driver.execute
+
+        @functools.wraps(execute_original)
+        def execute_perfilado(driver_command, params=None):
+            inicio = time.perf_counter()
+            try:
+                return execute_original(driver_command, params)
+            finally:
+                self.registrar_comando(driver_command, time.perf_counter() - inicio)
+
+        driver.execute = execute_perfilado
+        return driver
+
+    def relatorio(self) -> dict:
+        """Por portal: totais, orçamento por linha/página e detalhamento por etapa e por (função, comando)."""
+        with self._trava:
+            comandos = dict(self._comandos)
+            unidades = dict(self._unidades)
+
+        def por_unidade(valor: float, quantidade: int) -> Optional[float]:
+            return round(valor / quantidade, 2) if quantidade else None
+
+        relatorio = {}
+        for portal in sorted({chave[0] for chave in comandos}):
+            linhas = unidades.get((portal, "linha"), 0)
+            paginas = unidades.get((portal, "pagina"), 0)
+            do_portal = {chave[1:]: valor for chave, valor in comandos.items() if chave[0] == portal}
+            total = sum(n for n, _ in do_portal.values())
+            tempo = sum(t for _, t in do_portal.values())
+
+            por_etapa = {}
+            for (_, _, etapa), (n, t) in do_portal.items():
+                item = por_etapa.setdefault(etapa, {"comandos": 0, "tempo_s": 0.0})
+                item["comandos"] += n
+                item["tempo_s"] += t
+            for item in por_etapa.values():
+                item["comandos_por_linha"] = por_unidade(item["comandos"], linhas)
+                item["comandos_por_pagina"] = por_unidade(item["comandos"], paginas)
+                item["tempo_s"] = round(item["tempo_s"], 3)
+
+            por_funcao = [
+                {"funcao": funcao, "comando": comando, "etapa": etapa, "chamadas": n, "tempo_s": round(t, 3),
+                 "media_ms": round(t / n * 1000, 2), "por_linha": por_unidade(n, linhas), "por_pagina": por_unidade(n, paginas)}
+                for (funcao, comando, etapa), (n, t) in sorted(do_portal.items(), key=lambda item: item[1][1], reverse=True)
+            ]
+            relatorio[portal] = {
+                "comandos": total,
+                "tempo_s": round(tempo, 3),
+                "linhas": linhas,
+                "paginas": paginas,
+                "comandos_por_linha": por_unidade(total, linhas),
+                "comandos_por_pagina": por_unidade(total, paginas),
+                "ms_por_linha": por_unidade(tempo * 1000, linhas),
+                "por_etapa": dict(sorted(por_etapa.items(), key=lambda item: item[1]["comandos"], reverse=True)),
+                "por_funcao": por_funcao,
+            }
+        return relatorio
+
+
+_perfilador: Optional[PerfiladorComandos] = None
+_config = {"ativo": False, "cprofile": False, "caminho": CAMINHO_RELATORIO_PADRAO, "pasta_cprofile": PASTA_CPROFILE_PADRAO}
+_thread_local = threading.local()
+
+
+def configurar_perfilador(config_perfilador: Optional[dict] = None):
+    """Liga (ou não) o perfilador conforme a chave 'perfilador' do config.json. Desligado por padrão."""
+    global _perfilador
+    _config.update(config_perfilador or {})
+    _perfilador = PerfiladorComandos() if _config["ativo"] else None
+
+def perfilar_driver(driver):
+    """Devolve o driver envolvido pelo perfilador, ou o próprio driver se ele estiver desligado."""
+    return _perfilador.envolver(driver) if _perfilador is not None else driver
+
+def registrar_unidade(unidade: str, portal: str, quantidade: int = 1):
+    """Conta 'linha'/'pagina' processadas, para o orçamento de comandos (sem efeito se desligado)."""
+    if _perfilador is not None:
+        _perfilador.registrar_unidade(unidade, portal, quantidade)
+
+def perfilar_thread(funcao):
+    """
+    Decorador dos workers: com "cprofile": true, a chamada roda sob um cProfile
+    próprio da thread e as estatísticas são salvas em logs/perfis/<tarefa>.prof
+    (abra com 'python -m pstats' ou snakeviz). Chamadas aninhadas na mesma thread
+    ficam no perfil da chamada externa.
+    """
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        if _perfilador is None or not _config["cprofile"] or getattr(_thread_local, "perfil", None) is not None:
+            return funcao(*args, **kwargs)
+        perfil = cProfile.Profile()
+        _thread_local.perfil = perfil
+        try:
+            perfil.enable()
+        except ValueError as e:  # Outro perfilador já está ativo nesta thread
+            logging.getLogger('exdrop_osr').warning(f"cProfile indisponível para {funcao.__name__}: {e}")
+            _thread_local.perfil = None
+            return funcao(*args, **kwargs)
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            perfil.disable()
+            _thread_local.perfil = None
+            _salvar_cprofile(perfil, funcao.__name__)
+    return envolvida
+
+def _salvar_cprofile(perfil: cProfile.Profile, nome_funcao: str):
+    os.makedirs(_config["pasta_cprofile"], exist_ok=True)
+    rotulo = RE_NOME_ARQUIVO.sub("_", getattr(log_context, "task_id", None) or nome_funcao)
+    caminho = os.path.join(_config["pasta_cprofile"], f"{rotulo}_{threading.get_ident() % 100000}_{time.time_ns() % 10**9}.prof")
+    perfil.dump_stats(caminho)
+
+def relatorio_perfilador() -> dict:
+    """Relatório de comandos desta execução ({} se o perfilador estiver desligado)."""
+    return _perfilador.relatorio() if _perfilador is not None else {}
+
+def exportar_perfilador():
+    """Grava o relatório de comandos em JSON e registra no log o orçamento por linha/página de cada portal."""
+    if _perfilador is None:
+        return
+    logger = logging.getLogger('exdrop_osr')
+    relatorio = _perfilador.relatorio()
+    caminho = _config["caminho"]
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"Perfilador de comandos do WebDriver: relatório salvo em {caminho}.")
+    for portal, dados in relatorio.items():
+        logger.info(f"  {portal}: {dados['comandos']} comandos em {dados['tempo_s']:.1f}s; {dados['linhas']} linha(s), "
+                    f"{dados['paginas']} página(s); {dados['comandos_por_linha']} comandos/linha, "
+                    f"{dados['comandos_por_pagina']} comandos/página, {dados['ms_por_linha']} ms/linha.")
+        for item in dados["por_funcao"][:8]:
+            logger.info(f"    {item['funcao']} [{item['etapa']}] {item['comando']}: {item['chamadas']}x, {item['tempo_s']:.1f}s "
+                        f"({item['por_linha']}/linha, {item['por_pagina']}/página)")
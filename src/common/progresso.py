@@ -0,0 +1,217 @@
+# src/common/progresso.py
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from src.common.logging_setup import log_context
+
+CAMINHO_EVENTOS_PADRAO = os.path.join("logs", "progresso.jsonl")
+
+# Eventos (uma linha JSON cada, sempre com 'ts' e 'evento'):
+#   execucao_iniciada   {modo: "global"|"sequencial", tarefas: {cidade: quantidade}}
+#   tarefa_iniciada     {cidade, ano, mes}                       (mes = null na tarefa anual de Pacatuba)
+#   tarefa_dimensionada {cidade, ano, mes, linhas_total}         (quando o total de linhas é conhecido)
+#   pagina_concluida    {cidade, ano, mes, listadas, processadas, mantidas}
+#   linhas_processadas  {cidade, ano, mes, processadas, mantidas}
+#   tarefa_concluida    {cidade, ano, mes, mantidas, pulada, erro}
+#   execucao_concluida  {}
+
+_arquivo = None
+_trava = threading.Lock()
+
+
+def configurar_progresso(caminho: Optional[str] = CAMINHO_EVENTOS_PADRAO):
+    """Abre (truncando) o arquivo JSONL de eventos de progresso. Com caminho None, os eventos são descartados."""
+    global _arquivo
+    with _trava:
+        if _arquivo:
+            _arquivo.close()
+        _arquivo = None
+        if caminho:
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+            _arquivo = open(caminho, "w", encoding="utf-8", buffering=1)  # Uma linha por evento, sem esperar o buffer
+
+def fechar_progresso():
+    configurar_progresso(None)
+
+def emitir(evento: str, **campos):
+    """Grava um evento. Chamado de qualquer thread; sem arquivo configurado, não faz nada."""
+    if _arquivo is None:
+        return
+    linha = json.dumps({"ts": round(time.time(), 3), "evento": evento, **campos}, ensure_ascii=False)
+    with _trava:
+        if _arquivo is not None:
+            _arquivo.write(linha + "\n")
+
+def _tarefa(campos: dict) -> dict:
+    """Identificação da tarefa: a informada explicitamente ou a tarefa em andamento nesta thread."""
+    if campos.get("cidade"):
+        return {"cidade": campos["cidade"], "ano": campos.get("ano"), "mes": campos.get("mes")}
+    return dict(getattr(log_context, "tarefa", None) or {})
+
+def iniciar_tarefa(cidade: str, ano: str, mes: Optional[str] = None):
+    """Marca o início de uma tarefa (cidade, ano, mês) e a associa à thread atual."""
+    log_context.tarefa = {"cidade": cidade, "ano": ano, "mes": mes}
+    emitir("tarefa_iniciada", **log_context.tarefa)
+
+def concluir_tarefa(mantidas: Optional[int] = None, pulada: bool = False, erro: Optional[str] = None, **tarefa):
+    emitir("tarefa_concluida", **_tarefa(tarefa), mantidas=mantidas, pulada=pulada, erro=erro)
+    if not tarefa:
+        log_context.tarefa = None
+
+@contextmanager
+def acompanhar_tarefa(cidade: str, ano: str, mes: Optional[str] = None):
+    """
+    Emite o início e o fim da tarefa em volta do bloco. O bloco preenche o dicionário
+    devolvido ('mantidas', 'pulada'); uma exceção é registrada em 'erro' e propagada.
+    """
+    resultado = {"mantidas": None, "pulada": False}
+    iniciar_tarefa(cidade, ano, mes)
+    try:
+        yield resultado
+    except BaseException as e:
+        concluir_tarefa(erro=f"{type(e).__name__}: {e}")
+        raise
+    concluir_tarefa(**resultado)
+
+def dimensionar_tarefa(linhas_total: int, **tarefa):
+    emitir("tarefa_dimensionada", **_tarefa(tarefa), linhas_total=linhas_total)
+
+def pagina_concluida(listadas: int, processadas: int = 0, mantidas: int = 0, **tarefa):
+    emitir("pagina_concluida", **_tarefa(tarefa), listadas=listadas, processadas=processadas, mantidas=mantidas)
+
+def linhas_processadas(processadas: int, mantidas: int = 0, **tarefa):
+    emitir("linhas_processadas", **_tarefa(tarefa), processadas=processadas, mantidas=mantidas)
+
+
+class EstadoProgresso:
+    """
+    Consome os eventos e estima o progresso e o tempo restante de cada cidade pela
+    vazão real (linhas processadas por segundo), em vez de supor tarefas de custo igual.
+    Tarefas ainda sem total conhecido valem a média de linhas das tarefas já dimensionadas.
+    """
+
+    def __init__(self):
+        self.modo = None
+        self.concluida = False
+        self.cidades = {}
+
+    def _cidade(self, nome: str) -> dict:
+        return self.cidades.setdefault(nome, {"tarefas_total": 0, "concluidas": 0, "puladas": 0, "erros": 0,
+                                              "paginas": 0, "processadas": 0, "mantidas": 0, "inicio": None, "tarefas": {}})
+
+    def aplicar(self, evento: dict):
+        tipo = evento.get("evento")
+        if tipo == "execucao_iniciada":
+            self.modo = evento.get("modo")
+            for nome, quantidade in (evento.get("tarefas") or {}).items():
+                self._cidade(nome)["tarefas_total"] = quantidade
+            return
+        if tipo == "execucao_concluida":
+            self.concluida = True
+            return
+        if not evento.get("cidade"):
+            return
+
+        cidade = self._cidade(evento["cidade"])
+        tarefa = cidade["tarefas"].setdefault((evento.get("ano"), evento.get("mes")),
+                                              {"listadas": 0, "processadas": 0, "total": None, "concluida": False, "pulada": False})
+        if tipo == "tarefa_iniciada":
+            cidade["inicio"] = cidade["inicio"] or evento["ts"]
+        elif tipo == "tarefa_dimensionada":
+            tarefa["total"] = evento["linhas_total"]
+        elif tipo in ("pagina_concluida", "linhas_processadas"):
+            cidade["paginas"] += tipo == "pagina_concluida"
+            tarefa["listadas"] += evento.get("listadas", 0)
+            tarefa["processadas"] += evento.get("processadas", 0)
+            cidade["processadas"] += evento.get("processadas", 0)
+            cidade["mantidas"] += evento.get("mantidas", 0)
+        elif tipo == "tarefa_concluida" and not tarefa["concluida"]:
+            tarefa["concluida"] = True
+            tarefa["pulada"] = bool(evento.get("pulada"))
+            cidade["concluidas"] += 1
+            cidade["puladas"] += tarefa["pulada"]
+            cidade["erros"] += bool(evento.get("erro"))
+
+    def resumo(self, agora: Optional[float] = None) -> dict:
+        """{cidade: {...}} com fração concluída, linhas/s e ETA (s); mais a chave geral '_total'."""
+        agora = agora or time.time()
+        resumo = {}
+        for nome, cidade in self.cidades.items():
+            tarefas = [tarefa for tarefa in cidade["tarefas"].values() if not tarefa["pulada"]]
+            dimensionadas = [tarefa["processadas"] if tarefa["concluida"] else tarefa["total"]
+                             for tarefa in tarefas if tarefa["concluida"] or tarefa["total"] is not None]
+            media = sum(dimensionadas) / len(dimensionadas) if dimensionadas else None
+
+            restantes = 0.0
+            for tarefa in tarefas:
+                if tarefa["concluida"]:
+                    continue
+                total = tarefa["total"] if tarefa["total"] is not None else max(media or 0, tarefa["listadas"])
+                restantes += max(0, total - tarefa["processadas"])
+            nao_iniciadas = max(0, cidade["tarefas_total"] - len(cidade["tarefas"]))
+            estimavel = media is not None or not (nao_iniciadas or any(not t["concluida"] for t in tarefas))
+            restantes += nao_iniciadas * (media or 0)
+
+            decorrido = agora - cidade["inicio"] if cidade["inicio"] else 0
+            vazao = cidade["processadas"] / decorrido if decorrido > 0 else 0
+            total_tarefas = max(cidade["tarefas_total"], len(cidade["tarefas"]))
+            if estimavel and cidade["processadas"] + restantes > 0:
+                fracao = cidade["processadas"] / (cidade["processadas"] + restantes)
+            else:
+                fracao = cidade["concluidas"] / total_tarefas if total_tarefas else 0.0
+            if cidade["concluidas"] >= total_tarefas > 0:
+                fracao, restantes = 1.0, 0
+            if not restantes and fracao >= 1:
+                eta = 0.0
+            else:
+                eta = restantes / vazao if estimavel and vazao > 0 else None
+            resumo[nome] = {
+                "tarefas": total_tarefas, "concluidas": cidade["concluidas"], "puladas": cidade["puladas"],
+                "erros": cidade["erros"], "paginas": cidade["paginas"], "linhas_processadas": cidade["processadas"],
+                "linhas_mantidas": cidade["mantidas"], "linhas_por_s": round(vazao, 2), "fracao": min(1.0, fracao),
+                "eta_s": eta,
+            }
+
+        etas = [dados["eta_s"] for dados in resumo.values()]
+        pesos = [max(1, dados["tarefas"]) for dados in resumo.values()]
+        eta_total = None
+        if etas and all(eta is not None for eta in etas):
+            # No agendador global as cidades correm juntas; no modo sequencial, uma após a outra
+            eta_total = max(etas) if self.modo == "global" else sum(etas)
+        resumo["_total"] = {
+            "fracao": sum(d["fracao"] * p for d, p in zip(resumo.values(), pesos)) / sum(pesos) if pesos else 0.0,
+            "eta_s": eta_total,
+            "concluida": self.concluida,
+        }
+        return resumo
+
+
+class LeitorEventos:
+    """Lê, de forma incremental, as linhas completas acrescentadas ao arquivo de eventos."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._posicao = 0
+        self._resto = ""
+
+    def novos(self) -> list:
+        if not os.path.exists(self.caminho):
+            return []
+        with open(self.caminho, "r", encoding="utf-8") as f:
+            f.seek(self._posicao)
+            texto = self._resto + f.read()
+            self._posicao = f.tell()
+        *linhas, self._resto = texto.split("\n")
+        eventos = []
+        for linha in linhas:
+            try:
+                eventos.append(json.loads(linha))
+            except json.JSONDecodeError:
+                logging.getLogger('exdrop_osr').debug(f"Evento de progresso ilegível ignorado: {linha[:80]}")
+        return eventos
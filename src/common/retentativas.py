@@ -0,0 +1,184 @@
+# src/common/retentativas.py
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+# Parâmetros padrão por portal; podem ser ajustados por 'configurar_politicas'.
+POLITICA_PADRAO = {
+    "base": 1.0,                  # Espera inicial (s) do backoff exponencial
+    "espera_maxima": 30.0,        # Teto de cada espera (s)
+    "proporcao_orcamento": 0.2,   # Cada sucesso "deposita" 0,2 retentativa no orçamento
+    "orcamento_minimo": 10,       # Retentativas sempre disponíveis no início
+    "falhas_para_abrir": 5,       # Falhas seguidas que abrem o disjuntor do portal
+    "pausa_disjuntor": 60.0,      # Pausa (s) com o disjuntor aberto; dobra a cada reabertura
+    "pausa_maxima_disjuntor": 600.0,
+}
+
+
+class PoliticaPortal:
+    """
+    Política de retentativas de um portal: backoff exponencial com jitter, orçamento
+    de retentativas e disjuntor (circuit breaker).
+
+    O orçamento limita as retentativas a uma proporção das operações bem-sucedidas,
+    evitando que um portal instável multiplique a carga. Depois de 'falhas_para_abrir'
+    falhas seguidas o disjuntor abre e todos os workers do portal ficam parados em
+    'aguardar_liberacao' até a pausa acabar; então uma única operação de teste é
+    liberada (semiaberto) e, se ela der certo, o disjuntor fecha.
+    """
+
+    def __init__(self, portal: str, **parametros):
+        config = {**POLITICA_PADRAO, **parametros}
+        self.portal = portal
+        self.base = config["base"]
+        self.espera_maxima = config["espera_maxima"]
+        self.proporcao_orcamento = config["proporcao_orcamento"]
+        self.orcamento_minimo = config["orcamento_minimo"]
+        self.falhas_para_abrir = config["falhas_para_abrir"]
+        self.pausa_disjuntor = config["pausa_disjuntor"]
+        self.pausa_maxima_disjuntor = config["pausa_maxima_disjuntor"]
+
+        self._saldo = float(self.orcamento_minimo)
+        self._falhas_seguidas = 0
+        self._aberto_ate = 0.0
+        self._pausa_atual = self.pausa_disjuntor
+        self._teste_em_andamento = False
+        self._thread_teste = None
+        self._condicao = threading.Condition()
+        self.tempo_dormindo = 0.0
+        self.retentativas = 0
+        self.retentativas_negadas = 0
+        self.aberturas_disjuntor = 0
+
+    def calcular_espera(self, tentativa: int) -> float:
+        """Backoff exponencial com 'full jitter': uniforme entre 0 e base * 2^(tentativa-1)."""
+        return random.uniform(0, min(self.espera_maxima, self.base * 2 ** (tentativa - 1)))
+
+    def aguardar_retentativa(self, tentativa: int) -> bool:
+        """
+        Consome uma retentativa do orçamento e espera o backoff. Retorna False, sem
+        esperar, se o orçamento estiver esgotado (o chamador deve desistir).
+        """
+        if not self.reservar_retentativa():
+            return False
+
+        espera = self.calcular_espera(tentativa)
+        logging.getLogger('exdrop_osr').info(f"Aguardando {espera:.1f}s antes da tentativa {tentativa + 1}.")
+        self._dormir(espera)
+        self.aguardar_liberacao()
+        return True
+
+    def reservar_retentativa(self) -> bool:
+        """Consome uma retentativa do orçamento, sem esperar. Retorna False se ele estiver esgotado."""
+        with self._condicao:
+            if self._saldo < 1:
+                self.retentativas_negadas += 1
+                logging.getLogger('exdrop_osr').warning(
+                    f"Orçamento de retentativas de '{self.portal}' esgotado. Desistindo da operação."
+                )
+                return False
+            self._saldo -= 1
+            self.retentativas += 1
+            return True
+
+    def registrar_espera(self, segundos: float):
+        """Contabiliza uma espera feita fora da política (ex.: o backoff do crawler assíncrono)."""
+        with self._condicao:
+            self.tempo_dormindo += segundos
+
+    def liberado(self) -> bool:
+        """Indica, sem bloquear, se o disjuntor está fechado."""
+        with self._condicao:
+            return not self._aberto_ate
+
+    def registrar_sucesso(self):
+        with self._condicao:
+            self._saldo = min(self._saldo + self.proporcao_orcamento, self.orcamento_minimo + 100 * self.proporcao_orcamento)
+            self._falhas_seguidas = 0
+            if self._teste_em_andamento or self._aberto_ate:
+                logging.getLogger('exdrop_osr').info(f"Disjuntor de '{self.portal}' fechado: o portal voltou a responder.")
+            self._teste_em_andamento = False
+            self._thread_teste = None
+            self._aberto_ate = 0.0
+            self._pausa_atual = self.pausa_disjuntor
+            self._condicao.notify_all()
+
+    def registrar_falha(self):
+        with self._condicao:
+            self._falhas_seguidas += 1
+            if self._teste_em_andamento or self._falhas_seguidas >= self.falhas_para_abrir:
+                if self._teste_em_andamento:
+                    self._pausa_atual = min(self.pausa_maxima_disjuntor, self._pausa_atual * 2)
+                self._teste_em_andamento = False
+                self._thread_teste = None
+                self._aberto_ate = time.monotonic() + self._pausa_atual
+                self._falhas_seguidas = 0
+                self.aberturas_disjuntor += 1
+                logging.getLogger('exdrop_osr').error(
+                    f"Disjuntor de '{self.portal}' aberto: o portal parece fora do ar. "
+                    f"Todos os workers do portal pausados por {self._pausa_atual:.0f}s."
+                )
+            self._condicao.notify_all()
+
+    def aguardar_liberacao(self):
+        """Bloqueia enquanto o disjuntor estiver aberto ou uma operação de teste estiver em andamento."""
+        inicio = time.monotonic()
+        with self._condicao:
+            while self._aberto_ate and self._thread_teste != threading.get_ident():
+                agora = time.monotonic()
+                if agora >= self._aberto_ate:
+                    # Semiaberto: esta thread faz a operação de teste; as demais esperam o resultado
+                    # (se o teste não for concluído dentro da pausa, outra thread assume)
+                    self._teste_em_andamento = True
+                    self._thread_teste = threading.get_ident()
+                    self._aberto_ate = agora + self._pausa_atual
+                    break
+                self._condicao.wait(timeout=self._aberto_ate - agora)
+            self.tempo_dormindo += time.monotonic() - inicio
+
+    def _estado_disjuntor(self) -> tuple:
+        return self._aberto_ate, self._teste_em_andamento
+
+    def _dormir(self, segundos: float):
+        # Espera interrompível: acorda antes só se o disjuntor mudar de estado (abrir, fechar
+        # ou liberar o teste); os notify_all de cada sucesso não encurtam o backoff
+        inicio = time.monotonic()
+        prazo = inicio + segundos
+        with self._condicao:
+            estado = self._estado_disjuntor()
+            while self._estado_disjuntor() == estado:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                self._condicao.wait(timeout=restante)
+            self.tempo_dormindo += time.monotonic() - inicio
+
+
+_politicas: Dict[str, PoliticaPortal] = {}
+_trava = threading.Lock()
+
+
+def configurar_politicas(config_por_portal: Optional[Dict[str, dict]] = None):
+    """Cria (ou recria) as políticas dos portais a partir da configuração."""
+    with _trava:
+        for portal, parametros in (config_por_portal or {}).items():
+            _politicas[portal] = PoliticaPortal(portal, **parametros)
+
+def politica(portal: str) -> PoliticaPortal:
+    """Retorna a política do portal, criando uma com os valores padrão se necessário."""
+    with _trava:
+        if portal not in _politicas:
+            _politicas[portal] = PoliticaPortal(portal)
+        return _politicas[portal]
+
+def relatar_tempo_dormindo():
+    """Registra, por portal, o tempo gasto esperando (backoff e disjuntor) nesta execução."""
+    logger = logging.getLogger('exdrop_osr')
+    for portal, item in sorted(_politicas.items()):
+        logger.info(
+            f"Retentativas de '{portal}': {item.retentativas} feitas, {item.retentativas_negadas} negadas pelo orçamento, "
+            f"{item.aberturas_disjuntor} abertura(s) do disjuntor, {item.tempo_dormindo:.1f}s esperando."
+        )
@@ -2,13 +2,15 @@
 
 import os
 import re
+import json
+import math
 import sys
 import time
 import csv
 import glob
 import unicodedata
 import logging
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import partial
 
@@ -29,10 +31,23 @@ from selenium.common.exceptions import (
 )
 from webdriver_manager.chrome import ChromeDriverManager
 
+from src.common.browser_profile import aplicar_perfil_enxuto, ativar_bloqueio_recursos
+from src.common.concorrencia import registrar_latencia, registrar_retentativa, registrar_timeout
+from src.common.armazem import registrar_pagamentos
+from src.common.classificacao import separar_brutos
+from src.common.deduplicacao import IndiceDeduplicacao
+from src.common.driver_pool import obter_driver
+from src.common.metricas import cronometrar, medir_etapa
+from src.common.perfilador import perfilar_driver, perfilar_thread, registrar_unidade
+from src.common import progresso
+from src.common.retentativas import politica
 from src.common.logging_setup import log_context
-from src.common.file_utils import unir_csvs_por_ano
+from src.common.file_utils import gera_csv, unir_csvs_por_ano, salvar_registros_mes
 
 # --- Constantes e Funções Auxiliares (do seu notebook) ---
+# Portal dos scrapers deste módulo, usado pelo agendador global e pelo controle de concorrência por servidor
+PORTAL = "municipioonline"
+
 TERMOS_ROYALTIES = ['royalty', 'royalties', 'petroleo', '15300000', '15400000', '17050000', '17200000', '17210000', '0120000']
 RE_REMOVE_PUNCTUATION = re.compile(r'[^a-zA-Z0-9\s]')
 
@@ -44,7 +59,8 @@ def normalizar(texto: str) -> str:
 
 # --- Funções de Interação com Selenium ---
 
-def start_driver_aracaju_family(headless=False, executable_path=None) -> webdriver.Chrome:
+@cronometrar("inicio_driver", "navegador")
+def start_driver_aracaju_family(headless=False, executable_path=None, perfil="padrao", capturar_rede=False) -> webdriver.Chrome:
     logger = logging.getLogger('exdrop_osr')
     logger.info("Iniciando driver do Chrome para a família de portais Serigy...")
     options = webdriver.ChromeOptions()
@@ -57,6 +73,10 @@ def start_driver_aracaju_family(headless=False, executable_path=None) -> webdriv
         options.add_argument("--disable-blink-features=AutomationControlled")
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_argument("--disable-dev-shm-usage")
+    if perfil == "enxuto":
+        aplicar_perfil_enxuto(options)
+    if capturar_rede:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
     # Lógica para usar o caminho pré-instalado ou o WebDriverManager
     if executable_path:
         service = ChromeService(executable_path=executable_path)
@@ -65,17 +85,25 @@ def start_driver_aracaju_family(headless=False, executable_path=None) -> webdriv
         service = ChromeService(ChromeDriverManager().install())
     
     driver = webdriver.Chrome(service=service, options=options)
-    return driver
+    if perfil == "enxuto":
+        ativar_bloqueio_recursos(driver)
+    return perfilar_driver(driver)
 
 def wait_for_loading_to_disappear(driver, timeout=60):
     logger = logging.getLogger('exdrop_osr')
+    inicio = time.perf_counter()
     try:
         logger.debug("Aguardando o indicador de carregamento desaparecer...")
         WebDriverWait(driver, timeout).until(EC.invisibility_of_element_located((By.ID, "loading")))
         logger.debug("Indicador de carregamento desapareceu.")
+        registrar_latencia(PORTAL, time.perf_counter() - inicio)
+        politica(PORTAL).registrar_sucesso()
     except TimeoutException:
         logger.warning(f"Timeout: Indicador de carregamento não desapareceu em {timeout}s.")
+        registrar_timeout(PORTAL)
+        politica(PORTAL).registrar_falha()
 
+@cronometrar("aplicar_filtro", PORTAL)
 def selecionar_ano_mes_aracaju(driver, ano, mes):
     logger = logging.getLogger('exdrop_osr')
     logger.info(f"Selecionando filtro para {mes}/{ano}")
@@ -87,14 +115,70 @@ def selecionar_ano_mes_aracaju(driver, ano, mes):
     logger.info(f"Filtro para {mes}/{ano} aplicado.")
     
 
+# Aumenta o tamanho de página do DataTables. Usa a API do DataTables quando
+# disponível (aceita valores fora do <select>); senão escolhe a maior opção do <select>.
+SCRIPT_TAMANHO_PAGINA = r"""
+const alvo = arguments[0];
+if (window.jQuery && jQuery.fn.dataTable && jQuery.fn.dataTable.isDataTable('#dataTables-Pagamentos')) {
+    const api = jQuery('#dataTables-Pagamentos').DataTable();
+    const original = api.page.info().length;
+    api.page.len(alvo).draw();
+    return {original: original, via: 'api'};
+}
+const select = document.querySelector("select[name='dataTables-Pagamentos_length']");
+if (!select) return null;
+const original = parseInt(select.value, 10);
+const valores = Array.from(select.options).map(o => parseInt(o.value, 10));
+const escolhido = valores.includes(alvo) ? alvo : (valores.includes(-1) ? -1 : Math.max(...valores));
+select.value = String(escolhido);
+select.dispatchEvent(new Event('change', {bubbles: true}));
+return {original: original, via: 'select'};
+"""
+
+RE_TOTAL_REGISTROS = re.compile(r'de\s+([\d.]+)\s+registro', re.IGNORECASE)
+
+def _total_registros_aracaju(driver) -> Optional[int]:
+    """Lê o total de registros do texto 'Mostrando X a Y de Z registros' do DataTables."""
+    try:
+        texto = driver.find_element(By.ID, "dataTables-Pagamentos_info").text
+    except NoSuchElementException:
+        return None
+    match = RE_TOTAL_REGISTROS.search(texto)
+    return int(match.group(1).replace('.', '')) if match else None
+
+def maximizar_tamanho_pagina_aracaju(driver, tamanho="all") -> Optional[dict]:
+    """
+    Ajusta o tamanho de página da tabela para "all" (todos) ou para o número
+    informado, de modo que o mês carregue com o mínimo de páginas.
+    Retorna {'total', 'original', 'aplicado'} ou None se a tabela não permitir.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    alvo = -1 if str(tamanho).lower() in ("all", "todos", "-1") else int(tamanho)
+
+    total = _total_registros_aracaju(driver)
+    ajuste = driver.execute_script(SCRIPT_TAMANHO_PAGINA, alvo)
+    if not ajuste:
+        logger.warning("Não foi possível alterar o tamanho de página da tabela. Mantendo a paginação padrão.")
+        return None
+    wait_for_loading_to_disappear(driver)
+
+    xpath_linhas = "//table[@id='dataTables-Pagamentos']/tbody/tr[@role='row']"
+    aplicado = len(driver.find_elements(By.XPATH, xpath_linhas))
+    logger.info(f"Tamanho de página ajustado via {ajuste['via']}: {ajuste['original']} -> {aplicado} linhas (total do mês: {total}).")
+    return {'total': total, 'original': ajuste['original'], 'aplicado': aplicado}
+
+@cronometrar("troca_pagina", PORTAL)
 def ir_para_proxima_pagina_aracaju(driver, tentativas_maximas=3):
     """
     Tenta clicar no botão da próxima página na tabela de pagamentos com lógica de retentativas.
     Retorna True se conseguiu ir para a próxima página, False caso contrário.
+    As esperas entre tentativas seguem a política de retentativas do portal.
     """
     logger = logging.getLogger('exdrop_osr')
+    politica_portal = politica(PORTAL)
     
     for tentativa in range(1, tentativas_maximas + 1):
+        politica_portal.aguardar_liberacao()
         try:
             logger.info(f"Tentando navegar para a próxima página (Tentativa {tentativa}/{tentativas_maximas})...")
             
@@ -121,11 +205,11 @@ def ir_para_proxima_pagina_aracaju(driver, tentativas_maximas=3):
 
         except (TimeoutException, NoSuchElementException) as e:
             logger.warning(f"Falha na tentativa {tentativa}: {type(e).__name__}.")
+            registrar_retentativa(PORTAL)
+            politica_portal.registrar_falha()
             
-            if tentativa < tentativas_maximas:
-                tempo_espera = 5 * tentativa # Espera 5s, 10s...
-                logger.info(f"Aguardando {tempo_espera} segundos antes da próxima tentativa.")
-                time.sleep(tempo_espera)
+            if tentativa < tentativas_maximas and politica_portal.aguardar_retentativa(tentativa):
+                continue
             else:
                     logger.error("Número máximo de tentativas atingido. Abortando a paginação.")
                     
@@ -146,7 +230,13 @@ def ir_para_proxima_pagina_aracaju(driver, tentativas_maximas=3):
 
     return False
 
-def _processar_linha_aracaju(driver, indice_linha: int, xpath_base: str, dados_coletados_mes: list) -> bool:
+# Verdadeiro quando o elemento está inteiro dentro da janela (a rolagem terminou)
+SCRIPT_ELEMENTO_VISIVEL = """
+const r = arguments[0].getBoundingClientRect();
+return r.top >= 0 && r.bottom <= (window.innerHeight || document.documentElement.clientHeight);
+"""
+
+def _processar_linha_aracaju(driver, indice_linha: int, xpath_base: str, dados_coletados_mes: list, capturar_tudo: bool = False) -> bool:
     """
     Função auxiliar que processa uma ÚNICA linha da tabela de Aracaju.
     Retorna True em caso de sucesso, False em caso de falha.
@@ -156,61 +246,67 @@ def _processar_linha_aracaju(driver, indice_linha: int, xpath_base: str, dados_c
     
     try:
         # Etapa 1: Localiza a linha principal e abre os detalhes se necessário
-        linha_principal = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, current_row_xpath)))
+        with medir_etapa("linha_expandir", PORTAL):
+            linha_principal = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, current_row_xpath)))
         
-        if "shown" not in linha_principal.get_attribute("class"):
-            btn_detalhes_locator = linha_principal.find_element(By.XPATH, "./td[1][contains(@class, 'details-control')]")
+            if "shown" not in linha_principal.get_attribute("class"):
+                btn_detalhes_locator = linha_principal.find_element(By.XPATH, "./td[1][contains(@class, 'details-control')]")
             
-            btn_detalhes = WebDriverWait(linha_principal, 15).until(
-                EC.element_to_be_clickable(btn_detalhes_locator)
-            )
+                btn_detalhes = WebDriverWait(linha_principal, 15).until(
+                    EC.element_to_be_clickable(btn_detalhes_locator)
+                )
             
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", btn_detalhes)
-            time.sleep(0.3)
-            btn_detalhes.click()
-            WebDriverWait(driver, 20).until(lambda d: "shown" in d.find_element(By.XPATH, current_row_xpath).get_attribute("class"))
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", btn_detalhes)
+                # Espera o botão estar de fato dentro da área visível (rolagem concluída) antes de clicar
+                WebDriverWait(driver, 5).until(lambda d: d.execute_script(SCRIPT_ELEMENTO_VISIVEL, btn_detalhes))
+                btn_detalhes.click()
+                WebDriverWait(driver, 20).until(lambda d: "shown" in d.find_element(By.XPATH, current_row_xpath).get_attribute("class"))
 
         # Etapa 2: Extrai os dados dos detalhes
-        details_wrapper_xpath = f"{current_row_xpath}/following-sibling::tr[1]"
-        linha_detalhes_container = WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.XPATH, details_wrapper_xpath)))
+        with medir_etapa("linha_ler", PORTAL):
+            details_wrapper_xpath = f"{current_row_xpath}/following-sibling::tr[1]"
+            linha_detalhes_container = WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.XPATH, details_wrapper_xpath)))
         
-        dados_detalhes_preview = {}
-        fonte_recurso_valor = None
-
-        tabela_detalhes = linha_detalhes_container.find_element(By.XPATH, ".//div[@class='table-responsive']/table")
-        for linha_det in tabela_detalhes.find_elements(By.XPATH, "./tbody/tr"):
-            try:
-                chave = linha_det.find_element(By.XPATH, "./th").text.strip().replace(":", "")
-                valor = linha_det.find_element(By.XPATH, "./td").text.strip()
-                chave_norm = normalizar(chave).replace(" ", "_")
-                if chave_norm:
-                    dados_detalhes_preview[chave_norm] = valor
-                    if chave_norm == "fonte_de_recurso":
-                        fonte_recurso_valor = valor
-            except NoSuchElementException:
-                continue
+            dados_detalhes_preview = {}
+            fonte_recurso_valor = None
 
-        # Etapa 3: Verifica se é de royalties
-        if fonte_recurso_valor and any(termo in normalizar(fonte_recurso_valor) for termo in TERMOS_ROYALTIES):
-            logger.info(f"Linha {indice_linha + 1}: Royalties detectados. Coletando dados completos.")
-            linha_principal = WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.XPATH, current_row_xpath)))
-            celulas = linha_principal.find_elements(By.XPATH, "./td")
+            tabela_detalhes = linha_detalhes_container.find_element(By.XPATH, ".//div[@class='table-responsive']/table")
+            for linha_det in tabela_detalhes.find_elements(By.XPATH, "./tbody/tr"):
+                try:
+                    chave = linha_det.find_element(By.XPATH, "./th").text.strip().replace(":", "")
+                    valor = linha_det.find_element(By.XPATH, "./td").text.strip()
+                    chave_norm = normalizar(chave).replace(" ", "_")
+                    if chave_norm:
+                        dados_detalhes_preview[chave_norm] = valor
+                        if chave_norm == "fonte_de_recurso":
+                            fonte_recurso_valor = valor
+                except NoSuchElementException:
+                    continue
+
+            # Etapa 3: Verifica se é de royalties (na captura bruta, todas as linhas são coletadas)
+            eh_royalties = bool(fonte_recurso_valor) and any(termo in normalizar(fonte_recurso_valor) for termo in TERMOS_ROYALTIES)
+            if eh_royalties or capturar_tudo:
+                if eh_royalties:
+                    logger.info(f"Linha {indice_linha + 1}: Royalties detectados. Coletando dados completos.")
+                linha_principal = WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.XPATH, current_row_xpath)))
+                celulas = linha_principal.find_elements(By.XPATH, "./td")
             
-            dados_linha = {
-                'orgao': celulas[1].text, 'unidade': celulas[2].text, 'data': celulas[3].text,
-                'empenho': celulas[4].text, 'processo': celulas[5].text, 'credor': celulas[6].text,
-                'cpf_cnpj': celulas[7].text, 'pago': celulas[8].text, 'retido': celulas[9].text,
-                'anulacao': celulas[10].text
-            }
-            dados_linha.update(dados_detalhes_preview)
-            dados_coletados_mes.append(dados_linha)
+                dados_linha = {
+                    'orgao': celulas[1].text, 'unidade': celulas[2].text, 'data': celulas[3].text,
+                    'empenho': celulas[4].text, 'processo': celulas[5].text, 'credor': celulas[6].text,
+                    'cpf_cnpj': celulas[7].text, 'pago': celulas[8].text, 'retido': celulas[9].text,
+                    'anulacao': celulas[10].text
+                }
+                dados_linha.update(dados_detalhes_preview)
+                dados_coletados_mes.append(dados_linha)
         
         # Etapa 4: Fecha os detalhes (importante para não sobrecarregar a página)
-        linha_principal = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, current_row_xpath)))
-        if "shown" in linha_principal.get_attribute("class"):
-            btn_detalhes = linha_principal.find_element(By.XPATH, "./td[1][contains(@class, 'details-control')]")
-            btn_detalhes.click()
-            WebDriverWait(driver, 10).until(lambda d: "shown" not in d.find_element(By.XPATH, current_row_xpath).get_attribute("class"))
+        with medir_etapa("linha_fechar", PORTAL):
+            linha_principal = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, current_row_xpath)))
+            if "shown" in linha_principal.get_attribute("class"):
+                btn_detalhes = linha_principal.find_element(By.XPATH, "./td[1][contains(@class, 'details-control')]")
+                btn_detalhes.click()
+                WebDriverWait(driver, 10).until(lambda d: "shown" not in d.find_element(By.XPATH, current_row_xpath).get_attribute("class"))
 
         return True # Sucesso
         
@@ -218,7 +314,125 @@ def _processar_linha_aracaju(driver, indice_linha: int, xpath_base: str, dados_c
         logger.error(f"Erro ao processar a linha {indice_linha + 1}: {e}")
         return False # Falha
 
-def extrair_dados_pagina_aracaju(driver, dados_coletados_mes: list):
+# Script executado uma única vez por página: abre o painel de detalhes de cada
+# linha dentro do próprio navegador, lê as células e os pares th/td e devolve
+# tudo como JSON. Evita dezenas de round trips do WebDriver por pagamento.
+SCRIPT_EXTRACAO_LOTE = r"""
+const done = arguments[arguments.length - 1];
+const [timeoutMs, inicio, fim] = arguments;
+const linhas = Array.from(document.querySelectorAll("#dataTables-Pagamentos > tbody > tr[role='row']"))
+    .filter(tr => tr.classList.contains('odd') || tr.classList.contains('even'));
+
+function lerDetalhes(tr) {
+    const prox = tr.nextElementSibling;
+    if (!prox || prox.getAttribute('role') === 'row') return null;
+    const tabela = prox.querySelector("div.table-responsive > table");
+    if (!tabela) return null;
+    const pares = [];
+    tabela.querySelectorAll(":scope > tbody > tr").forEach(r => {
+        const th = r.querySelector(":scope > th"), td = r.querySelector(":scope > td");
+        if (th && td) pares.push([th.innerText, td.innerText]);
+    });
+    return pares;
+}
+
+function esperar(condicao, limiteMs) {
+    return new Promise(resolve => {
+        const inicio = Date.now();
+        (function verificar() {
+            if (condicao()) return resolve(true);
+            if (Date.now() - inicio > limiteMs) return resolve(false);
+            setTimeout(verificar, 25);
+        })();
+    });
+}
+
+async function processar() {
+    const resultado = [];
+    for (let i = inicio; i < Math.min(fim, linhas.length); i++) {
+        const tr = linhas[i];
+        const item = {indice: i, celulas: Array.from(tr.querySelectorAll(":scope > td")).map(td => td.innerText), detalhes: null};
+        try {
+            const botao = tr.querySelector(":scope > td.details-control");
+            if (!tr.classList.contains('shown') && botao) botao.click();
+            if (await esperar(() => tr.classList.contains('shown') && lerDetalhes(tr) !== null, timeoutMs)) {
+                item.detalhes = lerDetalhes(tr);
+            }
+            if (tr.classList.contains('shown') && botao) {
+                botao.click();
+                await esperar(() => !tr.classList.contains('shown'), timeoutMs);
+            }
+        } catch (e) {
+            item.erro = String(e);
+        }
+        resultado.push(item);
+    }
+    return resultado;
+}
+
+processar().then(r => done(JSON.stringify(r)), e => done(JSON.stringify({erro: String(e)})));
+"""
+
+def _extrair_pagina_em_lote(driver, num_linhas: int, dados_coletados_mes: list, timeout_linha: float = 10, linhas_por_lote: int = 200, capturar_tudo: bool = False) -> list:
+    """
+    Extrai a página com 'execute_async_script' (uma chamada a cada 'linhas_por_lote'
+    linhas, para manter limitado o JSON montado no navegador) e classifica as
+    linhas em Python. Retorna os índices das linhas que o lote não conseguiu
+    resolver, para que sejam tratadas pelo caminho linha a linha.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    resultado = []
+    try:
+        driver.set_script_timeout(30 + linhas_por_lote * timeout_linha)
+        for inicio in range(0, num_linhas, linhas_por_lote):
+            with medir_etapa("linhas_lote", PORTAL):
+                parcial = json.loads(driver.execute_async_script(
+                    SCRIPT_EXTRACAO_LOTE, int(timeout_linha * 1000), inicio, inicio + linhas_por_lote
+                ))
+            if isinstance(parcial, dict):
+                raise RuntimeError(parcial.get('erro'))
+            resultado.extend(parcial)
+    except Exception as e:
+        logger.warning(f"Extração em lote falhou ({type(e).__name__}). Usando o caminho linha a linha.")
+        return list(range(num_linhas))
+
+    if len(resultado) != num_linhas:
+        logger.warning("Extração em lote retornou um resultado inesperado. Usando o caminho linha a linha.")
+        return list(range(num_linhas))
+
+    nao_resolvidas = []
+    for item in resultado:
+        celulas = item['celulas']
+        if item['detalhes'] is None or len(celulas) < 11:
+            nao_resolvidas.append(item['indice'])
+            continue
+
+        dados_detalhes = {}
+        for chave, valor in item['detalhes']:
+            chave_norm = normalizar(chave.strip().replace(":", "")).replace(" ", "_")
+            if chave_norm:
+                dados_detalhes[chave_norm] = valor.strip()
+
+        fonte_recurso_valor = dados_detalhes.get("fonte_de_recurso")
+        eh_royalties = bool(fonte_recurso_valor) and any(termo in normalizar(fonte_recurso_valor) for termo in TERMOS_ROYALTIES)
+        if eh_royalties or capturar_tudo:
+            if eh_royalties:
+                logger.info(f"Linha {item['indice'] + 1}: Royalties detectados.")
+            dados_linha = {
+                'orgao': celulas[1], 'unidade': celulas[2], 'data': celulas[3],
+                'empenho': celulas[4], 'processo': celulas[5], 'credor': celulas[6],
+                'cpf_cnpj': celulas[7], 'pago': celulas[8], 'retido': celulas[9],
+                'anulacao': celulas[10]
+            }
+            dados_linha = {chave: valor.strip() for chave, valor in dados_linha.items()}
+            dados_linha.update(dados_detalhes)
+            dados_coletados_mes.append(dados_linha)
+
+    logger.info(f"Extração em lote: {num_linhas - len(nao_resolvidas)} de {num_linhas} linhas resolvidas.")
+    return nao_resolvidas
+
+def extrair_dados_pagina_aracaju(driver, dados_coletados_mes: list, em_lote: bool = False, linhas_por_lote: int = 200, capturar_tudo: bool = False) -> int:
+    """Processa as linhas da página atual e retorna quantas linhas a página tinha."""
     logger = logging.getLogger('exdrop_osr')
     logger.info("Executando extração da página...")
 
@@ -227,45 +441,74 @@ def extrair_dados_pagina_aracaju(driver, dados_coletados_mes: list):
         num_linhas = len(WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.XPATH, xpath_base_linhas))))
         if num_linhas == 0:
             logger.info("Nenhuma linha de dados encontrada nesta página.")
-            return
+            return 0
         logger.info(f"Encontradas {num_linhas} linhas para processar.")
+        registrar_unidade("pagina", PORTAL)
+        registrar_unidade("linha", PORTAL, num_linhas)
     except TimeoutException:
         logger.info("Tabela de dados não encontrada ou vazia nesta página.")
-        return
+        return 0
+
+    linhas_a_processar = range(num_linhas)
+    if em_lote:
+        linhas_a_processar = _extrair_pagina_em_lote(driver, num_linhas, dados_coletados_mes, linhas_por_lote=linhas_por_lote, capturar_tudo=capturar_tudo)
+        if not linhas_a_processar:
+            return num_linhas
 
     linhas_para_retentativa = []
 
     # --- PRIMEIRA PASSAGEM ---
     logger.info("Iniciando primeira passagem pelas linhas da página...")
-    for i in range(num_linhas):
-        sucesso = _processar_linha_aracaju(driver, i, xpath_base_linhas, dados_coletados_mes)
+    for i in linhas_a_processar:
+        sucesso = _processar_linha_aracaju(driver, i, xpath_base_linhas, dados_coletados_mes, capturar_tudo)
         if not sucesso:
             linhas_para_retentativa.append(i) # Guarda o índice da linha que falhou
     
     # --- SEGUNDA PASSAGEM (APENAS NAS LINHAS QUE FALHARAM) ---
     if linhas_para_retentativa:
         logger.info(f"Iniciando segunda passagem para {len(linhas_para_retentativa)} linha(s) que falharam...")
-        time.sleep(2) # Pausa estratégica antes de tentar novamente
+        # Em vez de uma pausa fixa, espera a tabela terminar qualquer recarga pendente
+        wait_for_loading_to_disappear(driver, timeout=10)
 
         for i in linhas_para_retentativa:
             logger.info(f"Retentativa na linha {i+1}...")
-            _processar_linha_aracaju(driver, i, xpath_base_linhas, dados_coletados_mes)
+            _processar_linha_aracaju(driver, i, xpath_base_linhas, dados_coletados_mes, capturar_tudo)
+    return num_linhas
 
 
 
 # --- Worker e Função Principal (Ponto de Entrada do Módulo) ---
 
-def worker_processar_mes(cidade_config: dict, ano: str, mes: str, driver_path: str, headless:bool):
-    cidade_nome = cidade_config['nome']
-    log_context.task_id = f"{cidade_nome.capitalize()}-{ano}-{mes}"
+def ir_para_pagina_aracaju(driver, pagina: int) -> bool:
+    """Pula diretamente para a página informada (1 = primeira). Usado ao retomar um mês interrompido."""
     logger = logging.getLogger('exdrop_osr')
-    logger.info("Worker iniciado.")
-    
-    driver = None
-    try:
-        driver = start_driver_aracaju_family(headless=headless, executable_path=driver_path)
+    pulou = driver.execute_script(
+        "if (window.jQuery && jQuery.fn.dataTable && jQuery.fn.dataTable.isDataTable('#dataTables-Pagamentos')) {"
+        "  jQuery('#dataTables-Pagamentos').DataTable().page(arguments[0]).draw('page'); return true; }"
+        "return false;", pagina - 1
+    )
+    if pulou:
+        wait_for_loading_to_disappear(driver)
+        return True
+
+    # Sem a API do DataTables, avança clicando em 'Próximo' (sem processar as linhas)
+    for _ in range(pagina - 1):
+        if not ir_para_proxima_pagina_aracaju(driver):
+            logger.warning(f"Não foi possível chegar à página {pagina} para retomar a extração.")
+            return False
+    return True
+
+def _extrair_mes_selenium(driver, cidade_config: dict, ano: str, mes: str, manifesto=None) -> list:
+    """
+    Navega até a tabela de pagamentos, aplica o filtro do mês e percorre todas as páginas.
+    Com um 'manifesto' (ManifestoCheckpoint), cada página concluída é registrada e uma
+    execução interrompida retoma a partir da primeira página ainda não processada.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    cidade_nome = cidade_config['nome']
+    with medir_etapa("navegacao_inicial", PORTAL):
         driver.get(cidade_config['url'])
-        
+
         # Lógica de iframe (se existir no config)
         if iframe := cidade_config.get('nome_iframe'):
             WebDriverWait(driver, 10).until(EC.frame_to_be_available_and_switch_to_it((By.ID, iframe)))
@@ -273,34 +516,172 @@ def worker_processar_mes(cidade_config: dict, ano: str, mes: str, driver_path: s
         # Navegação inicial para a página de pagamentos
         WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, "//ul/li[4]/a"))).click()
         wait_for_loading_to_disappear(driver)
-        
-        selecionar_ano_mes_aracaju(driver, ano, mes)
-        
-        dados_do_mes = []
-        pagina_atual = 1
-        while True:
-            logger.info(f"Extraindo dados da página {pagina_atual}...")
-            extrair_dados_pagina_aracaju(driver, dados_do_mes)
-            
-            if not ir_para_proxima_pagina_aracaju(driver): break
-            pagina_atual += 1
-            
-        if dados_do_mes:
-            output_dir = os.path.join("data", "processed", cidade_nome)
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, f"{cidade_nome}_royalties_{ano}_{mes}.csv")
-            
-            df = pd.DataFrame(dados_do_mes)
-            df.to_csv(output_path, index=False, sep=';', encoding='utf-8-sig')
-            logger.info(f"Dados salvos para {cidade_nome} - {mes}/{ano} em {output_path}")
 
+    selecionar_ano_mes_aracaju(driver, ano, mes)
+
+    ajuste_pagina = None
+    if tamanho_pagina := cidade_config.get('tamanho_pagina'):
+        ajuste_pagina = maximizar_tamanho_pagina_aracaju(driver, tamanho_pagina)
+
+    dados_do_mes = []
+    pagina_atual = 1
+    # Linhas reprocessadas na segunda passagem (ou páginas relidas) não entram duas vezes
+    indice = IndiceDeduplicacao(rotulo=f"{cidade_nome} {mes}/{ano}")
+
+    paginas_salvas = manifesto.itens(cidade_nome, ano, mes, 'pagina') if manifesto else {}
+    if paginas_salvas:
+        ultima_pagina = max(int(pagina) for pagina in paginas_salvas)
+        if ir_para_pagina_aracaju(driver, ultima_pagina + 1):
+            for pagina in sorted(paginas_salvas, key=int):
+                dados_do_mes.extend(indice.filtrar(paginas_salvas[pagina]))
+            pagina_atual = ultima_pagina + 1
+            logger.info(f"Retomando {mes}/{ano} a partir da página {pagina_atual} ({len(dados_do_mes)} registros recuperados do checkpoint).")
+        else:
+            driver.refresh()
+            selecionar_ano_mes_aracaju(driver, ano, mes)
+
+    if (total_registros := _total_registros_aracaju(driver)) is not None:
+        progresso.dimensionar_tarefa(total_registros)
+
+    while True:
+        logger.info(f"Extraindo dados da página {pagina_atual}...")
+        registros_antes = len(dados_do_mes)
+        linhas_da_pagina = extrair_dados_pagina_aracaju(
+            driver, dados_do_mes,
+            em_lote=cidade_config.get('extracao_em_lote', False),
+            linhas_por_lote=cidade_config.get('linhas_por_lote', 200),
+            capturar_tudo=cidade_config.get('captura_bruta', False)
+        )
+        dados_do_mes[registros_antes:] = indice.filtrar(dados_do_mes[registros_antes:])
+        progresso.pagina_concluida(linhas_da_pagina, linhas_da_pagina, len(dados_do_mes) - registros_antes)
+        if manifesto:
+            manifesto.marcar(cidade_nome, ano, mes, 'pagina', pagina_atual, dados=dados_do_mes[registros_antes:])
+
+        if not ir_para_proxima_pagina_aracaju(driver): break
+        pagina_atual += 1
+
+    if ajuste_pagina and ajuste_pagina['total'] and ajuste_pagina['original'] > 0:
+        transicoes_padrao = math.ceil(ajuste_pagina['total'] / ajuste_pagina['original']) - 1
+        logger.info(f"Transições de página: {pagina_atual - 1} (sem o ajuste seriam {transicoes_padrao}; "
+                    f"economizadas: {transicoes_padrao - (pagina_atual - 1)}).")
+
+    indice.relatar()
+    return dados_do_mes
+
+def termos_royalties(cidade_config: dict) -> list:
+    """Termos usados na classificação offline: 'termos_royalties' da cidade ou a lista padrão do portal."""
+    return cidade_config.get('termos_royalties') or TERMOS_ROYALTIES
+
+def fabrica_navegador(cidade_config: dict, driver_path: str, headless: bool):
+    """Fábrica dos navegadores da cidade (portal e perfil), usada pelos workers e pelo pré-aquecimento do pool."""
+    return partial(start_driver_aracaju_family, headless=headless, executable_path=driver_path, perfil=cidade_config.get('perfil_navegador', 'padrao'))
+
+def usa_navegador(cidade_config: dict) -> bool:
+    """Com o motor HTTP, o navegador só é aberto no fallback; não vale pré-aquecê-lo."""
+    return cidade_config.get('motor_extracao') != 'http'
+
+def _finalizar_mes(dados_do_mes: list, cidade_config: dict, ano: str, mes: str, manifesto=None):
+    """Salva o mês (CSV e/ou Parquet) e o marca como concluído no checkpoint."""
+    logger = logging.getLogger('exdrop_osr')
+    cidade_nome = cidade_config['nome']
+    if dados_do_mes and cidade_config.get('captura_bruta'):
+        # Guarda todas as linhas e classifica em lote; reclassificar depois não exige nova raspagem
+        dados_do_mes = separar_brutos(dados_do_mes, cidade_nome, ano, mes, termos_royalties(cidade_config))
+    if dados_do_mes:
+        output_path = salvar_registros_mes(dados_do_mes, cidade_nome, ano, mes, cidade_config.get('formato_saida', 'csv'))
+        logger.info(f"Dados salvos para {cidade_nome} - {mes}/{ano} em {output_path}")
+    registrar_pagamentos(dados_do_mes, cidade_nome, ano, mes)
+    if manifesto:
+        manifesto.concluir_periodo(cidade_nome, ano, mes, dados={'registros': len(dados_do_mes)}, intermediarias=('pagina',))
+
+@perfilar_thread
+def worker_processar_mes(cidade_config: dict, ano: str, mes: str, driver_path: str, headless:bool, pool=None, manifesto=None,
+                         conexoes_http: Optional[int] = None):
+    cidade_nome = cidade_config['nome']
+    log_context.task_id = f"{cidade_nome.capitalize()}-{ano}-{mes}"
+    logger = logging.getLogger('exdrop_osr')
+
+    with progresso.acompanhar_tarefa(cidade_nome, ano, mes) as tarefa:
+        if manifesto and manifesto.concluido(cidade_nome, ano, mes):
+            logger.info(f"{mes}/{ano} já concluído em uma execução anterior (checkpoint). Pulando.")
+            tarefa['pulada'] = True
+            return
+        logger.info("Worker iniciado.")
+        politica(PORTAL).aguardar_liberacao()  # Não começa um mês com o portal fora do ar
+
+        # Motor HTTP (opcional): consulta os endpoints AJAX do portal sem abrir navegador.
+        # O Selenium abaixo só é usado se o motor HTTP não conseguir resolver o mês.
+        if cidade_config.get('motor_extracao') == 'http':
+            from src.scrapers.municipioonline_http import extrair_mes_http
+            try:
+                dados_do_mes, listadas = extrair_mes_http(cidade_config, ano, mes, max_conexoes=conexoes_http or _conexoes_http(cidade_config))
+                _finalizar_mes(dados_do_mes, cidade_config, ano, mes, manifesto)
+                # Só com o mês salvo: antes disso, uma falha leva ao Selenium, que emite as mesmas linhas
+                progresso.dimensionar_tarefa(listadas)
+                progresso.pagina_concluida(listadas, listadas, len(dados_do_mes))
+                tarefa['mantidas'] = len(dados_do_mes)
+                return
+            except Exception as e:
+                logger.warning(f"Motor HTTP falhou para {mes}/{ano} ({e}). Usando Selenium como fallback.")
+
+        try:
+            with obter_driver(pool, fabrica_navegador(cidade_config, driver_path, headless)) as driver:
+                dados_do_mes = _extrair_mes_selenium(driver, cidade_config, ano, mes, manifesto)
+
+            _finalizar_mes(dados_do_mes, cidade_config, ano, mes, manifesto)
+            tarefa['mantidas'] = len(dados_do_mes)
+
+        except Exception as e:
+            logger.error(f"Erro no worker para {cidade_nome} {mes}/{ano}: {e}")
+            tarefa['erro'] = str(e)
+
+def consolidar_ano(cidade_config: dict, ano: str):
+    """Une os CSVs mensais do ano em um arquivo consolidado."""
+    logger = logging.getLogger('exdrop_osr')
+    cidade_nome = cidade_config['nome']
+    log_context.task_id = f"{cidade_nome.capitalize()}-{ano}"
+    logger.info(f"Processamento de todos os meses de {ano} para {cidade_nome} concluído. Iniciando consolidação...")
+    try:
+        if gera_csv(cidade_config):  # A saída Parquet já é particionada e dispensa consolidação
+            unir_csvs_por_ano(cidade_nome=cidade_nome, ano=ano)
     except Exception as e:
-        logger.error(f"Erro no worker para {cidade_nome} {mes}/{ano}: {e}")
-    finally:
-        if driver: driver.quit()
+        logger.error(f"Falha ao consolidar arquivos para {cidade_nome} - {ano}: {e}")
+    logger.info(f"--- FINALIZADO PROCESSAMENTO DE {cidade_nome.upper()} - ANO DE {ano} ---")
 
-def run(cidade_config: dict, anos_para_processar: List[str], meses_para_processar: List[str], max_workers: int, headless:bool):
-    """Ponto de entrada que orquestra a extração para Aracaju, Barra ou Pirambu."""
+def _conexoes_http(cidade_config: dict, max_workers: Optional[int] = None) -> int:
+    """
+    Conexões simultâneas de um mês: 1 (o navegador) no Selenium; no motor HTTP,
+    'conexoes_http' da cidade, sem passar de 'max_workers' (o limite do portal, no agendador global).
+    """
+    if cidade_config.get('motor_extracao') != 'http':
+        return 1
+    from src.scrapers.municipioonline_http import CONEXOES_HTTP_PADRAO
+    conexoes = cidade_config.get('conexoes_http', CONEXOES_HTTP_PADRAO)
+    return max(1, min(conexoes, max_workers) if max_workers else conexoes)
+
+def planejar_tarefas(cidade_config: dict, anos_para_processar: List[str], meses_para_processar: List[str] | None,
+                     max_workers: int, driver_path: str, headless: bool, pool=None, manifesto=None) -> tuple[list, dict]:
+    """
+    Para o agendador global de main.py: retorna as tarefas [(chave, função, peso)] de cada
+    mês (um navegador cada, ou as conexões do motor HTTP) e, por ano, a função que deve
+    rodar quando todos os meses daquele ano terminarem.
+    """
+    meses = meses_para_processar or [f"{m:02d}" for m in range(1, 13)]
+    conexoes = _conexoes_http(cidade_config, max_workers)
+    tarefas = [
+        ((cidade_config['nome'], ano, mes),
+         partial(worker_processar_mes, cidade_config, ano, mes, driver_path, headless, pool=pool, manifesto=manifesto,
+                 conexoes_http=conexoes), conexoes)
+        for ano in anos_para_processar for mes in meses
+    ]
+    return tarefas, {ano: partial(consolidar_ano, cidade_config, ano) for ano in anos_para_processar}
+
+def run(cidade_config: dict, anos_para_processar: List[str], meses_para_processar: List[str], max_workers: int, headless:bool, pool=None, manifesto=None):
+    """
+    Ponto de entrada que orquestra a extração para Aracaju, Barra ou Pirambu.
+    Se 'pool' (DriverPool) for informado, os workers reutilizam os navegadores dele.
+    Se 'manifesto' (ManifestoCheckpoint) for informado, meses e páginas já concluídos são pulados.
+    """
     logger = logging.getLogger('exdrop_osr')
     cidade_nome = cidade_config['nome']
     
@@ -326,14 +707,19 @@ def run(cidade_config: dict, anos_para_processar: List[str], meses_para_processa
             meses = [f"{m:02d}" for m in range(1, 13)]
             
         tarefas = [(ano, mes) for mes in meses]
+        # No motor HTTP cada mês abre várias conexões: menos meses ao mesmo tempo, mesmo total
+        conexoes = _conexoes_http(cidade_config, max_workers)
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers // conexoes)) as executor:
             # Passa a configuração da cidade para cada worker
             func_com_args = partial(
                 worker_processar_mes,
                 cidade_config,
                 driver_path=driver_path,
-                headless=headless
+                headless=headless,
+                pool=pool,
+                manifesto=manifesto,
+                conexoes_http=conexoes
             )
             futures = [executor.submit(func_com_args, *tarefa) for tarefa in tarefas] # * crucial para desempacotar atupla (ano, mes)
             
@@ -344,11 +730,4 @@ def run(cidade_config: dict, anos_para_processar: List[str], meses_para_processa
                     logger.error(f"Uma tarefa para {cidade_nome} falhou: {e}")
         
         # --- CONSOLIDAÇÃO APÓS PROCESSAR TODOS OS MESES ---
-        logger.info(f"Processamento de todos os meses de {ano} para {cidade_nome} concluído. Iniciando consolidação...")
-        try:
-            unir_csvs_por_ano(cidade_nome=cidade_nome, ano=ano)
-        except Exception as e:
-            logger.error(f"Falha ao consolidar arquivos para {cidade_nome} - {ano}: {e}")
-        
-
-        logger.info(f"--- FINALIZADO PROCESSAMENTO DE {cidade_nome.upper()} - ANO DE {ano} ---")
\ No newline at end of file
+        consolidar_ano(cidade_config, ano)
\ No newline at end of file
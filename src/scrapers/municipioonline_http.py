@@ -0,0 +1,225 @@
+# src/scrapers/municipioonline_http.py
+
+"""
+Motor de extração HTTP para os portais municipioonline (família Serigy).
+
+Em vez de dirigir um Chrome pela tabela 'dataTables-Pagamentos', consulta
+diretamente os endpoints DataTables/AJAX que a própria página usa para montar
+a lista de pagamentos e o painel de detalhes ("Fonte de Recurso").
+Os registros gerados têm o mesmo formato dos de '_processar_linha_aracaju'.
+
+NÃO VALIDADO contra o portal real: os caminhos em ENDPOINTS_PADRAO e o formato
+do payload foram deduzidos, e só foram exercitados contra tools/portal_falso.py,
+que implementa essas mesmas suposições. Não há respostas gravadas do portal no
+repositório. Antes de usar "motor_extracao": "http" em produção, grave as
+respostas reais (aba Rede do navegador) e confira-as com
+tools/servidor_respostas_gravadas.py; sem isso, qualquer divergência só aparece
+como fallback para o Selenium.
+"""
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import List, Optional
+
+import requests
+from lxml import html as lxml_html
+
+from src.common.concorrencia import registrar_latencia, registrar_retentativa, registrar_timeout
+from src.common.deduplicacao import IndiceDeduplicacao
+from src.common.http_utils import criar_sessao_http
+from src.common.metricas import medir_etapa
+from src.common.retentativas import politica
+from src.scrapers.aracaju_barra_pirambu_scraper import PORTAL, TERMOS_ROYALTIES, normalizar
+
+# Ordem das colunas da tabela de pagamentos (a coluna 0 é o botão 'details-control')
+COLUNAS_PAGAMENTOS = ['orgao', 'unidade', 'data', 'empenho', 'processo', 'credor', 'cpf_cnpj', 'pago', 'retido', 'anulacao']
+
+# Caminhos relativos à URL da cidade (suposições não conferidas no portal real). Podem
+# ser sobrescritos em config.json pela chave "endpoints_http" (copie-os da aba Rede do navegador).
+ENDPOINTS_PADRAO = {
+    "pagamentos": "pagamentos",
+    "detalhe": "pagamentos/detalhe",
+}
+
+TAMANHO_PAGINA_HTTP = 500
+CONEXOES_HTTP_PADRAO = 8  # Detalhes baixados ao mesmo tempo em um mês (ver 'conexoes_http')
+TENTATIVAS_HTTP = 3
+RE_DATA_ID = re.compile(r'data-id=["\']([^"\']+)["\']')
+
+
+class MotorHttpIndisponivel(Exception):
+    """Indica que o motor HTTP não conseguiu resolver o mês e o Selenium deve assumir."""
+
+
+_cidades_avisadas = set()
+
+def _avisar_nao_validado(cidade_config: dict):
+    """Avisa uma vez por cidade que o motor não foi conferido contra o portal real."""
+    nome = cidade_config.get('nome', '')
+    if nome not in _cidades_avisadas:
+        _cidades_avisadas.add(nome)
+        logging.getLogger('exdrop_osr').warning(
+            f"Motor HTTP de '{nome}' é experimental e não foi validado contra o portal real "
+            f"(endpoints e payload deduzidos); confira os resultados com o Selenium."
+        )
+
+def _montar_endpoints(cidade_config: dict) -> dict:
+    url_base = cidade_config['url'].rstrip('/')
+    endpoints = {**ENDPOINTS_PADRAO, **(cidade_config.get('endpoints_http') or {})}
+    return {
+        nome: caminho if caminho.startswith('http') else f"{url_base}/{caminho.lstrip('/')}"
+        for nome, caminho in endpoints.items()
+    }
+
+def _texto_celula(valor) -> str:
+    """Converte o conteúdo de uma célula (que pode vir como HTML) em texto limpo."""
+    if valor is None:
+        return ""
+    valor = str(valor)
+    if '<' in valor:
+        valor = lxml_html.fragment_fromstring(valor, create_parent='div').text_content()
+    return " ".join(valor.split())
+
+def _requisitar(sessao, metodo: str, url: str, etapa: Optional[str] = None, timeout: float = 30, **kwargs):
+    """
+    Faz a requisição sob a política do portal, como as páginas do Selenium: espera o
+    disjuntor, informa sucesso/falha e a latência (ControladorAIMD) e refaz com o
+    backoff e o orçamento do portal. Um 4xx (endpoint errado) não conta como portal fora do ar.
+    """
+    politica_portal = politica(PORTAL)
+    for tentativa in range(1, TENTATIVAS_HTTP + 1):
+        politica_portal.aguardar_liberacao()
+        inicio = time.perf_counter()
+        try:
+            with medir_etapa(etapa, PORTAL) if etapa else nullcontext():
+                resposta = sessao.request(metodo, url, timeout=timeout, **kwargs)
+                resposta.raise_for_status()
+        except requests.RequestException as e:
+            status = getattr(e.response, 'status_code', None)
+            if status is not None and status < 500 and status != 429:
+                raise
+            if isinstance(e, requests.Timeout):
+                registrar_timeout(PORTAL)
+            politica_portal.registrar_falha()
+            if tentativa == TENTATIVAS_HTTP or not politica_portal.aguardar_retentativa(tentativa):
+                raise
+            registrar_retentativa(PORTAL)
+            continue
+        registrar_latencia(PORTAL, time.perf_counter() - inicio)
+        politica_portal.registrar_sucesso()
+        return resposta
+
+def _obter_token(sessao, url_pagina: str) -> dict:
+    """
+    Abre a página de despesas para iniciar a sessão (cookies) e captura o token
+    anti-falsificação do ASP.NET, quando existir.
+    """
+    resposta = _requisitar(sessao, 'GET', url_pagina)
+    token = lxml_html.fromstring(resposta.content).xpath("//input[@name='__RequestVerificationToken']/@value")
+    return {'__RequestVerificationToken': token[0]} if token else {}
+
+def _linha_para_registro(linha) -> tuple[dict, Optional[str]]:
+    """Converte uma linha do JSON do DataTables no dicionário base e no id do detalhe."""
+    if isinstance(linha, dict):
+        id_detalhe = linha.get('DT_RowId') or linha.get('id')
+        registro = {coluna: _texto_celula(linha.get(coluna)) for coluna in COLUNAS_PAGAMENTOS}
+        return registro, str(id_detalhe) if id_detalhe is not None else None
+
+    celulas = list(linha)
+    id_detalhe = None
+    if len(celulas) > len(COLUNAS_PAGAMENTOS):
+        # Primeira célula é o 'details-control', que carrega o id do pagamento
+        if match := RE_DATA_ID.search(str(celulas[0] or "")):
+            id_detalhe = match.group(1)
+        celulas = celulas[1:]
+    registro = {coluna: _texto_celula(valor) for coluna, valor in zip(COLUNAS_PAGAMENTOS, celulas)}
+    return registro, id_detalhe
+
+def listar_pagamentos_http(sessao, endpoints: dict, ano: str, mes: str, token: dict) -> List[tuple[dict, Optional[str]]]:
+    """Busca todas as linhas do mês no endpoint DataTables, em páginas de TAMANHO_PAGINA_HTTP."""
+    logger = logging.getLogger('exdrop_osr')
+    linhas = []
+    inicio = 0
+    draw = 1
+    while True:
+        payload = {'draw': draw, 'start': inicio, 'length': TAMANHO_PAGINA_HTTP, 'ano': ano, 'mes': mes, **token}
+        resposta = _requisitar(sessao, 'POST', endpoints['pagamentos'], "troca_pagina", timeout=60, data=payload)
+        corpo = resposta.json()
+
+        dados = corpo.get('data') or []
+        linhas.extend(_linha_para_registro(linha) for linha in dados)
+        total = int(corpo.get('recordsFiltered', corpo.get('recordsTotal', len(linhas))))
+        logger.info(f"HTTP: {len(linhas)}/{total} pagamentos listados para {mes}/{ano}.")
+
+        if not dados or len(linhas) >= total:
+            return linhas
+        inicio += len(dados)
+        draw += 1
+
+def obter_detalhes_http(sessao, endpoints: dict, id_detalhe: str, token: dict) -> dict:
+    """Busca o painel de detalhes de um pagamento e devolve os pares th/td normalizados."""
+    resposta = _requisitar(sessao, 'GET', endpoints['detalhe'], "detalhe", params={'id': id_detalhe, **token})
+
+    documento = lxml_html.fromstring(resposta.text)
+    dados_detalhes = {}
+    for linha_det in documento.xpath("//table//tr[th and td]"):
+        chave = linha_det.xpath("string(./th)").strip().replace(":", "")
+        valor = " ".join(linha_det.xpath("string(./td)").split())
+        chave_norm = normalizar(chave).replace(" ", "_")
+        if chave_norm:
+            dados_detalhes[chave_norm] = valor
+    return dados_detalhes
+
+def extrair_mes_http(cidade_config: dict, ano: str, mes: str, sessao=None, max_conexoes: int = CONEXOES_HTTP_PADRAO) -> tuple[List[dict], int]:
+    """
+    Extrai os pagamentos de royalties de um mês usando apenas HTTP (todos os
+    pagamentos, com 'captura_bruta') e retorna (registros, pagamentos listados).
+    Levanta MotorHttpIndisponivel se o portal não responder no formato esperado.
+    Nenhum evento de progresso é emitido aqui: quem chama os emite depois que o mês
+    der certo, para que o fallback Selenium não conte as mesmas linhas duas vezes.
+    'max_conexoes' conta no limite do portal: o agendador global reserva essa quantidade de vagas para o mês.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    _avisar_nao_validado(cidade_config)
+    sessao = sessao or criar_sessao_http(tamanho_pool=max_conexoes)
+    endpoints = _montar_endpoints(cidade_config)
+
+    try:
+        token = _obter_token(sessao, cidade_config['url'])
+        linhas = listar_pagamentos_http(sessao, endpoints, ano, mes, token)
+    except Exception as e:
+        raise MotorHttpIndisponivel(f"Falha ao listar pagamentos via HTTP: {e}") from e
+
+    if any(id_detalhe is None for _, id_detalhe in linhas):
+        raise MotorHttpIndisponivel("Resposta do DataTables não traz o id do detalhe de todas as linhas.")
+
+    # Os detalhes são buscados em paralelo, reaproveitando as conexões da mesma sessão
+    with ThreadPoolExecutor(max_workers=max_conexoes) as executor:
+        try:
+            detalhes = list(executor.map(lambda linha: obter_detalhes_http(sessao, endpoints, linha[1], token), linhas))
+        except Exception as e:
+            raise MotorHttpIndisponivel(f"Falha ao buscar detalhes via HTTP: {e}") from e
+
+    capturar_tudo = cidade_config.get('captura_bruta', False)
+    dados_do_mes = []
+    for indice, ((registro, _), dados_detalhes) in enumerate(zip(linhas, detalhes)):
+        fonte_recurso_valor = dados_detalhes.get("fonte_de_recurso")
+        eh_royalties = bool(fonte_recurso_valor) and any(termo in normalizar(fonte_recurso_valor) for termo in TERMOS_ROYALTIES)
+        if eh_royalties or capturar_tudo:
+            if eh_royalties:
+                logger.debug(f"Linha {indice + 1}: Royalties detectados.")
+            registro.update(dados_detalhes)
+            dados_do_mes.append(registro)
+
+    indice = IndiceDeduplicacao(rotulo=f"{cidade_config.get('nome', '')} {mes}/{ano}")
+    dados_do_mes = indice.filtrar(dados_do_mes)
+    indice.relatar()
+
+    if capturar_tudo:
+        logger.info(f"HTTP: {len(dados_do_mes)} pagamentos de {mes}/{ano} capturados (captura bruta).")
+    else:
+        logger.info(f"HTTP: {len(dados_do_mes)} de {len(linhas)} pagamentos de {mes}/{ano} são de royalties.")
+    return dados_do_mes, len(linhas)
@@ -0,0 +1,180 @@
+# src/scrapers/pacatuba_async.py
+
+"""
+Crawler assíncrono (asyncio + aiohttp) para as páginas de detalhe de Pacatuba.
+
+Mantém centenas de requisições em andamento em um único event loop, com:
+  - semáforo por host, limitando as conexões simultâneas a cada servidor;
+  - conexões keep-alive reaproveitadas pelo TCPConnector do aiohttp;
+  - token bucket limitando a taxa de requisições por segundo (evita bloqueio);
+  - a política do portal (disjuntor, orçamento e backoff com jitter) e o ControladorAIMD,
+    como nos workers com threads.
+Ao final, registra requisições/s e as latências p50/p95.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import List
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from src.common.concorrencia import registrar_latencia, registrar_retentativa, registrar_timeout
+from src.common.http_utils import USER_AGENT_PADRAO
+from src.common.logging_setup import log_context
+from src.common.metricas import registrar_duracao
+from src.common.retentativas import politica
+from src.scrapers.pacatuba_http import ler_detalhe_pacatuba
+from src.scrapers.pacatuba_scraper import PORTAL, classificar_detalhe
+
+CONFIG_ASYNC_PADRAO = {
+    "concorrencia": 200,            # Requisições em andamento no total
+    "limite_por_host": 32,          # Requisições simultâneas por host
+    "requisicoes_por_segundo": 20,  # Taxa sustentada do token bucket
+    "rajada": 40,                   # Capacidade do token bucket
+    "tentativas": 3,
+}
+
+
+class TokenBucket:
+    """Limitador de taxa: libera no máximo 'taxa' requisições/s, com rajadas de até 'capacidade'."""
+
+    def __init__(self, taxa: float, capacidade: int):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.taxa)
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+async def _crawl(links: List[str], config: dict, ao_processar_link=None, capturar_tudo: bool = False,
+                 guardar_detalhe=None) -> tuple[List[dict], List[float], int]:
+    logger = logging.getLogger('exdrop_osr')
+    bucket = TokenBucket(config["requisicoes_por_segundo"], config["rajada"])
+    semaforos_por_host = defaultdict(lambda: asyncio.Semaphore(config["limite_por_host"]))
+    semaforo_global = asyncio.Semaphore(config["concorrencia"])
+    politica_portal = politica(PORTAL)
+    latencias = []
+    falhas = 0
+    dados_coletados = []
+
+    conector = aiohttp.TCPConnector(
+        limit=config["concorrencia"], limit_per_host=config["limite_por_host"], keepalive_timeout=30
+    )
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async with aiohttp.ClientSession(connector=conector, timeout=timeout, headers={"User-Agent": USER_AGENT_PADRAO}) as sessao:
+
+        async def aguardar_liberacao():
+            # O disjuntor bloqueia a thread; só vai para o executor quando está aberto
+            if not politica_portal.liberado():
+                await asyncio.get_running_loop().run_in_executor(None, politica_portal.aguardar_liberacao)
+
+        async def baixar(link: str) -> bytes:
+            host = urlsplit(link).netloc
+            await aguardar_liberacao()
+            async with semaforo_global, semaforos_por_host[host]:
+                await bucket.adquirir()
+                inicio = time.perf_counter()
+                async with sessao.get(link) as resposta:
+                    resposta.raise_for_status()
+                    conteudo = await resposta.read()
+                latencia = time.perf_counter() - inicio
+                latencias.append(latencia)
+                registrar_latencia(PORTAL, latencia)
+                politica_portal.registrar_sucesso()
+                return conteudo
+
+        async def buscar(link: str):
+            # Os semáforos só são mantidos durante a requisição: o backoff entre tentativas
+            # e o parsing (lxml, em uma thread do executor) não ocupam vagas do host
+            nonlocal falhas
+            loop = asyncio.get_running_loop()
+            for tentativa in range(1, config["tentativas"] + 1):
+                try:
+                    conteudo = await baixar(link)
+                    detalhe = await loop.run_in_executor(None, ler_detalhe_pacatuba, conteudo, link, capturar_tudo)
+                    if detalhe is None:
+                        logger.warning(f"Campo 'fonte_recurso' não encontrado no link {link}. Pulando.")
+                    elif guardar_detalhe:
+                        guardar_detalhe(link, detalhe)
+                    dados = classificar_detalhe(detalhe, capturar_tudo)
+                    if dados:
+                        logger.info(f"Royalties encontrados (Fonte: '{dados['fonte_recurso']}'). Dados extraídos do link: {link}")
+                        dados_coletados.append(dados)
+                    if ao_processar_link:
+                        ao_processar_link(link, dados or {})
+                    return
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # Um 4xx (link inválido) não indica portal fora do ar nem vale nova tentativa
+                    status = getattr(e, 'status', None)
+                    if status is None or status >= 500 or status == 429:
+                        if isinstance(e, asyncio.TimeoutError):
+                            registrar_timeout(PORTAL)
+                        politica_portal.registrar_falha()
+                        if tentativa < config["tentativas"] and politica_portal.reservar_retentativa():
+                            registrar_retentativa(PORTAL)
+                            espera = politica_portal.calcular_espera(tentativa)
+                            logger.debug(f"Aguardando {espera:.1f}s antes da tentativa {tentativa + 1} do link {link}.")
+                            await asyncio.sleep(espera)
+                            politica_portal.registrar_espera(espera)
+                            continue
+                    falhas += 1
+                    logger.error(f"Erro ao processar o link {link}: {type(e).__name__}: {e}")
+                    return
+                except Exception as e:
+                    falhas += 1
+                    logger.error(f"Erro ao processar o link {link}: {e}")
+                    return
+
+        await asyncio.gather(*(buscar(link) for link in links))
+
+    return dados_coletados, latencias, falhas
+
+def extrair_detalhes_async(links: List[str], ano_alvo: str, config_async: dict | None = None, ao_processar_link=None, capturar_tudo: bool = False,
+                           guardar_detalhe=None) -> List[dict]:
+    """
+    Fase 2 alternativa: processa todos os links de uma vez no event loop e
+    retorna os registros de royalties no mesmo formato dos demais workers.
+    'ao_processar_link(link, registro)' é chamado para cada link processado com sucesso;
+    'guardar_detalhe(link, detalhe)' recebe o registro antes da classificação (para o cache).
+    """
+    log_context.task_id = f"Pacatuba-{ano_alvo}-Async"
+    logger = logging.getLogger('exdrop_osr')
+    config = {**CONFIG_ASYNC_PADRAO, **(config_async or {})}
+    logger.info(f"Crawler assíncrono iniciado para {len(links)} links "
+                f"(concorrência {config['concorrencia']}, {config['limite_por_host']}/host, "
+                f"{config['requisicoes_por_segundo']} req/s).")
+
+    inicio = time.perf_counter()
+    dados_coletados, latencias, falhas = asyncio.run(_crawl(links, config, ao_processar_link, capturar_tudo, guardar_detalhe))
+    duracao = time.perf_counter() - inicio
+    for latencia in latencias:
+        registrar_duracao("detalhe", PORTAL, latencia)
+
+    logger.info(
+        f"Crawler assíncrono finalizado: {len(latencias)} requisições em {duracao:.1f}s "
+        f"({len(latencias) / duracao if duracao else 0:.2f} req/s), "
+        f"latência p50={_percentil(latencias, 0.50) * 1000:.0f}ms p95={_percentil(latencias, 0.95) * 1000:.0f}ms, "
+        f"{falhas} falha(s)."
+    )
+    return dados_coletados
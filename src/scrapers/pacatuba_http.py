@@ -0,0 +1,118 @@
+# src/scrapers/pacatuba_http.py
+
+"""
+Extração das páginas de detalhe de Pacatuba ('detalhesPagamento') sem navegador.
+
+As páginas são baixadas com uma sessão HTTP com pool de conexões e analisadas
+com XPaths pré-compilados do lxml, produzindo o mesmo dicionário que
+'worker_extrair_detalhes_pacatuba' monta via Selenium.
+"""
+
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import requests
+from lxml import etree, html as lxml_html
+
+from src.common.concorrencia import registrar_latencia, registrar_timeout
+from src.common.http_utils import criar_sessao_http
+from src.common.logging_setup import log_context
+from src.common.metricas import medir_etapa
+from src.common.retentativas import politica
+from src.scrapers.pacatuba_scraper import PORTAL, TERMOS_ROYALTIES, XPATHS_DETALHES, classificar_detalhe, normalizar
+
+# O lxml não insere <tbody> automaticamente como o navegador faz; o XPath
+# compilado aceita a tabela com ou sem ele.
+XPATHS_COMPILADOS = {
+    campo: etree.XPath(xpath.replace('/tbody/tr', '//tr'))
+    for campo, xpath in XPATHS_DETALHES.items()
+}
+
+def _texto_elemento(elementos: list) -> Optional[str]:
+    """Reproduz o '.text.strip()' do Selenium: espaços colapsados, quebras de linha preservadas."""
+    if not elementos:
+        return None
+    for quebra in elementos[0].iter('br'):
+        quebra.tail = "\n" + (quebra.tail or "")
+    linhas = (" ".join(linha.split()) for linha in elementos[0].text_content().splitlines())
+    return "\n".join(linha for linha in linhas if linha)
+
+def ler_detalhe_pacatuba(conteudo_html, link: str, capturar_tudo: bool = False) -> Optional[dict]:
+    """
+    Analisa o HTML de uma página de detalhe e retorna o registro extraído: completo se
+    a fonte de recurso for de royalties (ou sempre, com 'capturar_tudo'), só com a fonte
+    e o link se não for, e None se a página não tiver o campo 'fonte_recurso'.
+    """
+    documento = lxml_html.fromstring(conteudo_html)
+
+    fonte_recurso_texto = _texto_elemento(XPATHS_COMPILADOS['fonte_recurso'](documento))
+    if fonte_recurso_texto is None:
+        return None
+    fonte_recurso_texto = normalizar(fonte_recurso_texto)
+
+    dados_completos = {'fonte_recurso': fonte_recurso_texto, 'link_detalhe': link}
+    if not capturar_tudo and not (fonte_recurso_texto and any(termo in fonte_recurso_texto for termo in TERMOS_ROYALTIES)):
+        return dados_completos
+
+    for nome_campo, xpath in XPATHS_COMPILADOS.items():
+        if nome_campo == 'fonte_recurso': continue
+        dados_completos[nome_campo] = _texto_elemento(xpath(documento))
+    return dados_completos
+
+def parsear_detalhes_pacatuba(conteudo_html, link: str, capturar_tudo: bool = False) -> Optional[dict]:
+    """Como 'ler_detalhe_pacatuba', mas devolve {} para os links que não são de royalties."""
+    detalhe = ler_detalhe_pacatuba(conteudo_html, link, capturar_tudo)
+    return None if detalhe is None else classificar_detalhe(detalhe, capturar_tudo)
+
+def worker_extrair_detalhes_pacatuba_http(links: List[str], ano_alvo: str, sessao=None, ao_processar_link=None, capturar_tudo: bool = False,
+                                          guardar_detalhe=None) -> List[dict]:
+    """
+    Equivalente HTTP de 'worker_extrair_detalhes_pacatuba' (inclusive o callback 'ao_processar_link'
+    e a política do portal). 'guardar_detalhe(link, detalhe)' recebe o registro extraído antes da
+    classificação (para o cache).
+    """
+    log_context.task_id = f"Pacatuba-HTTP-{threading.get_ident() % 1000}"
+    logger = logging.getLogger('exdrop_osr')
+
+    logger.info(f"Worker HTTP iniciado. Processando {len(links)} links.")
+    sessao = sessao or criar_sessao_http()
+    dados_coletados_pela_thread = []
+    politica_portal = politica(PORTAL)
+    inicio = time.perf_counter()
+
+    for i, link in enumerate(links):
+        try:
+            logger.debug(f"Baixando link {i+1}/{len(links)}.")
+            politica_portal.aguardar_liberacao()
+            inicio_link = time.perf_counter()
+            with medir_etapa("detalhe", PORTAL):
+                resposta = sessao.get(link, timeout=30)
+                resposta.raise_for_status()
+            registrar_latencia(PORTAL, time.perf_counter() - inicio_link)
+            politica_portal.registrar_sucesso()
+
+            detalhe = ler_detalhe_pacatuba(resposta.content, link, capturar_tudo)
+            if detalhe is None:
+                logger.warning(f"Campo 'fonte_recurso' não encontrado no link {link}. Pulando.")
+            elif guardar_detalhe:
+                guardar_detalhe(link, detalhe)
+            dados = classificar_detalhe(detalhe, capturar_tudo)
+            if dados:
+                logger.info(f"Royalties encontrados (Fonte: '{dados['fonte_recurso']}'). Dados extraídos do link: {link}")
+                dados_coletados_pela_thread.append(dados)
+            if ao_processar_link:
+                ao_processar_link(link, dados or {})
+        except Exception as e_link:
+            logger.error(f"Erro ao processar o link {link}: {e_link}")
+            # Um 4xx (link inválido) não indica portal sobrecarregado, como em 'municipioonline_http'
+            status = getattr(getattr(e_link, 'response', None), 'status_code', None)
+            if isinstance(e_link, requests.RequestException) and (status is None or status >= 500 or status == 429):
+                if isinstance(e_link, requests.Timeout):
+                    registrar_timeout(PORTAL)
+                politica_portal.registrar_falha()
+
+    duracao = time.perf_counter() - inicio
+    logger.info(f"Worker HTTP finalizado. {len(links)} links em {duracao:.1f}s ({len(links) / duracao if duracao else 0:.2f} links/s).")
+    return dados_coletados_pela_thread
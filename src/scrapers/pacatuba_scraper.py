@@ -1,17 +1,19 @@
 # src/scrapers/pacatuba_scraper.py
 
 import logging
+import math
 import os
+import queue
 import re
 import threading
 import time
 import unicodedata
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
 from functools import partial
 from typing import List
 
 
-import numpy
 import pandas as pd
 from selenium import webdriver
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
@@ -24,15 +26,55 @@ from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
 # Importa o logger e o contexto da thread do nosso módulo comum
+from src.common.browser_profile import aplicar_perfil_enxuto, ativar_bloqueio_recursos
+from src.common.cache_detalhes import CAMINHO_CACHE_PADRAO, CacheDetalhes
+from src.common.classificacao import separar_brutos
+from src.common.agendador import AgendadorLotes
+from src.common.concorrencia import obter_controlador, registrar_latencia, registrar_retentativa, registrar_timeout
+from src.common.armazem import registrar_pagamentos
+from src.common.deduplicacao import IndiceDeduplicacao
+from src.common.driver_pool import DriverPool, obter_driver
+from src.common.metricas import cronometrar, medir_etapa
+from src.common.perfilador import perfilar_driver, perfilar_thread, registrar_unidade
+from src.common import progresso
+from src.common.retentativas import politica
 from src.common.logging_setup import log_context
-from src.common.file_utils import unir_csvs_por_ano
+from src.common.file_utils import gera_csv, gera_parquet, salvar_registros_mes, unir_csvs_por_ano
+from src.common.parquet_utils import salvar_parquet
 
 # --- Constantes e Funções Auxiliares Específicas de Pacatuba ---
 
+# Portal dos scrapers deste módulo, usado pelo agendador global e pelo controle de concorrência por servidor
+PORTAL = "pacatuba"
+
 TERMOS_ROYALTIES = ["royaltie", "royalty", "petroleo"]
 
+# Saltos exponenciais da descoberta do total de páginas: se a página com_registros * 2**10
+# ainda lista pagamentos, o portal provavelmente devolve a última página para números fora
+# do intervalo, e a coleta passa a ser sequencial
+SALTOS_MAXIMOS_PAGINACAO = 10
+
 RE_REMOVE_PUNCTUATION = re.compile(r'[^a-zA-Z0-9\s]')
 
+# Mapa de XPaths para todos os campos na página de detalhes.
+XPATHS_DETALHES = {
+    'empenho':          '//*[@id="table-dados"]/tbody/tr[2]/td[1]',
+    'credor':           '//*[@id="table-dados"]/tbody/tr[2]/td[2]',
+    'data_nota':        '//*[@id="table-dados"]/tbody/tr[2]/td[3]',
+
+    'processo':         '//*[@id="table-dados"]/tbody/tr[4]/th[1]',
+    'fonte_recurso':    '//*[@id="table-dados"]/tbody/tr[4]/th[2]',
+    'numero_documento': '//*[@id="table-dados"]/tbody/tr[4]/th[3]',
+
+    'valor_pago':       '//*[@id="table-dados"]/tbody/tr[6]/td[1]',
+    'valor_retido':     '//*[@id="table-dados"]/tbody/tr[6]/td[2]',
+    'forma_pagamento':  '//*[@id="table-dados"]/tbody/tr[6]/td[3]',
+
+    'historico':        '//*[@id="table-historico"]/tbody/tr/td',
+    'relacionado_covid':'//*[@id="table-outras-informacoes"]/tbody/tr/td[1]',
+    'relacionado_LC173':'//*[@id="table-outras-informacoes"]/tbody/tr/td[2]'
+}
+
 def normalizar(texto: str) -> str:
     """
     Normaliza um texto removendo acentos, pontuações e convertendo para minúsculas.
@@ -45,7 +87,8 @@ def normalizar(texto: str) -> str:
 
 # --- Funções de Interação com Selenium para Pacatuba ---
 
-def start_driver_pacatuba(headless=False, executable_path=None) -> webdriver.Chrome:
+@cronometrar("inicio_driver", "navegador")
+def start_driver_pacatuba(headless=False, executable_path=None, perfil="padrao", capturar_rede=False) -> webdriver.Chrome:
     logger = logging.getLogger('exdrop_osr')
     logger.info("Iniciando driver do Chrome para Pacatuba...")
     options = webdriver.ChromeOptions()
@@ -61,6 +104,10 @@ def start_driver_pacatuba(headless=False, executable_path=None) -> webdriver.Chr
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_argument("--disable-dev-shm-usage")
     
+    if perfil == "enxuto":
+        aplicar_perfil_enxuto(options)
+    if capturar_rede:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
     # Lógica para usar o caminho pré-instalado ou o WebDriverManager
     if executable_path:
         service = ChromeService(executable_path=executable_path)
@@ -68,8 +115,11 @@ def start_driver_pacatuba(headless=False, executable_path=None) -> webdriver.Chr
         service = ChromeService(ChromeDriverManager().install())
     
     driver = webdriver.Chrome(service=service, options=options)
-    return driver
+    if perfil == "enxuto":
+        ativar_bloqueio_recursos(driver)
+    return perfilar_driver(driver)
 
+@cronometrar("selecionar_dropdown", PORTAL)
 def selecionar_dropdown_pacatuba(driver, container_id, texto):
     logger = logging.getLogger('exdrop_osr')
     try:
@@ -86,13 +136,17 @@ def selecionar_dropdown_pacatuba(driver, container_id, texto):
         logger.error(f"Erro ao selecionar {texto} no campo {container_id}: {e}")
         raise
 
+@cronometrar("troca_pagina", PORTAL)
 def ir_para_proxima_pagina_pacatuba(driver, tentativas_maximas=3):
     """
     Tenta clicar no botão 'Próxima Página' com lógica de retentativas.
+    As esperas entre tentativas seguem a política de retentativas do portal.
     """
-    logger = logging.getLogger('osr_project')
+    logger = logging.getLogger('exdrop_osr')
+    politica_portal = politica(PORTAL)
     
     for tentativa in range(1, tentativas_maximas + 1):
+        politica_portal.aguardar_liberacao()
         try:
             logger.info(f"Tentando navegar para a próxima página (Tentativa {tentativa}/{tentativas_maximas})...")
             
@@ -106,8 +160,10 @@ def ir_para_proxima_pagina_pacatuba(driver, tentativas_maximas=3):
             
             if "disabled" in parent_li.get_attribute("class"):
                 logger.info("Última página alcançada.")
+                politica_portal.registrar_sucesso()
                 return False
 
+            inicio = time.perf_counter()
             driver.execute_script("arguments[0].click();", botao)
             logger.info("Navegando para a próxima página de resultados.")
             
@@ -120,12 +176,16 @@ def ir_para_proxima_pagina_pacatuba(driver, tentativas_maximas=3):
             
             # Opcional: uma espera adicional para a visibilidade da nova tabela
             WebDriverWait(driver, 10).until(EC.visibility_of_element_located((By.XPATH, "//table/tbody")))
+            registrar_latencia(PORTAL, time.perf_counter() - inicio)
+            politica_portal.registrar_sucesso()
             
             logger.debug("Navegou para a próxima página com sucesso.")
             return True
         
         except (TimeoutException, NoSuchElementException) as e:
                 logger.warning(f"Falha na tentativa {tentativa}: {type(e).__name__}. Verificando se é o fim da paginação.")
+                registrar_retentativa(PORTAL)
+                politica_portal.registrar_falha()
                 
                 # Checa novamente se o botão de próximo existe e está desabilitado
                 try:
@@ -135,12 +195,12 @@ def ir_para_proxima_pagina_pacatuba(driver, tentativas_maximas=3):
                 except:
                     pass # Se não encontrar, continua para a próxima tentativa
 
-                if tentativa < tentativas_maximas:
-                    tempo_espera = 5 * tentativa # Espera 5s, 10s...
-                    logger.info(f"Aguardando {tempo_espera} segundos antes da próxima tentativa.")
-                    time.sleep(tempo_espera)
-                    driver.refresh() # Recarrega a página para tentar "desbloquear"
-                    WebDriverWait(driver, 20).until(EC.visibility_of_element_located((By.XPATH, "//table/tbody")))
+                if tentativa < tentativas_maximas and politica_portal.aguardar_retentativa(tentativa):
+                    try:
+                        driver.refresh() # Recarrega a página para tentar "desbloquear"
+                        WebDriverWait(driver, 20).until(EC.visibility_of_element_located((By.XPATH, "//table/tbody")))
+                    except TimeoutException:
+                        logger.warning("A tabela não reapareceu após recarregar a página.")
                 else:
                     logger.error("Número máximo de tentativas atingido. Abortando a paginação.")
                     
@@ -159,180 +219,363 @@ def ir_para_proxima_pagina_pacatuba(driver, tentativas_maximas=3):
                     # --- FIM DO DIAGNÓSTICO ---
                     return False # Desiste após todas as tentativas
         
-        return False
+    return False
             
+# --- Checkpoint ---
+
+def _separar_links_processados(manifesto, links: List[str], *prefixo) -> tuple[List[str], List[dict]]:
+    """
+    Separa os links ainda pendentes dos já processados em uma execução anterior.
+    Retorna (links_pendentes, registros_de_royalties_ja_extraidos).
+    """
+    if not manifesto:
+        return links, []
+    processados = manifesto.itens(*prefixo, 'link')
+    pendentes = [link for link in links if link not in processados]
+    registros_anteriores = [dados for dados in processados.values() if dados]
+    if processados:
+        logging.getLogger('exdrop_osr').info(
+            f"Checkpoint: {len(links) - len(pendentes)} links já processados, {len(pendentes)} pendentes."
+        )
+    return pendentes, registros_anteriores
+
+def classificar_detalhe(detalhe: dict, capturar_tudo: bool = False) -> dict:
+    """O registro extraído, se a fonte de recurso for de royalties (ou sempre, com 'capturar_tudo'); senão {}."""
+    fonte_recurso = (detalhe or {}).get('fonte_recurso')
+    if detalhe and (capturar_tudo or (fonte_recurso and any(termo in fonte_recurso for termo in TERMOS_ROYALTIES))):
+        return detalhe
+    return {}
+
+def _detalhe_completo(detalhe: dict) -> bool:
+    # Dos links que não são de royalties só a fonte de recurso é extraída
+    return any(campo in detalhe for campo in XPATHS_DETALHES if campo != 'fonte_recurso')
+
+def _aproveitar_cache(cache, links: List[str], ao_processar_link=None, capturar_tudo: bool = False) -> tuple[List[dict], List[str]]:
+    """
+    Retorna (registros de royalties já em cache, links que ainda precisam ser visitados).
+    O cache guarda o detalhe extraído e a classificação é refeita a cada leitura; um link
+    que passou a ser de royalties, mas do qual só a fonte foi guardada, é visitado de novo.
+    """
+    if not cache:
+        return [], links
+    pendentes, em_cache = cache.separar(links)
+    registros, aproveitados = [], 0
+    for link, detalhe in em_cache.items():
+        registro = classificar_detalhe(detalhe, capturar_tudo)
+        if not detalhe or (registro and not _detalhe_completo(registro)):
+            pendentes.append(link)
+            continue
+        aproveitados += 1
+        if registro:
+            registros.append(registro)
+        if ao_processar_link:
+            ao_processar_link(link, registro)
+    if aproveitados:
+        logging.getLogger('exdrop_osr').info(f"Cache: {aproveitados} de {len(links)} links já extraídos anteriormente.")
+    return registros, pendentes
+
+def _sem_duplicatas(registros: List[dict], periodo: str) -> List[dict]:
+    """Descarta registros repetidos (mesmo link de detalhe), p.ex. vindos do checkpoint e de uma nova extração."""
+    indice = IndiceDeduplicacao(rotulo=f"Pacatuba {periodo}")
+    registros = indice.filtrar(registros)
+    indice.relatar()
+    return registros
+
+def _criar_cache(cidade_config: dict):
+    """
+    Cria o cache de detalhes da cidade. Na captura bruta o cache fica em um arquivo
+    próprio, já que no modo normal só a fonte de recurso dos links que não são de
+    royalties é guardada (e a captura bruta teria de visitá-los de novo).
+    """
+    config_cache = cidade_config.get('cache_detalhes')
+    if config_cache and cidade_config.get('captura_bruta') and 'caminho' not in config_cache:
+        config_cache = {**config_cache, 'caminho': CAMINHO_CACHE_PADRAO.replace('.sqlite', '_bruto.sqlite')}
+    return CacheDetalhes.da_config(config_cache)
+
+def termos_royalties(cidade_config: dict) -> list:
+    """Termos usados na classificação offline: 'termos_royalties' da cidade ou a lista padrão do portal."""
+    return cidade_config.get('termos_royalties') or TERMOS_ROYALTIES
+
+def fabrica_navegador(cidade_config: dict, driver_path: str, headless: bool):
+    """Fábrica dos navegadores da cidade (portal e perfil), usada pelos workers e pelo pré-aquecimento do pool."""
+    return partial(start_driver_pacatuba, headless=headless, executable_path=driver_path, perfil=cidade_config.get('perfil_navegador', 'padrao'))
+
+def usa_navegador(cidade_config: dict) -> bool:
+    """A listagem de Pacatuba é sempre lida no navegador, qualquer que seja o 'modo_detalhes'."""
+    return True
+
+def _finalizador_link(cache, ano: str, mes: str | None, ao_processar_link=None, capturar_tudo: bool = False):
+    """
+    Callback chamado quando um link é extraído: grava o detalhe no cache e repassa a
+    'ao_processar_link' o registro classificado ({} se não for de royalties).
+    """
+    def concluir_link(link: str, detalhe: dict):
+        if cache and detalhe:
+            cache.guardar(link, detalhe, ano, mes)
+        if ao_processar_link:
+            ao_processar_link(link, classificar_detalhe(detalhe, capturar_tudo))
+    return concluir_link
+
+def _marcador_links(manifesto, *prefixo):
+    """
+    Callback 'ao_processar_link' que registra cada link concluído no manifesto e no
+    canal de progresso. 'prefixo' é (cidade, ano) ou (cidade, ano, mes).
+    """
+    cidade_nome, ano, *mes = prefixo
+    def marcar(link: str, registro: dict):
+        if manifesto:
+            manifesto.marcar(*prefixo, 'link', link, dados=registro)
+        progresso.linhas_processadas(1, int(bool(registro)), cidade=cidade_nome, ano=ano, mes=mes[0] if mes else None)
+    return marcar
+
+def _rastreador_links(ao_processar_link):
+    """Envolve 'ao_processar_link' e devolve (callback, conjunto dos links processados), para conferir o que ficou pendente."""
+    processados = set()
+    trava = threading.Lock()
+
+    def registrar(link: str, registro: dict):
+        with trava:
+            processados.add(link)
+        ao_processar_link(link, registro)
+    return registrar, processados
+
 # --- Worker e Função Principal de Pacatuba ---
 
-def worker_processar_mes_pacatuba(cidade_config: dict, ano_mes_tuple: tuple, driver_path: str, headless: bool):
+@perfilar_thread
+def worker_processar_mes_pacatuba(cidade_config: dict, ano_mes_tuple: tuple, driver_path: str, headless: bool, pool=None, manifesto=None, cache=None):
     """
     Worker que extrai dados de um ÚNICO MÊS para Pacatuba.
     Ele seleciona o filtro "Mês" e depois coleta e processa os links.
     """
     ano, mes = ano_mes_tuple
     log_context.task_id = f"Pacatuba-{ano}-{mes}"
+    with progresso.acompanhar_tarefa(cidade_config.get('nome', 'pacatuba'), ano, mes) as tarefa:
+        _processar_mes_pacatuba(cidade_config, ano, mes, driver_path, headless, pool, manifesto, cache, tarefa)
+
+def _processar_mes_pacatuba(cidade_config: dict, ano: str, mes: str, driver_path: str, headless: bool, pool, manifesto, cache, tarefa: dict):
+    cidade_nome = cidade_config.get('nome', 'pacatuba')
     logger = logging.getLogger('exdrop_osr')
+    if manifesto and manifesto.concluido(cidade_nome, ano, mes):
+        logger.info(f"{mes}/{ano} já concluído em uma execução anterior (checkpoint). Pulando.")
+        tarefa['pulada'] = True
+        return
     logger.info(f"Worker MENSAL iniciado para Pacatuba - {mes}/{ano}.")
     
     links_do_mes = []
-    driver = None
-    try:
-        driver = start_driver_pacatuba(headless=headless, executable_path=driver_path)
-        driver.get(cidade_config['url'])
+    fabrica = fabrica_navegador(cidade_config, driver_path, headless)
+    with obter_driver(pool, fabrica) as driver:
+        with medir_etapa("navegacao_inicial", PORTAL):
+            driver.get(cidade_config['url'])
         
-        # Lidando com pop-up dos cookies
-        try:
-            # Espera até 10 segundos para o botão de rejeitar cookies aparecer e ser clicável
-            logger.info("Procurando por banner de cookies para rejeitar...")
+            # Lidando com pop-up dos cookies
+            try:
+                # Espera até 10 segundos para o botão de rejeitar cookies aparecer e ser clicável
+                logger.info("Procurando por banner de cookies para rejeitar...")
             
-            botao_rejeitar_cookies = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.ID, "rejectCookie"))
-            )
+                botao_rejeitar_cookies = WebDriverWait(driver, 10).until(
+                    EC.element_to_be_clickable((By.ID, "rejectCookie"))
+                )
             
-            # Clica no botão para fechar o banner
-            botao_rejeitar_cookies.click()
-            logger.info("Banner de cookies rejeitado com sucesso.")
+                # Clica no botão para fechar o banner
+                botao_rejeitar_cookies.click()
+                logger.info("Banner de cookies rejeitado com sucesso.")
             
-            # Adiciona uma pequena pausa para a animação do banner desaparecer
-            time.sleep(1)
-        except TimeoutException:
-                # Se o botão não aparecer em 10 segundos, assume que não há banner
-                logger.info("Nenhum banner de cookies encontrado para interagir.")
-                pass
+                # Espera a animação do banner terminar (em vez de uma pausa fixa)
+                WebDriverWait(driver, 5).until(EC.invisibility_of_element_located((By.ID, "rejectCookie")))
+            except TimeoutException:
+                    # Se o botão não aparecer em 10 segundos, assume que não há banner
+                    logger.info("Nenhum banner de cookies encontrado para interagir.")
+                    pass
 
         # --- LÓGICA DE FILTRAGEM MENSAL ---
-        # 1. Clica no botão de rádio "Mês"
-        logger.info("Selecionando modo de filtro por Mês.")
-        driver.find_element(By.ID, "filtro_2").click()
+        with medir_etapa("aplicar_filtro", PORTAL):
+            # 1. Clica no botão de rádio "Mês"
+            logger.info("Selecionando modo de filtro por Mês.")
+            driver.find_element(By.ID, "filtro_2").click()
         
-        # 2. Seleciona o Ano e o Mês
-        selecionar_dropdown_pacatuba(driver, "select2-ano-container", ano)
-        selecionar_dropdown_pacatuba(driver, "select2-mes-container", mes) # Usa o ID do dropdown de mês
+            # 2. Seleciona o Ano e o Mês
+            selecionar_dropdown_pacatuba(driver, "select2-ano-container", ano)
+            selecionar_dropdown_pacatuba(driver, "select2-mes-container", mes) # Usa o ID do dropdown de mês
         
-        # 3. Clica em Buscar
-        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button#filtrar.btn-buscar"))).click()
-        WebDriverWait(driver, 20).until(EC.visibility_of_element_located((By.XPATH, "//table/tbody")))
+            # 3. Clica em Buscar
+            WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, "button#filtrar.btn-buscar"))).click()
+            WebDriverWait(driver, 20).until(EC.visibility_of_element_located((By.XPATH, "//table/tbody")))
         
         # 4. Coleta os links da(s) página(s) de resultado para este mês
+        # (uma página relida após 'driver.refresh()' não duplica links)
+        indice_links = IndiceDeduplicacao(rotulo=f"links de {mes}/{ano}")
         pagina_atual = 1
         while True:
             logger.info(f"Coletando links da página {pagina_atual} para o mês {mes}/{ano}...")
             botoes_detalhes = WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.XPATH, "//td[@serigyitem='detalhesPagamento']/a")))
+            registrar_unidade("pagina", PORTAL)
+            progresso.pagina_concluida(len(botoes_detalhes))
             for botao in botoes_detalhes:
-                if link := botao.get_attribute('href'):
+                if (link := botao.get_attribute('href')) and indice_links.registrar(link):
                     links_do_mes.append(link)
             if not ir_para_proxima_pagina_pacatuba(driver):
                 break
             pagina_atual += 1
-        
-    finally:
-        if driver:
-            driver.quit()
+        indice_links.relatar()
     
     # 5. Processa os links coletados para este mês
+    falhas = []
     if links_do_mes:
         # Reutilizamos nosso worker de extração de detalhes já existente!
-        dados_finais_mes = worker_extrair_detalhes_pacatuba(links_do_mes, ano, driver_path, headless)
+        links_pendentes, dados_finais_mes = _separar_links_processados(manifesto, links_do_mes, cidade_nome, ano, mes)
+        progresso.dimensionar_tarefa(len(links_pendentes))
+        ao_processar_link, processados = _rastreador_links(_marcador_links(manifesto, cidade_nome, ano, mes))
+        extrair_detalhes = _selecionar_worker_detalhes(
+            cidade_config, driver_path, headless, max_workers=1, pool=pool,
+            ao_processar_link=ao_processar_link, cache=cache, mes=mes
+        )
+        if links_pendentes:
+            dados_finais_mes.extend(extrair_detalhes(links_pendentes, ano))
+        falhas = [link for link in links_pendentes if link not in processados]
+        dados_finais_mes = _sem_duplicatas(dados_finais_mes, f"{mes}/{ano}")
         
+        if dados_finais_mes and cidade_config.get('captura_bruta'):
+            dados_finais_mes = separar_brutos(dados_finais_mes, cidade_nome, ano, mes, termos_royalties(cidade_config))
         if dados_finais_mes:
-            # Salva o arquivo CSV para este mês específico
-            cidade_nome = cidade_config.get('nome', 'pacatuba')
-            output_dir = os.path.join("data", "processed", cidade_nome)
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, f"{cidade_nome}_royalties_{ano}_{mes}.csv")
-            pd.DataFrame(dados_finais_mes).to_csv(output_path, index=False, sep=';', encoding='utf-8-sig')
+            # Salva o arquivo (CSV e/ou Parquet) para este mês específico
+            output_path = salvar_registros_mes(dados_finais_mes, cidade_nome, ano, mes, cidade_config.get('formato_saida', 'csv'))
             logger.info(f"Dados salvos para Pacatuba - {mes}/{ano} em {output_path}")
+        registrar_pagamentos(dados_finais_mes, cidade_nome, ano, mes)
+        tarefa['mantidas'] = len(dados_finais_mes)
 
+    if manifesto:
+        manifesto.concluir_periodo(cidade_nome, ano, mes, dados={'links': len(links_do_mes)},
+                                   pendentes=len(falhas), intermediarias=('link',))
 
-def worker_extrair_detalhes_pacatuba(links: List[str], ano_alvo: str, driver_path: str, headless:bool) -> List[dict]:
+
+@perfilar_thread
+def worker_extrair_detalhes_pacatuba(links: List[str], ano_alvo: str, driver_path: str, headless:bool, pool=None, perfil="padrao", ao_processar_link=None, cache=None, mes=None, capturar_tudo=False) -> List[dict]:
+    """
+    Visita cada link de detalhe e retorna os registros de royalties (ou todos, com 'capturar_tudo').
+    'ao_processar_link(link, registro)' é chamado para cada link processado sem erro
+    (com {} quando o link não é de royalties), permitindo registrar o progresso.
+    Com um 'cache' (CacheDetalhes), os links já conhecidos não são visitados e o
+    navegador só é aberto se sobrar algum link fora do cache.
+    """
     log_context.task_id = f"Pacatuba-Worker-{threading.get_ident() % 1000}"
     logger = logging.getLogger('exdrop_osr')
     
     logger.info(f"Worker iniciado. Processando {len(links)} links.")
-    dados_coletados_pela_thread = []
-    driver = None
+    dados_coletados_pela_thread, links = _aproveitar_cache(cache, links, ao_processar_link, capturar_tudo)
+    politica_portal = politica(PORTAL)
+    concluir_link = _finalizador_link(cache, ano_alvo, mes, ao_processar_link, capturar_tudo)
+    fabrica = partial(start_driver_pacatuba, headless=headless, executable_path=driver_path, perfil=perfil)
+    inicio = time.perf_counter()
     try:
-        driver = start_driver_pacatuba(headless=headless, executable_path=driver_path)
-               
-        for i, link in enumerate(links):
-            try:
-                logger.debug(f"Acessando link {i+1}/{len(links)}.")
-                driver.get(link)
-                WebDriverWait(driver, 20).until(EC.visibility_of_element_located((By.ID, "table-dados")))
-                
-                # Mapa de XPaths para todos os campos na página de detalhes.
-                XPATHS_DETALHES = {           
-                    'empenho':          '//*[@id="table-dados"]/tbody/tr[2]/td[1]',
-                    'credor':           '//*[@id="table-dados"]/tbody/tr[2]/td[2]',
-                    'data_nota':        '//*[@id="table-dados"]/tbody/tr[2]/td[3]',
-
-                    'processo':         '//*[@id="table-dados"]/tbody/tr[4]/th[1]',
-                    'fonte_recurso':    '//*[@id="table-dados"]/tbody/tr[4]/th[2]',            
-                    'numero_documento': '//*[@id="table-dados"]/tbody/tr[4]/th[3]',
-
-                    'valor_pago':       '//*[@id="table-dados"]/tbody/tr[6]/td[1]',
-                    'valor_retido':     '//*[@id="table-dados"]/tbody/tr[6]/td[2]',
-                    'forma_pagamento':  '//*[@id="table-dados"]/tbody/tr[6]/td[3]',
-                    
-                    'historico':        '//*[@id="table-historico"]/tbody/tr/td',
-                    'relacionado_covid':'//*[@id="table-outras-informacoes"]/tbody/tr/td[1]',
-                    'relacionado_LC173':'//*[@id="table-outras-informacoes"]/tbody/tr/td[2]'
-                }
-                # --- ETAPA 1: Extrair APENAS a Fonte de Recurso para verificação ---
-                logger.debug("Verificando a Fonte de Recurso primeiro...")
-                fonte_recurso_texto = None
+        with obter_driver(pool, fabrica) if links else nullcontext() as driver:
+            for i, link in enumerate(links):
                 try:
-                    # Usa o XPath específico para a fonte de recurso
-                    fonte_recurso_element = driver.find_element(By.XPATH, XPATHS_DETALHES['fonte_recurso'])
-                    fonte_recurso_texto = fonte_recurso_element.text.strip()
-                    fonte_recurso_texto = normalizar(fonte_recurso_texto)
+                    logger.debug(f"Acessando link {i+1}/{len(links)}.")
+                    politica_portal.aguardar_liberacao()
+                    inicio_link = time.perf_counter()
+                    registrar_unidade("linha", PORTAL)
+                    with medir_etapa("detalhe", PORTAL):
+                        driver.get(link)
+                        WebDriverWait(driver, 20).until(EC.visibility_of_element_located((By.ID, "table-dados")))
+                    registrar_latencia(PORTAL, time.perf_counter() - inicio_link)
+                    politica_portal.registrar_sucesso()
+                
+                    # --- ETAPA 1: Extrair APENAS a Fonte de Recurso para verificação ---
+                    logger.debug("Verificando a Fonte de Recurso primeiro...")
+                    fonte_recurso_texto = None
+                    try:
+                        # Usa o XPath específico para a fonte de recurso
+                        fonte_recurso_element = driver.find_element(By.XPATH, XPATHS_DETALHES['fonte_recurso'])
+                        fonte_recurso_texto = fonte_recurso_element.text.strip()
+                        fonte_recurso_texto = normalizar(fonte_recurso_texto)
                     
-                except NoSuchElementException:
-                    logger.warning(f"Campo 'fonte_recurso' não encontrado no link {link}. Pulando.")
-                    continue # Pula para o próximo link
+                    except NoSuchElementException:
+                        logger.warning(f"Campo 'fonte_recurso' não encontrado no link {link}. Pulando.")
+                        if ao_processar_link: ao_processar_link(link, {})
+                        continue # Pula para o próximo link
                
-                # --- ETAPA 2: Verificar se é de royalties ANTES de extrair o resto ---
-                if fonte_recurso_texto and any(termo in fonte_recurso_texto for termo in TERMOS_ROYALTIES):
-                    logger.info(f"Royalties encontrados (Fonte: '{fonte_recurso_texto}'). Extraindo todos os dados do link: {link}")
+                    # --- ETAPA 2: Verificar se é de royalties ANTES de extrair o resto ---
+                    eh_royalties = bool(fonte_recurso_texto) and any(termo in fonte_recurso_texto for termo in TERMOS_ROYALTIES)
+                    if eh_royalties or capturar_tudo:
+                        if eh_royalties:
+                            logger.info(f"Royalties encontrados (Fonte: '{fonte_recurso_texto}'). Extraindo todos os dados do link: {link}")
                    
-                    dados_completos = {'fonte_recurso': fonte_recurso_texto, 'link_detalhe': link}
-                    for nome_campo, xpath in XPATHS_DETALHES.items():
-                        if nome_campo == 'fonte_recurso': continue
-                        try:
-                            dados_completos[nome_campo] = driver.find_element(By.XPATH, xpath).text.strip()
-                        except NoSuchElementException:
-                            dados_completos[nome_campo] = None
-                    dados_coletados_pela_thread.append(dados_completos)
+                        dados_completos = {'fonte_recurso': fonte_recurso_texto, 'link_detalhe': link}
+                        for nome_campo, xpath in XPATHS_DETALHES.items():
+                            if nome_campo == 'fonte_recurso': continue
+                            try:
+                                dados_completos[nome_campo] = driver.find_element(By.XPATH, xpath).text.strip()
+                            except NoSuchElementException:
+                                dados_completos[nome_campo] = None
+                        dados_coletados_pela_thread.append(dados_completos)
+                        concluir_link(link, dados_completos)
                     
-                else:
-                    logger.debug(f"Link não é de royalties. Fonte: '{fonte_recurso_texto}'. Pulando extração detalhada.")
+                    else:
+                        logger.debug(f"Link não é de royalties. Fonte: '{fonte_recurso_texto}'. Pulando extração detalhada.")
+                        concluir_link(link, {'fonte_recurso': fonte_recurso_texto, 'link_detalhe': link})
 
                     
-            except Exception as e_link:
-                logger.error(f"Erro ao processar o link {link}: {e_link}")
-                continue
+                except Exception as e_link:
+                    logger.error(f"Erro ao processar o link {link}: {e_link}")
+                    if isinstance(e_link, TimeoutException):
+                        registrar_timeout(PORTAL)
+                        politica_portal.registrar_falha()
+                    continue
     finally:
-        if driver: driver.quit()
-        logger.info("Worker finalizado.")
+        duracao = time.perf_counter() - inicio
+        logger.info(f"Worker finalizado. {len(links)} links em {duracao:.1f}s ({len(links) / duracao if duracao else 0:.2f} links/s).")
     
     return dados_coletados_pela_thread
 
-def coletar_links_lote(cidade_config: dict, ano: str, pagina_inicial: int, paginas_por_lote: int, driver_path: str, headless: bool) -> tuple[list[str], bool]:
+def _com_cache(extrair_detalhes, cache, mes: str | None, ao_processar_link=None, capturar_tudo: bool = False):
+    """Envolve um worker de detalhes (HTTP/async) para que só os links fora do cache sejam baixados."""
+    def extrair_com_cache(links: List[str], ano_alvo: str) -> List[dict]:
+        registros, pendentes = _aproveitar_cache(cache, links, ao_processar_link, capturar_tudo)
+        if pendentes:
+            guardar_detalhe = (lambda link, detalhe: cache.guardar(link, detalhe, ano_alvo, mes)) if cache else None
+            registros.extend(extrair_detalhes(pendentes, ano_alvo, ao_processar_link=ao_processar_link, guardar_detalhe=guardar_detalhe))
+        return registros
+    return extrair_com_cache
+
+def _selecionar_worker_detalhes(cidade_config: dict, driver_path: str, headless: bool, max_workers: int, pool=None, ao_processar_link=None, cache=None, mes=None):
+    """
+    Retorna a função de extração de detalhes, com assinatura (links, ano_alvo) -> registros,
+    conforme a chave 'modo_detalhes' da cidade: "selenium" (padrão), "http" ou "async".
+    """
+    capturar_tudo = cidade_config.get('captura_bruta', False)
+    if cidade_config.get('modo_detalhes') == 'async':
+        from src.scrapers.pacatuba_async import extrair_detalhes_async
+        return _com_cache(partial(extrair_detalhes_async, config_async=cidade_config.get('config_async'), capturar_tudo=capturar_tudo), cache, mes, ao_processar_link, capturar_tudo)
+    if cidade_config.get('modo_detalhes') == 'http':
+        from src.common.http_utils import criar_sessao_http
+        from src.scrapers.pacatuba_http import worker_extrair_detalhes_pacatuba_http
+        return _com_cache(partial(worker_extrair_detalhes_pacatuba_http, sessao=criar_sessao_http(tamanho_pool=max_workers), capturar_tudo=capturar_tudo), cache, mes, ao_processar_link, capturar_tudo)
+    return partial(
+        worker_extrair_detalhes_pacatuba, driver_path=driver_path, headless=headless, pool=pool,
+        perfil=cidade_config.get('perfil_navegador', 'padrao'), ao_processar_link=ao_processar_link,
+        cache=cache, mes=mes, capturar_tudo=capturar_tudo
+    )
+
+def _url_pagina_pacatuba(cidade_config: dict, ano: str, pagina: int) -> str:
+    """URL da listagem de pagamentos do ano já posicionada na página informada."""
+    return f"{cidade_config['url']}?pagina={pagina}&alias=pmpacatuba&p=iDespesa&base=189&recursoDESO=false&ano={ano}&tipo=pagamento&filtro=1"
+
+@perfilar_thread
+def coletar_links_lote(cidade_config: dict, ano: str, pagina_inicial: int, paginas_por_lote: int, driver_path: str, headless: bool, pool=None, ao_coletar_pagina=None) -> tuple[list[str], bool]:
     """
     Função que abre navegador, coleta links de um lote de páginas e fecha o navegador.
     Retorna a lista de links encontrados e um booleano indicando se há mais páginas.
+    Se informado, 'ao_coletar_pagina(links)' recebe os links de cada página assim que ela é lida.
     """
     logger = logging.getLogger('exdrop_osr')
     links_do_lote = []
-    driver = None
+    fabrica = fabrica_navegador(cidade_config, driver_path, headless)
     ainda_ha_paginas = True
     
-    try:
-        driver = start_driver_pacatuba(headless=headless, executable_path=driver_path)
-        
+    with obter_driver(pool, fabrica) as driver:
         # Constrói a URL para ir diretamente para a página inicial do lote
-        url_base = cidade_config['url']
-        url_lote = f"{url_base}?pagina={pagina_inicial}&alias=pmpacatuba&p=iDespesa&base=189&recursoDESO=false&ano={ano}&tipo=pagamento&filtro=1"
-        driver.get(url_lote)
+        with medir_etapa("navegacao_inicial", PORTAL):
+            driver.get(_url_pagina_pacatuba(cidade_config, ano, pagina_inicial))
         
         # A navegação direta via URL evita a necessidade de clicar nos filtros novamente
         
@@ -342,32 +585,541 @@ def coletar_links_lote(cidade_config: dict, ano: str, pagina_inicial: int, pagin
             
             try:
                 # Aguarda a tabela aparecer antes de tentar extrair
+                politica(PORTAL).aguardar_liberacao()
                 WebDriverWait(driver, 20).until(EC.visibility_of_element_located((By.XPATH, "//table/tbody")))
                 botoes_detalhes = driver.find_elements(By.XPATH, "//td[@serigyitem='detalhesPagamento']/a")
-                for botao in botoes_detalhes:
-                    if link := botao.get_attribute('href'):
-                        links_do_lote.append(link)
+                links_da_pagina = [link for botao in botoes_detalhes if (link := botao.get_attribute('href'))]
+                links_do_lote.extend(links_da_pagina)
+                registrar_unidade("pagina", PORTAL)
+                progresso.pagina_concluida(len(links_da_pagina), cidade=cidade_config.get('nome', 'pacatuba'), ano=ano)
+                if ao_coletar_pagina:
+                    ao_coletar_pagina(links_da_pagina)
                         
                 if not ir_para_proxima_pagina_pacatuba(driver):
                     ainda_ha_paginas = False
                     break # Fim da paginação, sai do loop do lote
             except TimeoutException:
                 logger.warning(f"Timeout ao carregar a pagina {pagina_atual}. Assumindo fim da paginação para este lote.")
+                registrar_timeout(PORTAL)
+                politica(PORTAL).registrar_falha()
                 ainda_ha_paginas = False
                 break
-    finally:
-        if driver:
-            driver.quit()
-            logger.info("Navegador do lote de coleta de links foi fechado.")  
+    logger.info("Navegador do lote de coleta de links foi liberado.")
             
     return links_do_lote, ainda_ha_paginas
+
+def _pagina_tem_registros(driver, cidade_config: dict, ano: str, pagina: int) -> bool:
+    """Abre a página diretamente pela URL e verifica se ela lista algum pagamento."""
+    driver.get(_url_pagina_pacatuba(cidade_config, ano, pagina))
+    try:
+        WebDriverWait(driver, 20).until(EC.visibility_of_element_located((By.XPATH, "//table/tbody")))
+    except TimeoutException:
+        return False
+    return bool(driver.find_elements(By.XPATH, "//td[@serigyitem='detalhesPagamento']/a"))
+
+def descobrir_total_paginas_pacatuba(cidade_config: dict, ano: str, driver_path: str, headless: bool, pool=None) -> int | None:
+    """
+    Descobre quantas páginas a listagem do ano possui. Parte do maior número exibido
+    na paginação e confirma o fim com saltos exponenciais (no máximo
+    SALTOS_MAXIMOS_PAGINACAO) seguidos de busca binária pela URL (?pagina=N), o que
+    custa O(log N) carregamentos. Retorna None se falhar.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    fabrica = fabrica_navegador(cidade_config, driver_path, headless)
+    try:
+        with obter_driver(pool, fabrica) as driver:
+            if not _pagina_tem_registros(driver, cidade_config, ano, 1):
+                return 0
+            numeros = [int(texto) for texto in driver.execute_script(
+                "return Array.from(document.querySelectorAll('a.page-link')).map(a => a.textContent.trim());"
+            ) if texto.isdigit()]
+
+            # 'com_registros' sempre tem registros; 'sem_registros' nunca (ou é None enquanto desconhecido)
+            com_registros, sem_registros = max(numeros + [1]), None
+            if com_registros > 1 and not _pagina_tem_registros(driver, cidade_config, ano, com_registros):
+                com_registros, sem_registros = 1, com_registros
+            saltos = 0
+            while sem_registros is None:
+                if saltos == SALTOS_MAXIMOS_PAGINACAO:
+                    logger.warning(f"A página {com_registros} de {ano} ainda lista pagamentos após {saltos} saltos: "
+                                   f"o portal parece não ter fim de paginação pela URL. Usando a coleta sequencial.")
+                    return None
+                saltos += 1
+                candidata = com_registros * 2
+                if _pagina_tem_registros(driver, cidade_config, ano, candidata):
+                    com_registros = candidata
+                else:
+                    sem_registros = candidata
+            while sem_registros - com_registros > 1:
+                meio = (com_registros + sem_registros) // 2
+                if _pagina_tem_registros(driver, cidade_config, ano, meio):
+                    com_registros = meio
+                else:
+                    sem_registros = meio
+    except Exception as e:
+        logger.warning(f"Não foi possível descobrir o total de páginas de {ano}: {e}")
+        return None
+
+    logger.info(f"Listagem de {ano} possui {com_registros} página(s).")
+    return com_registros
+
+def _coletar_links_sequencial(cidade_config: dict, ano: str, driver_path: str, headless: bool, pool=None, paginas_por_lote: int = 50) -> List[str]:
+    """Coleta os links em lotes consecutivos até o fim da paginação (estratégia original)."""
+    logger = logging.getLogger('exdrop_osr')
+    links = []
+    indice = IndiceDeduplicacao(rotulo=f"links de {ano}")
+    pagina_atual = 1
+    while True:
+        logger.info(f"Iniciando coleta de lote a partir da página {pagina_atual}...")
+        novos_links, tem_mais_paginas = coletar_links_lote(
+            cidade_config, ano, pagina_atual, paginas_por_lote, driver_path, headless, pool=pool
+        )
+        novos_links = indice.filtrar(novos_links)
+        if novos_links:
+            links.extend(novos_links)
+            logger.info(f"{len(novos_links)} links adicionados. Total até agora: {len(links)}.")
+        
+        if not tem_mais_paginas:
+            logger.info("Fim da coleta de links detectado.")
+            break
+        
+        pagina_atual += paginas_por_lote
+    indice.relatar()
+    return links
+
+def _coletar_fatia(cidade_config: dict, ano: str, pagina_inicial: int, quantidade: int, driver_path: str, headless: bool,
+                   pool=None, ao_coletar_pagina=None, ao_perder_paginas=None) -> List[str]:
+    """
+    Coleta uma fatia de páginas com 'coletar_links_lote'. Se a paginação parar antes do
+    fim da fatia (timeout, botão "próxima" ausente, erro do navegador), retoma a partir da
+    primeira página não lida, até 'tentativas_por_fatia' vezes; o intervalo que ainda
+    assim ficar sem coleta é registrado no log e informado a 'ao_perder_paginas(primeira, ultima)'.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    links, lidas = [], 0
+    tentativas = cidade_config.get('tentativas_por_fatia', 3)
+
+    def contar_pagina(links_da_pagina: List[str]):
+        # Os links entram aqui, página a página: se o lote falhar no meio, as páginas já lidas
+        # não são relidas na retomada (que começa em pagina_inicial + lidas) e não podem se perder
+        nonlocal lidas
+        lidas += 1
+        links.extend(links_da_pagina)
+        if ao_coletar_pagina:
+            ao_coletar_pagina(links_da_pagina)
+
+    for tentativa in range(1, tentativas + 1):
+        try:
+            coletar_links_lote(cidade_config, ano, pagina_inicial + lidas, quantidade - lidas,
+                               driver_path, headless, pool, contar_pagina)
+        except Exception as e:
+            logger.warning(f"Falha na coleta das páginas {pagina_inicial + lidas} a {pagina_inicial + quantidade - 1}: {e}")
+        if lidas >= quantidade:
+            return links
+        if tentativa < tentativas:
+            logger.warning(f"A coleta parou na página {pagina_inicial + lidas} (fatia {pagina_inicial} a {pagina_inicial + quantidade - 1}). "
+                           f"Retomando ({tentativa + 1}/{tentativas}).")
+
+    logger.error(f"Páginas {pagina_inicial + lidas} a {pagina_inicial + quantidade - 1} de {ano} não foram coletadas "
+                 f"após {tentativas} tentativas.")
+    if ao_perder_paginas:
+        ao_perder_paginas(pagina_inicial + lidas, pagina_inicial + quantidade - 1)
+    return links
+
+def coletar_links_paralelo(cidade_config: dict, ano: str, max_workers: int, driver_path: str, headless: bool, pool=None,
+                           ao_perder_paginas=None) -> List[str]:
+    """
+    Fase 1 paralela: descobre o total de páginas, divide o intervalo em fatias
+    contíguas (uma por coletor) e une os links, sem duplicatas e na ordem das páginas.
+    Se o total de páginas não puder ser descoberto, usa a coleta sequencial.
+    Intervalos de páginas que não puderam ser coletados vão para 'ao_perder_paginas(primeira, ultima)'.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    total_paginas = descobrir_total_paginas_pacatuba(cidade_config, ano, driver_path, headless, pool=pool)
+    if total_paginas is None:
+        return _coletar_links_sequencial(cidade_config, ano, driver_path, headless, pool=pool)
+    if total_paginas == 0:
+        return []
+
+    coletores = max(1, min(max_workers, total_paginas))
+    paginas_por_fatia = math.ceil(total_paginas / coletores)
+    fatias = [(inicio, min(paginas_por_fatia, total_paginas - inicio + 1)) for inicio in range(1, total_paginas + 1, paginas_por_fatia)]
+    logger.info(f"Coletando {total_paginas} páginas em {len(fatias)} fatia(s) de até {paginas_por_fatia} páginas.")
+
+    inicio = time.perf_counter()
+    links_por_fatia = {}
+    with ThreadPoolExecutor(max_workers=coletores) as executor:
+        futures = {
+            executor.submit(_coletar_fatia, cidade_config, ano, pagina_inicial, quantidade, driver_path, headless, pool,
+                            ao_perder_paginas=ao_perder_paginas): pagina_inicial
+            for pagina_inicial, quantidade in fatias
+        }
+        for future in as_completed(futures):
+            links_por_fatia[futures[future]] = future.result()
+            logger.info(f"Fatia {len(links_por_fatia)} de {len(fatias)} da coleta de links concluída")
+
+    # Une as fatias na ordem das páginas; páginas que "andaram" durante a coleta geram repetidos
+    todos_os_links = [link for pagina_inicial in sorted(links_por_fatia) for link in links_por_fatia[pagina_inicial]]
+    links_unicos = list(dict.fromkeys(todos_os_links))
+    duracao = time.perf_counter() - inicio
+    logger.info(f"Coleta paralela: {len(links_unicos)} links únicos ({len(todos_os_links) - len(links_unicos)} duplicados removidos) "
+                f"em {duracao:.1f}s com {coletores} coletor(es) ({total_paginas / duracao if duracao else 0:.2f} páginas/s).")
+    return links_unicos
         
 
-def run(cidade_config: dict, anos_para_processar: List[str], meses_para_processar: List[str] | None, max_workers: int, headless:bool):
+def _extrair_detalhes_ano(cidade_config: dict, links_para_processar: List[str], ano: str, max_workers: int, driver_path: str, headless: bool, pool=None, cache=None, ao_processar_link=None) -> List[dict]:
+    """Fase 2 do modo anual: extrai os detalhes de uma lista de links já coletada."""
+    logger = logging.getLogger('exdrop_osr')
+    dados_finais = []
+    if not links_para_processar:
+        return dados_finais
+
+    if cidade_config.get('modo_detalhes') == 'async':
+        # Fase 2 alternativa: todos os links em um único event loop
+        logger.info("Fase 2: Iniciando extração com o crawler assíncrono.")
+        extrair_detalhes = _selecionar_worker_detalhes(cidade_config, driver_path, headless, max_workers, ao_processar_link=ao_processar_link, cache=cache)
+        dados_finais.extend(extrair_detalhes(links_para_processar, ano))
+        log_context.task_id = f"Pacatuba-{ano}"
+        logger.info("[PROGRESSO] Lote 1 de 1 concluído")
+    else:
+        num_workers = min(max_workers, len(links_para_processar))
+        controlador = obter_controlador(PORTAL)
+        agendador = AgendadorLotes(
+            links_para_processar,
+            tamanho_lote=cidade_config.get('links_por_lote_detalhes', 10),
+            tentativas=cidade_config.get('tentativas_por_link', 3),
+            rotulo=f"Pacatuba-{ano}-Worker",
+            limite_dinamico=(lambda: controlador.limite) if controlador else None
+        )
+        logger.info(f"Fase 2: Iniciando extração com {num_workers} workers em {agendador.total_lotes} lotes.")
+        if controlador:
+            controlador.observar(agendador.notificar_limite)
+        try:
+            with _pool_para_detalhes(cidade_config, pool, num_workers, driver_path, headless) as pool_detalhes:
+                processar_lote = _processador_de_lotes(
+                    cidade_config, ano, driver_path, headless, num_workers, pool=pool_detalhes,
+                    cache=cache, ao_processar_link=ao_processar_link
+                )
+                dados_finais.extend(agendador.executar(processar_lote, num_workers))
+        finally:
+            if controlador:
+                controlador.deixar_de_observar(agendador.notificar_limite)
+    return dados_finais
+
+@contextmanager
+def _pool_para_detalhes(cidade_config: dict, pool, num_workers: int, driver_path: str, headless: bool):
+    """
+    Os lotes pequenos pegam um navegador a cada lote; sem um pool compartilhado, cria um
+    pool só para a Fase 2, para não abrir e fechar um Chrome por lote.
+    """
+    if pool is not None or cidade_config.get('modo_detalhes', 'selenium') != 'selenium':
+        yield pool
+        return
+    pool_local = DriverPool(
+        partial(start_driver_pacatuba, headless=headless, executable_path=driver_path, perfil=cidade_config.get('perfil_navegador', 'padrao')),
+        tamanho_maximo=num_workers
+    )
+    try:
+        yield pool_local
+    finally:
+        pool_local.fechar()
+
+def _processador_de_lotes(cidade_config: dict, ano: str, driver_path: str, headless: bool, num_workers: int, pool=None, cache=None, ao_processar_link=None):
+    """
+    Adapta o worker de detalhes ao AgendadorLotes: retorna 'processar_lote(links) -> (registros, links_concluidos)'.
+    Um link é considerado concluído quando o worker o reporta via 'ao_processar_link'.
+    """
+    concluidos = set()
+    trava = threading.Lock()
+
+    def registrar(link: str, registro: dict):
+        with trava:
+            concluidos.add(link)
+        if ao_processar_link:
+            ao_processar_link(link, registro)
+
+    extrair_detalhes = _selecionar_worker_detalhes(cidade_config, driver_path, headless, num_workers, pool=pool, ao_processar_link=registrar, cache=cache)
+
+    def processar_lote(lote: List[str]) -> tuple[List[dict], set]:
+        registros = extrair_detalhes(lote, ano)
+        with trava:
+            return registros, {link for link in lote if link in concluidos}
+    return processar_lote
+
+def _pipeline_disponivel(cidade_config: dict, max_workers: int, pool=None) -> bool:
+    """
+    O pipeline (Fase 1 e Fase 2 simultâneas) pode ser desligado com 'pipeline_links': false.
+    O crawler assíncrono precisa da lista completa, e com um único navegador disponível
+    coletores e extratores disputariam o mesmo driver, então nesses casos as fases são sequenciais.
+    """
+    if not cidade_config.get('pipeline_links', True) or cidade_config.get('modo_detalhes') == 'async':
+        return False
+    usa_navegador_nos_detalhes = cidade_config.get('modo_detalhes', 'selenium') == 'selenium'
+    return not (usa_navegador_nos_detalhes and _limite_navegadores(max_workers, pool) < 2)
+
+def _limite_navegadores(max_workers: int, pool=None) -> int:
+    """Navegadores que uma tarefa anual pode usar ao mesmo tempo: 'max_workers', sem passar do pool."""
+    return max(1, min(max_workers, pool.tamanho_maximo) if pool is not None else max_workers)
+
+def executar_pipeline_pacatuba(cidade_config: dict, ano: str, max_workers: int, driver_path: str, headless: bool,
+                               pool=None, cache=None, ao_processar_link=None, links_ja_processados: set | None = None,
+                               ao_perder_paginas=None) -> tuple[List[str], List[dict]]:
+    """
+    Executa a coleta de links (produtores) e a extração de detalhes (consumidores) ao
+    mesmo tempo. Cada página coletada alimenta uma fila limitada ('tamanho_fila_links');
+    quando ela enche, os coletores esperam (backpressure). Ao fim da coleta, uma
+    sentinela por consumidor encerra a extração.
+    Retorna (todos os links coletados, registros de royalties extraídos); intervalos de
+    páginas que não puderam ser coletados vão para 'ao_perder_paginas(primeira, ultima)'.
+    """
+    logger = logging.getLogger('exdrop_osr')
+    total_paginas = descobrir_total_paginas_pacatuba(cidade_config, ano, driver_path, headless, pool=pool)
+    if total_paginas is None:
+        links = _coletar_links_sequencial(cidade_config, ano, driver_path, headless, pool=pool)
+        pendentes = [link for link in links if link not in (links_ja_processados or set())]
+        return links, _extrair_detalhes_ano(cidade_config, pendentes, ano, max_workers, driver_path, headless,
+                                            pool=pool, cache=cache, ao_processar_link=ao_processar_link)
+
+    # Com navegadores nos detalhes, coletores e extratores dividem os 'max_workers' navegadores da
+    # tarefa (a vaga reservada no agendador global); passar disso deixaria coletores parados na
+    # fila cheia segurando navegadores que os extratores esperam
+    usa_navegador_nos_detalhes = cidade_config.get('modo_detalhes', 'selenium') == 'selenium'
+    limite_navegadores = _limite_navegadores(max_workers, pool)
+    if usa_navegador_nos_detalhes:
+        coletores = min(cidade_config.get('coletores_links', max(1, limite_navegadores // 2)), limite_navegadores - 1)
+        consumidores = max(1, limite_navegadores - coletores)
+    else:
+        coletores = cidade_config.get('coletores_links', max(1, max_workers))
+        consumidores = max_workers
+    coletores = max(1, min(coletores, total_paginas or 1))
+    paginas_por_fatia = math.ceil(total_paginas / coletores) if total_paginas else 1
+    fatias = [(inicio, min(paginas_por_fatia, total_paginas - inicio + 1)) for inicio in range(1, total_paginas + 1, paginas_por_fatia)]
+    tamanho_lote = cidade_config.get('links_por_lote_detalhes', 10)
+
+    fila = queue.Queue(maxsize=cidade_config.get('tamanho_fila_links', 500))
+    sentinela = object()
+    vistos = set(links_ja_processados or ())
+    links_coletados = []
+    dados_finais = []
+    trava = threading.Lock()
+    pool_detalhes = pool
+    if pool is None and usa_navegador_nos_detalhes:
+        # Sem pool compartilhado, os extratores reaproveitam navegadores entre os lotes
+        pool_detalhes = DriverPool(
+            partial(start_driver_pacatuba, headless=headless, executable_path=driver_path, perfil=cidade_config.get('perfil_navegador', 'padrao')),
+            tamanho_maximo=consumidores
+        )
+    extrair_detalhes = _selecionar_worker_detalhes(cidade_config, driver_path, headless, consumidores, pool=pool_detalhes, ao_processar_link=ao_processar_link, cache=cache)
+
+    def enfileirar_pagina(links_da_pagina: List[str]):
+        with trava:
+            novos = [link for link in dict.fromkeys(links_da_pagina) if link not in vistos]
+            vistos.update(novos)
+            links_coletados.extend(links_da_pagina)
+        for link in novos:
+            fila.put(link)  # Bloqueia enquanto a fila estiver cheia
+
+    def consumir():
+        while True:
+            item = fila.get()
+            if item is sentinela:
+                return
+            lote = [item]
+            while len(lote) < tamanho_lote:
+                try:
+                    item = fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is sentinela:
+                    fila.put(sentinela)  # Devolve para ser lida no próximo get()
+                    break
+                lote.append(item)
+            try:
+                if resultado := extrair_detalhes(lote, ano):
+                    with trava:
+                        dados_finais.extend(resultado)
+            except Exception as e:
+                logger.error(f"Falha ao extrair um lote de {len(lote)} links no pipeline: {e}")
+
+    logger.info(f"Pipeline: {len(fatias)} coletor(es) de links e {consumidores} extrator(es) de detalhes, fila de até {fila.maxsize} links.")
+    inicio = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=consumidores) as executor_consumidores:
+            futures_consumidores = [executor_consumidores.submit(consumir) for _ in range(consumidores)]
+            try:
+                with ThreadPoolExecutor(max_workers=coletores) as executor_coletores:
+                    futures = {
+                        executor_coletores.submit(_coletar_fatia, cidade_config, ano, pagina_inicial, quantidade, driver_path, headless,
+                                                  pool, enfileirar_pagina, ao_perder_paginas): (pagina_inicial, quantidade)
+                        for pagina_inicial, quantidade in fatias
+                    }
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            # Os links já enfileirados por este coletor continuam sendo extraídos
+                            pagina_inicial, quantidade = futures[future]
+                            logger.error(f"Coletor das páginas {pagina_inicial} a {pagina_inicial + quantidade - 1} falhou: {e}")
+                            if ao_perder_paginas:
+                                ao_perder_paginas(pagina_inicial, pagina_inicial + quantidade - 1)
+            finally:
+                # Encerra os consumidores mesmo se um coletor falhar
+                for _ in range(consumidores):
+                    fila.put(sentinela)
+            for future in futures_consumidores:
+                future.result()
+    finally:
+        if pool_detalhes is not pool:
+            pool_detalhes.fechar()
+
+    duracao = time.perf_counter() - inicio
+    log_context.task_id = f"Pacatuba-{ano}"
+    links_unicos = list(dict.fromkeys(links_coletados))
+    logger.info(f"Pipeline concluído em {duracao:.1f}s: {len(links_unicos)} links coletados, {len(dados_finais)} registros de royalties.")
+    logger.info("[PROGRESSO] Lote 1 de 1 concluído")
+    return links_unicos, dados_finais
+
+def _finalizar_ano_mensal(cidade_config: dict, ano: str, cache=None, anos_restantes: dict | None = None):
+    """
+    Modo mensal: consolida os CSVs do ano depois que todos os meses terminarem.
+    O cache é compartilhado pelos anos; o finalizador do último ano a terminar o fecha.
+    """
+    log_context.task_id = f"Pacatuba-{ano}"
+    try:
+        if gera_csv(cidade_config):
+            unir_csvs_por_ano(cidade_nome=cidade_config.get('nome', 'pacatuba'), ano=ano)
+    finally:
+        if cache:
+            cache.relatar()
+            with anos_restantes['trava']:
+                anos_restantes['quantidade'] -= 1
+                ultimo = anos_restantes['quantidade'] == 0
+            if ultimo:
+                cache.fechar()
+            else:
+                cache.persistir()
+    logging.getLogger('exdrop_osr').info(f"--- FINALIZADO PROCESSAMENTO DE PACATUBA - ANO DE {ano} ---")
+
+def planejar_tarefas(cidade_config: dict, anos_para_processar: List[str], meses_para_processar: List[str] | None,
+                     max_workers: int, driver_path: str, headless: bool, pool=None, manifesto=None) -> tuple[list, dict]:
+    """
+    Para o agendador global de main.py: no modo mensal, uma tarefa por mês; no modo
+    anual, uma tarefa por ano (que usa internamente o pipeline de links e detalhes).
+    Retorna as tarefas [(chave, função, peso)] e as funções a rodar ao fim de cada ano.
+    O peso é quantos navegadores/conexões a tarefa usa ao mesmo tempo: 1 por mês e, no
+    modo anual, 'max_workers' (que main.py já limita ao teto do portal).
+    """
+    cidade_nome = cidade_config.get('nome', 'pacatuba')
+    if not meses_para_processar:
+        tarefas = [
+            ((cidade_nome, ano, None),
+             partial(_tarefa_ano_pacatuba, cidade_config, ano, max_workers, driver_path, headless, pool=pool, manifesto=manifesto),
+             _limite_navegadores(max_workers, pool))
+            for ano in anos_para_processar
+        ]
+        return tarefas, {}
+
+    cache = _criar_cache(cidade_config)
+    anos_restantes = {'quantidade': len(anos_para_processar), 'trava': threading.Lock()}
+    tarefas = [
+        ((cidade_nome, ano, mes),
+         partial(worker_processar_mes_pacatuba, cidade_config, (ano, mes), driver_path, headless, pool=pool, manifesto=manifesto, cache=cache), 1)
+        for ano in anos_para_processar for mes in meses_para_processar
+    ]
+    return tarefas, {ano: partial(_finalizar_ano_mensal, cidade_config, ano, cache, anos_restantes) for ano in anos_para_processar}
+
+def _tarefa_ano_pacatuba(cidade_config: dict, ano: str, max_workers: int, driver_path: str, headless: bool, pool=None, manifesto=None):
+    """Tarefa anual do agendador global: o mesmo que 'run' faz por ano, com o 'driver_path' já instalado por main.py."""
+    log_context.task_id = f"Pacatuba-{ano}"
+    logging.getLogger('exdrop_osr').info(f"--- INICIANDO PROCESSAMENTO PARA PACATUBA - ANO DE {ano} ---")
+    cache = _criar_cache(cidade_config)
+    try:
+        with progresso.acompanhar_tarefa(cidade_config.get('nome', 'pacatuba'), ano) as tarefa:
+            _processar_ano_pacatuba(cidade_config, ano, max_workers, driver_path, headless, pool, manifesto, cache, tarefa)
+    finally:
+        if cache:
+            cache.fechar()
+
+def _processar_ano_pacatuba(cidade_config: dict, ano: str, max_workers: int, driver_path: str, headless: bool, pool, manifesto, cache, tarefa: dict):
+    """Modo ANUAL: coleta os links do ano inteiro (Fase 1), extrai os detalhes (Fase 2) e salva o resultado."""
+    cidade_nome = cidade_config.get('nome', 'pacatuba')
+    logger = logging.getLogger('exdrop_osr')
+    if manifesto and manifesto.concluido(cidade_nome, ano):
+        logger.info(f"Ano de {ano} já concluído em uma execução anterior (checkpoint). Pulando.")
+        tarefa['pulada'] = True
+        return
+
+    # --- FASE 1: COLETA DE LINKS EM FATIAS PARALELAS (MODO ANUAL) ---
+    logger.info("Modo de extração ANUAL selecionado. Iniciando coleta de links.")
+    ao_processar_link, processados_agora = _rastreador_links(_marcador_links(manifesto, cidade_nome, ano))
+    paginas_perdidas = []
+    ao_perder_paginas = lambda primeira, ultima: paginas_perdidas.append((primeira, ultima))
+    links_salvos = manifesto.dados(cidade_nome, ano, 'links') if manifesto else None
+    processados = manifesto.itens(cidade_nome, ano, 'link') if manifesto else {}
+
+    if links_salvos is None and _pipeline_disponivel(cidade_config, max_workers, pool):
+        # Fases 1 e 2 simultâneas, ligadas por uma fila limitada
+        links_coletados, dados_finais = executar_pipeline_pacatuba(
+            cidade_config, ano, max_workers, driver_path, headless, pool=pool, cache=cache,
+            ao_processar_link=ao_processar_link, links_ja_processados=set(processados), ao_perder_paginas=ao_perder_paginas
+        )
+        dados_finais.extend(dados for dados in processados.values() if dados)
+    else:
+        if links_salvos is not None:
+            links_coletados = links_salvos
+            logger.info(f"Fase 1 reaproveitada do checkpoint: {len(links_coletados)} links.")
+        else:
+            links_coletados = coletar_links_paralelo(cidade_config, ano, max_workers, driver_path, headless, pool=pool,
+                                                     ao_perder_paginas=ao_perder_paginas)
+        logger.info(f"Fase 1 concluída. Total de {len(links_coletados)} links coletados para o ano de {ano}.")
+
+        # --- FASE 2: DISTRIBUIÇÃO E PROCESSAMENTO PARALELO ---
+        links_para_processar, dados_finais = _separar_links_processados(manifesto, links_coletados, cidade_nome, ano)
+        dados_finais.extend(_extrair_detalhes_ano(
+            cidade_config, links_para_processar, ano, max_workers, driver_path, headless,
+            pool=pool, cache=cache, ao_processar_link=ao_processar_link
+        ))
+
+    # Só uma lista de links completa é reaproveitada; com páginas perdidas, a próxima execução coleta de novo
+    if manifesto and links_salvos is None and not paginas_perdidas:
+        manifesto.marcar(cidade_nome, ano, 'links', dados=links_coletados)
+    links_pendentes = [link for link in dict.fromkeys(links_coletados) if link not in processados and link not in processados_agora]
+
+    # --- SALVAR RESULTADOS ---
+    dados_finais = _sem_duplicatas(dados_finais, ano)
+    if dados_finais and cidade_config.get('captura_bruta'):
+        dados_finais = separar_brutos(dados_finais, cidade_nome, ano, None, termos_royalties(cidade_config))
+    if dados_finais:
+        caminhos = []
+        if gera_csv(cidade_config):
+            output_dir = os.path.join("data", "processed", "pacatuba")
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, f"pacatuba_royalties_{ano}.csv")
+            pd.DataFrame(dados_finais).to_csv(output_path, index=False, sep=';', encoding='utf-8-sig')
+            caminhos.append(output_path)
+        if gera_parquet(cidade_config):
+            caminhos.append(salvar_parquet(dados_finais, cidade_nome, ano))
+        logger.info(f"Processamento concluído. {len(dados_finais)} registros salvos em: {', '.join(caminhos)}")
+    else:
+        logger.info("Nenhum registro de royalties foi extraído.")
+    registrar_pagamentos(dados_finais, cidade_nome, ano)
+
+    if manifesto:
+        manifesto.concluir_periodo(cidade_nome, ano, dados={'registros': len(dados_finais)},
+                                   pendentes=len(links_pendentes) + len(paginas_perdidas), intermediarias=('link', 'links'))
+    if cache: cache.relatar()
+    tarefa['mantidas'] = len(dados_finais)
+    logger.info(f"--- FINALIZADO PROCESSAMENTO DE PACATUBA - ANO DE {ano} ---")
+
+def run(cidade_config: dict, anos_para_processar: List[str], meses_para_processar: List[str] | None, max_workers: int, headless:bool, pool=None, manifesto=None):
     """
     Ponto de entrada para o scraper de Pacatuba.
     Decide entre a extração anual (coleta de links em massa) ou mensal
     com base no parâmetro 'meses_para_processar'.
+    Se 'pool' (DriverPool) for informado, todas as fases reutilizam os navegadores dele.
+    Se 'manifesto' (ManifestoCheckpoint) for informado, a execução retoma de onde parou:
+    meses/anos concluídos são pulados, a lista de links da Fase 1 é reaproveitada e
+    apenas os links ainda não visitados vão para a Fase 2.
     """
     
     logger = logging.getLogger('exdrop_osr')
@@ -382,81 +1134,33 @@ def run(cidade_config: dict, anos_para_processar: List[str], meses_para_processa
         logger.critical(f"Falha ao instalar o ChromeDriver. Abortando. Erro: {e}")
         return
     # --- FIM DA INSTALAÇÃO ---
-    
-    for ano in anos_para_processar:
-        log_context.task_id = f"Pacatuba-{ano}"
-        logger.info(f"--- INICIANDO PROCESSAMENTO PARA PACATUBA - ANO DE {ano} ---")
-        
-        # --- DECISÃO DA ESTRATÉGIA ---
-        if meses_para_processar:
-            # MODO MENSAL: Paraleliza por mês
-            logger.info(f"Modo de extração MENSAL selecionado para os meses: {meses_para_processar}")
-            tarefas = [(ano, mes) for mes in meses_para_processar]
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                func_com_args = partial(worker_processar_mes_pacatuba, cidade_config, driver_path=driver_path, headless=headless)
-                futures = {executor.submit(func_com_args, tarefa) for tarefa in tarefas}
-                for future in as_completed(futures):
-                    future.result() # Apenas para capturar exceções
-            
-            # Consolida os arquivos mensais gerados
-            unir_csvs_por_ano(cidade_nome=cidade_nome, ano=ano)  
-        
-        else:
-            # --- FASE 1: COLETA DE LINKS EM LOTES (MODO ANUAL) ---
-            logger.info("Modo de extração ANUAL selecionado. Iniciando coleta de links em lotes.")
-            links_para_processar = []
-            pagina_atual = 1
-            paginas_por_lote = 50 # Define o tamanho do lote. Ajustar se necessário.
-
-            while True:
-                logger.info(f"Iniciando coleta de lote a partir da página {pagina_atual}...")
-                novos_links, tem_mais_paginas = coletar_links_lote(
-                    cidade_config, ano, pagina_atual, paginas_por_lote, driver_path, headless
-                )
-                if novos_links:
-                    links_para_processar.extend(novos_links)
-                    logger.info(f"{len(novos_links)} links adicionados. Total até agora: {len(links_para_processar)}.")
-                
-                if not tem_mais_paginas:
-                    logger.info("Fim da coleta de links detectado.")
-                    break
-                
-                pagina_atual += paginas_por_lote
 
-            logger.info(f"Fase 1 concluída. Total de {len(links_para_processar)} links coletados para o ano de {ano}.")
-            if not links_para_processar:
-                continue
+    # Cache em disco dos detalhes já extraídos (chave 'cache_detalhes' da cidade)
+    cache = _criar_cache(cidade_config)
+    try:
+        for ano in anos_para_processar:
+            log_context.task_id = f"Pacatuba-{ano}"
+            logger.info(f"--- INICIANDO PROCESSAMENTO PARA PACATUBA - ANO DE {ano} ---")
 
-        # --- FASE 2: DISTRIBUIÇÃO E PROCESSAMENTO PARALELO ---
-        logger.info(f"Fase 2: Iniciando extração com {max_workers} workers.")
-        dados_finais = []
-        
-        if max_workers > len(links_para_processar): max_workers = len(links_para_processar)
-        lista_de_tarefas = numpy.array_split(links_para_processar, max_workers) if max_workers > 0 else []
+            # --- DECISÃO DA ESTRATÉGIA ---
+            if meses_para_processar:
+                # MODO MENSAL: Paraleliza por mês
+                logger.info(f"Modo de extração MENSAL selecionado para os meses: {meses_para_processar}")
+                tarefas = [(ano, mes) for mes in meses_para_processar]
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    func_com_args = partial(worker_processar_mes_pacatuba, cidade_config, driver_path=driver_path, headless=headless, pool=pool, manifesto=manifesto, cache=cache)
+                    futures = {executor.submit(func_com_args, tarefa) for tarefa in tarefas}
+                    for future in as_completed(futures):
+                        future.result() # Apenas para capturar exceções
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            func_com_args = partial(worker_extrair_detalhes_pacatuba, driver_path=driver_path, headless=headless)
-            futures = {executor.submit(func_com_args, tarefa.tolist(), ano): i for i, tarefa in enumerate(lista_de_tarefas) if tarefa.size > 0}
-            
-            # Lógica de log de progresso
-            lotes_concluidos = 0
-            total_lotes = len(futures)
-            
-            for future in as_completed(futures):
-                if resultado_parcial := future.result(): dados_finais.extend(resultado_parcial)
+                # Consolida os arquivos mensais gerados
+                if gera_csv(cidade_config):
+                    unir_csvs_por_ano(cidade_nome=cidade_nome, ano=ano)
+                if cache: cache.relatar()
+                continue  # No modo mensal a Fase 2 já foi feita por cada worker
 
-            lotes_concluidos =+ 1
-            logger.info(f"[PROGRESSO] Lote {lotes_concluidos} de {total_lotes} concluído")
-        # --- SALVAR RESULTADOS ---
-        if dados_finais:
-            output_dir = os.path.join("data", "processed", "pacatuba")
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, f"pacatuba_royalties_{ano}.csv")
-            
-            df = pd.DataFrame(dados_finais)
-            df.to_csv(output_path, index=False, sep=';', encoding='utf-8-sig')
-            logger.info(f"Processamento concluído. {len(df)} registros salvos em: {output_path}")
-        else:
-            logger.info("Nenhum registro de royalties foi extraído.")
-            
-        logger.info(f"--- FINALIZADO PROCESSAMENTO DE PACATUBA - ANO DE {ano} ---")
\ No newline at end of file
+            with progresso.acompanhar_tarefa(cidade_nome, ano) as tarefa:
+                _processar_ano_pacatuba(cidade_config, ano, max_workers, driver_path, headless, pool, manifesto, cache, tarefa)
+    finally:
+        if cache:
+            cache.fechar()
\ No newline at end of file
@@ -0,0 +1,36 @@
+# tests/test_deduplicacao.py
+
+import pandas as pd
+
+from src.common.deduplicacao import IndiceDeduplicacao
+
+
+def _registro(**campos):
+    registro = {
+        'orgao': 'SECRETARIA DE SAUDE', 'unidade': 'FMS', 'data': '10/03/2023',
+        'empenho': '123', 'processo': '45/2023', 'credor': 'FORNECEDOR LTDA',
+        'cpf_cnpj': '00.000.000/0001-00', 'pago': '1.000,00', 'retido': '0,00',
+        'anulacao': '0,00', 'fonte_de_recurso': 'ROYALTIES', 'historico': 'PAGAMENTO',
+    }
+    registro.update(campos)
+    return registro
+
+
+def test_linhas_que_diferem_so_na_fonte_sao_mantidas():
+    registros = [_registro(), _registro(fonte_de_recurso='RECURSOS PROPRIOS'), _registro()]
+
+    indice = IndiceDeduplicacao()
+    mantidos = indice.filtrar(registros)
+
+    assert mantidos == registros[:2]
+    assert indice.descartados == 1
+
+
+def test_filtrar_df_mantem_linhas_que_diferem_so_na_fonte():
+    df = pd.DataFrame([_registro(), _registro(fonte_de_recurso='RECURSOS PROPRIOS'), _registro()])
+
+    indice = IndiceDeduplicacao()
+    mantidos = indice.filtrar_df(df)
+
+    assert list(mantidos['fonte_de_recurso']) == ['ROYALTIES', 'RECURSOS PROPRIOS']
+    assert indice.descartados == 1
@@ -0,0 +1,49 @@
+# tests/test_pacatuba_coleta.py
+
+from selenium.common.exceptions import WebDriverException
+
+from src.scrapers import pacatuba_scraper
+
+
+def _lote_que_falha(falhar_apos: dict):
+    """Simula 'coletar_links_lote': 2 links por página; a 1ª chamada lê 'falhar_apos' páginas e levanta."""
+    chamadas = []
+
+    def coletar_links_lote(cidade_config, ano, pagina_inicial, paginas_por_lote, driver_path, headless, pool=None, ao_coletar_pagina=None):
+        chamadas.append((pagina_inicial, paginas_por_lote))
+        for pagina in range(pagina_inicial, pagina_inicial + paginas_por_lote):
+            if len(chamadas) == 1 and pagina - pagina_inicial == falhar_apos["paginas"]:
+                raise WebDriverException("botão 'próxima' sumiu")
+            ao_coletar_pagina([f"link-{pagina}-a", f"link-{pagina}-b"])
+        return [], False  # O retorno não deve ser usado
+
+    return coletar_links_lote, chamadas
+
+
+def test_fatia_retoma_sem_perder_as_paginas_lidas_antes_da_falha(monkeypatch):
+    coletar_links_lote, chamadas = _lote_que_falha({"paginas": 3})
+    monkeypatch.setattr(pacatuba_scraper, "coletar_links_lote", coletar_links_lote)
+    perdidas, por_pagina = [], []
+
+    links = pacatuba_scraper._coletar_fatia({}, "2024", 11, 5, None, True, ao_coletar_pagina=por_pagina.append,
+                                            ao_perder_paginas=lambda primeira, ultima: perdidas.append((primeira, ultima)))
+
+    assert chamadas == [(11, 5), (14, 2)]
+    assert links == [f"link-{pagina}-{lado}" for pagina in range(11, 16) for lado in "ab"]
+    assert len(por_pagina) == 5
+    assert perdidas == []
+
+
+def test_fatia_informa_as_paginas_que_nunca_foram_lidas(monkeypatch):
+    def coletar_links_lote(cidade_config, ano, pagina_inicial, paginas_por_lote, driver_path, headless, pool=None, ao_coletar_pagina=None):
+        ao_coletar_pagina([f"link-{pagina_inicial}"])
+        raise WebDriverException("sessão perdida")
+
+    monkeypatch.setattr(pacatuba_scraper, "coletar_links_lote", coletar_links_lote)
+    perdidas = []
+
+    links = pacatuba_scraper._coletar_fatia({"tentativas_por_fatia": 2}, "2024", 1, 4, None, True,
+                                            ao_perder_paginas=lambda primeira, ultima: perdidas.append((primeira, ultima)))
+
+    assert links == ["link-1", "link-2"]
+    assert perdidas == [(3, 4)]
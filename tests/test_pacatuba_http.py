@@ -0,0 +1,61 @@
+# tests/test_pacatuba_http.py
+
+import requests
+
+from src.common import retentativas
+from src.scrapers import pacatuba_http
+
+
+class _Resposta:
+    def __init__(self, status_code: int, content: bytes = b""):
+        self.status_code = status_code
+        self.content = content
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+
+class _SessaoFalsa:
+    def __init__(self, respostas: dict):
+        self.respostas = respostas
+
+    def get(self, link, timeout=None):
+        resposta = self.respostas[link]
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+
+class _PoliticaEspia(retentativas.PoliticaPortal):
+    def __init__(self):
+        super().__init__(pacatuba_http.PORTAL)
+        self.eventos = []
+
+    def aguardar_liberacao(self):
+        self.eventos.append("liberacao")
+        super().aguardar_liberacao()
+
+    def registrar_sucesso(self):
+        self.eventos.append("sucesso")
+        super().registrar_sucesso()
+
+    def registrar_falha(self):
+        self.eventos.append("falha")
+        super().registrar_falha()
+
+
+def test_worker_http_informa_a_politica_do_portal(monkeypatch):
+    espia = _PoliticaEspia()
+    monkeypatch.setattr(pacatuba_http, "politica", lambda portal: espia)
+    sessao = _SessaoFalsa({
+        "ok": _Resposta(200, b"<html><body></body></html>"),
+        "lento": requests.Timeout("tempo esgotado"),
+        "fora": _Resposta(503),
+        "inexistente": _Resposta(404),
+    })
+
+    pacatuba_http.worker_extrair_detalhes_pacatuba_http(["ok", "lento", "fora", "inexistente"], "2024", sessao=sessao)
+
+    # O 404 (link inválido) não conta como falha do portal
+    assert espia.eventos == ["liberacao", "sucesso", "liberacao", "falha", "liberacao", "falha", "liberacao"]
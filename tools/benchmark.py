@@ -0,0 +1,261 @@
+# tools/benchmark.py
+
+"""
+Benchmark de ponta a ponta dos scrapers contra o portal falso (tools/portal_falso.py).
+
+Sobe o portal local, roda 'aracaju_barra_pirambu_scraper' e/ou 'pacatuba_scraper'
+em modo headless para cada quantidade de workers pedida e informa, por execução:
+tempo total, linhas/s (detalhes abertos), páginas/s (páginas da listagem servidas),
+falhas injetadas, registros salvos e a memória (RSS) dos navegadores, medida por
+amostragem de todos os processos do Chrome/ChromeDriver filhos deste processo.
+O custo do log também é medido: registros emitidos, mensagens descartadas pela
+amostragem e microssegundos gastos com log por linha nas threads dos workers
+(src/common/logging_setup.py), que deve ficar estável com mais workers.
+O JSON de saída traz também os histogramas por etapa (src/common/metricas.py)
+e, com '--perfilar', o orçamento de comandos do WebDriver (src/common/perfilador.py).
+
+As configurações das cidades vêm do config.json (entradas 'aracaju' e 'pacatuba'),
+com a 'url' trocada pela do portal local; '--config-extra' sobrescreve chaves
+(ex.: '{"extracao_em_lote": true}') para comparar variantes de um scraper.
+Cada execução roda em uma pasta temporária, então data/ e logs/ do projeto não
+são tocados.
+
+Uso:
+    python tools/benchmark.py --workers 1 2 4 --meses 01 02 --linhas 100 --latencia 0.2
+
+A medição de memória usa o 'psutil' (opcional: sem ele, o RSS não é informado).
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.common.driver_pool import DriverPool
+from src.common.logging_setup import estatisticas_logging, setup_logging
+from src.common.metricas import configurar_metricas, resumo_metricas
+from src.common import perfilador
+from src.common.retentativas import configurar_politicas
+from src.scrapers import aracaju_barra_pirambu_scraper, pacatuba_scraper
+from tools.portal_falso import CAMINHO_MUNICIPIOONLINE, CAMINHO_PACATUBA, iniciar_em_segundo_plano
+
+PORTAIS = {
+    aracaju_barra_pirambu_scraper.PORTAL: ("aracaju", CAMINHO_MUNICIPIOONLINE),
+    pacatuba_scraper.PORTAL: ("pacatuba", CAMINHO_PACATUBA),
+}
+
+
+class AmostradorMemoria:
+    """Soma, a cada 'intervalo' segundos, o RSS dos processos do navegador filhos deste processo."""
+
+    def __init__(self, intervalo: float = 0.5):
+        self.intervalo = intervalo
+        self.amostras = []
+        self._parar = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._processo = psutil.Process()
+        except ImportError:
+            self._processo = None
+
+    def _medir(self) -> int:
+        total = 0
+        for filho in self._processo.children(recursive=True):
+            try:
+                if "chrome" in filho.name().lower():
+                    total += filho.memory_info().rss
+            except Exception:
+                continue  # O processo terminou durante a leitura
+        return total
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self.amostras.append(self._medir())
+
+    def __enter__(self):
+        if self._processo is not None:
+            self._thread = threading.Thread(target=self._executar, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+
+    def resumo(self) -> dict:
+        if not self.amostras:
+            return {"rss_pico_mb": None, "rss_medio_mb": None}
+        mb = 1024 * 1024
+        return {"rss_pico_mb": round(max(self.amostras) / mb, 1),
+                "rss_medio_mb": round(sum(self.amostras) / len(self.amostras) / mb, 1)}
+
+
+def _config_cidade(portal: str, url_base: str, extra: dict) -> dict:
+    """Configuração da cidade do config.json (se existir), apontada para o portal local."""
+    nome, caminho = PORTAIS[portal]
+    config_cidade = {}
+    if os.path.exists("config.json"):
+        with open("config.json", "r", encoding="utf-8") as f:
+            config = json.load(f)
+        config_cidade = dict(config.get("configuracoes_cidades", {}).get(nome, {}))
+        config_cidade.setdefault("perfil_navegador", config.get("perfil_navegador", "padrao"))
+    config_cidade.update({"nome": nome, "url": f"{url_base}{caminho}", **extra})
+    return config_cidade
+
+def _registros_salvos() -> int:
+    """Linhas dos CSVs mensais/anuais gerados na pasta da execução (sem os consolidados)."""
+    total = 0
+    for arquivo in glob.glob(os.path.join("data", "processed", "*", "*.csv")):
+        if not arquivo.endswith("_consolidado.csv"):
+            with open(arquivo, "r", encoding="utf-8-sig") as f:
+                total += max(0, sum(1 for _ in f) - 1)
+    return total
+
+def _executar_portal(portal: str, cidade_config: dict, ano: str, meses: list, workers: int, driver_path: str,
+                     usar_pool: bool, modo_pacatuba: str):
+    """Roda o scraper do portal para os meses pedidos com 'workers' workers, como o main.py faria."""
+    modulo = aracaju_barra_pirambu_scraper if portal == aracaju_barra_pirambu_scraper.PORTAL else pacatuba_scraper
+    fabrica = aracaju_barra_pirambu_scraper.start_driver_aracaju_family if modulo is aracaju_barra_pirambu_scraper else pacatuba_scraper.start_driver_pacatuba
+    pool = DriverPool(partial(fabrica, headless=True, executable_path=driver_path,
+                              perfil=cidade_config.get("perfil_navegador", "padrao")), tamanho_maximo=workers) if usar_pool else None
+    try:
+        if modulo is pacatuba_scraper and modo_pacatuba == "anual":
+            pacatuba_scraper.executar_pipeline_pacatuba(cidade_config, ano, workers, driver_path, True, pool=pool)
+            return
+        if modulo is pacatuba_scraper:
+            tarefa = partial(pacatuba_scraper.worker_processar_mes_pacatuba, cidade_config, driver_path=driver_path, headless=True, pool=pool)
+            argumentos = [((ano, mes),) for mes in meses]
+        else:
+            tarefa = partial(aracaju_barra_pirambu_scraper.worker_processar_mes, cidade_config, driver_path=driver_path, headless=True, pool=pool)
+            argumentos = [(ano, mes) for mes in meses]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(tarefa, *args) for args in argumentos]:
+                future.result()
+    finally:
+        if pool:
+            pool.fechar()
+
+def medir(servidor, portal: str, cidade_config: dict, ano: str, meses: list, workers: int, driver_path: str,
+          usar_pool: bool = True, modo_pacatuba: str = "mensal", perfilar: bool = False) -> dict:
+    """Executa uma rodada em uma pasta temporária e devolve as métricas dela."""
+    pasta_original = os.getcwd()
+    pasta = tempfile.mkdtemp(prefix=f"benchmark_{portal}_{workers}_")
+    os.chdir(pasta)
+    os.makedirs("logs", exist_ok=True)
+    configurar_politicas({portal: {}})  # Cada rodada começa com orçamento cheio e disjuntor fechado
+    configurar_metricas()
+    perfilador.configurar_perfilador({"ativo": perfilar})
+    servidor.contadores.zerar()
+    log_antes = estatisticas_logging()
+    try:
+        with AmostradorMemoria() as memoria:
+            inicio = time.perf_counter()
+            _executar_portal(portal, cidade_config, ano, meses, workers, driver_path, usar_pool, modo_pacatuba)
+            duracao = time.perf_counter() - inicio
+        registros = _registros_salvos()
+    finally:
+        os.chdir(pasta_original)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    contagem = servidor.contadores.instantaneo()
+    log_depois = estatisticas_logging()
+    registros_log = log_depois["registros"] - log_antes["registros"]
+    tempo_log = log_depois["tempo_s"] - log_antes["tempo_s"]
+    return {
+        "portal": portal,
+        "workers": workers,
+        "tempo_s": round(duracao, 2),
+        "paginas": contagem["paginas"],
+        "linhas": contagem["detalhes"],
+        "paginas_por_s": round(contagem["paginas"] / duracao, 2) if duracao else None,
+        "linhas_por_s": round(contagem["detalhes"] / duracao, 2) if duracao else None,
+        "falhas_injetadas": contagem["falhas_injetadas"],
+        "registros_salvos": registros,
+        "log_registros": registros_log,
+        "log_suprimidos": log_depois["suprimidas"] - log_antes["suprimidas"],
+        "log_us_por_linha": round(tempo_log / contagem["detalhes"] * 1e6, 1) if contagem["detalhes"] else None,
+        "log_us_por_registro": round(tempo_log / registros_log * 1e6, 1) if registros_log else None,
+        **memoria.resumo(),
+        "etapas": resumo_metricas(),
+        **({"comandos": perfilador.relatorio_perfilador()} if perfilar else {}),
+    }
+
+def _imprimir(resultados: list):
+    colunas = ("portal", "workers", "tempo_s", "linhas_por_s", "paginas_por_s", "linhas", "paginas",
+               "falhas_injetadas", "registros_salvos", "log_us_por_linha", "rss_pico_mb", "rss_medio_mb")
+    larguras = {c: max(len(c), *(len(str(r[c])) for r in resultados)) for c in colunas}
+    print("  ".join(c.ljust(larguras[c]) for c in colunas))
+    for resultado in resultados:
+        print("  ".join(str(resultado[c]).ljust(larguras[c]) for c in colunas))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta dos scrapers contra o portal falso.")
+    parser.add_argument("--portais", nargs="+", choices=sorted(PORTAIS), default=sorted(PORTAIS))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--ano", default="2024")
+    parser.add_argument("--meses", nargs="+", default=["01", "02"])
+    parser.add_argument("--modo-pacatuba", choices=("mensal", "anual"), default="mensal",
+                        help="'anual' usa o pipeline de links e detalhes (lista os 12 meses do ano).")
+    parser.add_argument("--linhas", type=int, default=50, help="Pagamentos por mês no portal falso.")
+    parser.add_argument("--latencia", type=float, default=0.1, help="Latência (s) das páginas da listagem.")
+    parser.add_argument("--latencia-detalhe", type=float, default=0.02, help="Latência (s) de cada detalhe.")
+    parser.add_argument("--taxa-falhas", type=float, default=0.0, help="Fração das requisições que respondem HTTP 500.")
+    parser.add_argument("--config-extra", type=json.loads, default={}, help="JSON mesclado à configuração das cidades.")
+    parser.add_argument("--perfilar", action="store_true", help="Conta os comandos do WebDriver por linha/página (src/common/perfilador.py).")
+    parser.add_argument("--sem-pool", action="store_true", help="Cada worker abre o próprio navegador, sem o DriverPool.")
+    parser.add_argument("--chromedriver", help="Caminho do ChromeDriver (padrão: instalado pelo webdriver-manager).")
+    parser.add_argument("--saida", default=os.path.join("logs", "benchmark.json"))
+    parser.add_argument("--detalhado", action="store_true", help="Mostra o log INFO dos scrapers no console.")
+    args = parser.parse_args()
+
+    caminho_saida = os.path.abspath(args.saida)
+    setup_logging(log_file=os.path.join(tempfile.gettempdir(), "exdrop_benchmark", "benchmark.log"),
+                  nivel_console=logging.INFO if args.detalhado else logging.WARNING)
+
+    driver_path = args.chromedriver
+    if not driver_path:
+        from webdriver_manager.chrome import ChromeDriverManager
+        driver_path = ChromeDriverManager().install()
+
+    servidor, url_base = iniciar_em_segundo_plano(
+        porta=0, linhas=args.linhas, latencia=args.latencia, latencia_detalhe=args.latencia_detalhe,
+        taxa_falhas=args.taxa_falhas
+    )
+    try:
+        import psutil  # noqa: F401
+    except ImportError:
+        print("psutil não instalado: o RSS dos navegadores não será medido.")
+
+    resultados = []
+    try:
+        for portal in args.portais:
+            cidade_config = _config_cidade(portal, url_base, args.config_extra)
+            for workers in args.workers:
+                print(f"Medindo {portal} com {workers} worker(s)...", flush=True)
+                resultados.append(medir(servidor, portal, cidade_config, args.ano, args.meses, workers, driver_path,
+                                        usar_pool=not args.sem_pool, modo_pacatuba=args.modo_pacatuba,
+                                        perfilar=args.perfilar))
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    _imprimir(resultados)
+    os.makedirs(os.path.dirname(caminho_saida) or ".", exist_ok=True)
+    with open(caminho_saida, "w", encoding="utf-8") as f:
+        json.dump({"parametros": vars(args), "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    print(f"Resultados salvos em {caminho_saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,526 @@
+# tools/portal_falso.py
+
+"""
+Portal local que imita as duas famílias de portais da transparência.
+
+Gera pagamentos sintéticos (determinísticos) e serve:
+
+  * municipioonline (Aracaju/Barra/Pirambu) em /municipioonline/despesa:
+    abas com 'Pagamentos' em //ul/li[4]/a, '#loading', filtros de ano/mês,
+    a tabela 'dataTables-Pagamentos' (paginação, 'dataTables-Pagamentos_next',
+    seletor de tamanho de página e texto 'Mostrando X a Y de Z registros') e o
+    painel de detalhes aberto pelo 'td.details-control'. A página consome os
+    mesmos endpoints AJAX usados pelo motor HTTP ('pagamentos' e 'pagamentos/detalhe').
+
+  * Pacatuba em /pacatuba/despesas: banner de cookies, filtro por mês com
+    dropdowns no estilo select2, listagem paginada por '?pagina=N' com os links
+    'detalhesPagamento' e as páginas de detalhe com 'table-dados',
+    'table-historico' e 'table-outras-informacoes'.
+
+Latência e falhas (HTTP 500) podem ser injetadas nas requisições de listagem e
+de detalhe. O servidor conta as páginas, detalhes e falhas servidos, o que o
+benchmark (tools/benchmark.py) usa para calcular páginas/s e linhas/s.
+
+Uso:
+    python tools/portal_falso.py --linhas 200 --latencia 0.3 --taxa-falhas 0.02 --porta 8766
+
+e, no config.json, aponte a "url" das cidades para:
+    http://127.0.0.1:8766/municipioonline/despesa   (Aracaju/Barra/Pirambu)
+    http://127.0.0.1:8766/pacatuba/despesas         (Pacatuba)
+"""
+
+import argparse
+import calendar
+import html
+import json
+import math
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+CAMINHO_MUNICIPIOONLINE = "/municipioonline/despesa"
+CAMINHO_PACATUBA = "/pacatuba/despesas"
+CAMINHO_DETALHE_PACATUBA = "/pacatuba/detalhesPagamento"
+
+FONTES_ROYALTIES = ["15300000 - Royalties do Petróleo", "17050000 - Compensação Financeira (Royalties)"]
+FONTES_COMUNS = ["15000000 - Recursos Ordinários", "15500000 - Transferências do FUNDEB", "16000000 - Recursos do SUS"]
+ORGAOS = ["SECRETARIA MUNICIPAL DE EDUCAÇÃO", "SECRETARIA MUNICIPAL DE SAÚDE", "SECRETARIA MUNICIPAL DE OBRAS", "GABINETE DO PREFEITO"]
+TAMANHOS_PAGINA = (10, 25, 50, 100, -1)
+
+
+def _moeda(valor: float) -> str:
+    return "R$ " + f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def _documento(aleatorio: random.Random) -> str:
+    digitos = [aleatorio.randint(0, 9) for _ in range(14)]
+    return "{}{}.{}{}{}.{}{}{}/{}{}{}{}-{}{}".format(*digitos)
+
+
+class DadosFalsos:
+    """Pagamentos sintéticos: os mesmos (ano, mês, índice) geram sempre o mesmo registro."""
+
+    def __init__(self, linhas_por_mes: int = 200, proporcao_royalties: float = 0.2, semente: int = 0):
+        self.linhas_por_mes = linhas_por_mes
+        self.proporcao_royalties = proporcao_royalties
+        self.semente = semente
+
+    @lru_cache(maxsize=256)
+    def pagamentos(self, portal: str, ano: str, mes: str) -> tuple:
+        ultimo_dia = calendar.monthrange(int(ano), int(mes))[1]
+        registros = []
+        for indice in range(self.linhas_por_mes):
+            aleatorio = random.Random(f"{self.semente}-{portal}-{ano}-{mes}-{indice}")
+            pago = round(aleatorio.uniform(50, 250_000), 2)
+            royalties = aleatorio.random() < self.proporcao_royalties
+            registros.append({
+                "id": f"{ano}{mes}{indice:06d}",
+                "orgao": aleatorio.choice(ORGAOS),
+                "unidade": f"UNIDADE GESTORA {aleatorio.randint(1, 40):02d}",
+                "data": f"{aleatorio.randint(1, ultimo_dia):02d}/{mes}/{ano}",
+                "empenho": f"{mes}{indice:05d}",
+                "processo": f"{aleatorio.randint(1, 9999):04d}/{ano}",
+                "credor": f"FORNECEDOR {aleatorio.randint(1, 500):03d} LTDA",
+                "cpf_cnpj": _documento(aleatorio),
+                "pago": _moeda(pago),
+                "retido": _moeda(round(pago * aleatorio.choice((0, 0, 0.015, 0.05)), 2)),
+                "anulacao": _moeda(0),
+                "fonte": aleatorio.choice(FONTES_ROYALTIES if royalties else FONTES_COMUNS),
+                "historico": f"Pagamento referente ao empenho {mes}{indice:05d} - serviços prestados em {mes}/{ano}.",
+            })
+        return tuple(registros)
+
+    def pagamentos_do_ano(self, portal: str, ano: str) -> list:
+        return [registro for mes in range(1, 13) for registro in self.pagamentos(portal, ano, f"{mes:02d}")]
+
+    def por_id(self, portal: str, id_pagamento: str) -> dict | None:
+        ano, mes, indice = id_pagamento[:4], id_pagamento[4:6], id_pagamento[6:]
+        if not (ano.isdigit() and mes.isdigit() and indice.isdigit()) or not 1 <= int(mes) <= 12:
+            return None
+        registros = self.pagamentos(portal, ano, mes)
+        return registros[int(indice)] if int(indice) < len(registros) else None
+
+
+class Contadores:
+    """Requisições servidas, por tipo, para o cálculo de vazão do benchmark."""
+
+    CAMPOS = ("paginas", "linhas_listadas", "detalhes", "falhas_injetadas")
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            self.valores = dict.fromkeys(self.CAMPOS, 0)
+
+    def somar(self, campo: str, quantidade: int = 1):
+        with self._trava:
+            self.valores[campo] += quantidade
+
+    def instantaneo(self) -> dict:
+        with self._trava:
+            return dict(self.valores)
+
+
+# --- municipioonline ---
+
+PAGINA_MUNICIPIOONLINE = r"""<!DOCTYPE html>
+<html lang="pt-br"><head><meta charset="utf-8"><title>Portal da Transparência - Despesa</title>
+<style>
+  body { font-family: sans-serif; font-size: 13px; }
+  ul.nav li { display: inline-block; margin-right: 12px; }
+  #loading { position: fixed; inset: 0; background: rgba(255,255,255,.7); text-align: center; padding-top: 200px; }
+  td.details-control { cursor: pointer; width: 24px; text-align: center; }
+  tr.shown td.details-control { color: #c00; }
+  .paginate_button { display: inline-block; padding: 2px 8px; cursor: pointer; }
+  .paginate_button.disabled { color: #aaa; cursor: default; }
+</style></head>
+<body>
+<input type="hidden" name="__RequestVerificationToken" value="token-portal-falso">
+<ul class="nav nav-tabs">
+  <li><a href="#receitas">Receitas</a></li>
+  <li><a href="#empenhos">Empenhos</a></li>
+  <li><a href="#liquidacoes">Liquidações</a></li>
+  <li><a href="#pagamentos" id="abaPagamentos">Pagamentos</a></li>
+</ul>
+<div id="loading" style="display:none">Carregando...</div>
+<div id="painelPagamentos" style="display:none">
+  <select id="ddlAnoPagamentos">__OPCOES_ANO__</select>
+  <select id="ddlMesPagamentos">__OPCOES_MES__</select>
+  <button id="btnFiltrarPagamentos" type="button">Filtrar</button>
+  <label>Exibir <select name="dataTables-Pagamentos_length">__OPCOES_TAMANHO__</select> registros</label>
+  <table id="dataTables-Pagamentos" class="table">
+    <thead><tr><th></th><th>Órgão</th><th>Unidade</th><th>Data</th><th>Empenho</th><th>Processo</th>
+      <th>Credor</th><th>CPF/CNPJ</th><th>Pago</th><th>Retido</th><th>Anulação</th></tr></thead>
+    <tbody></tbody>
+  </table>
+  <div id="dataTables-Pagamentos_info">Mostrando 0 a 0 de 0 registros</div>
+  <div class="dataTables_paginate"><ul class="pagination">
+    <li class="paginate_button previous disabled" id="dataTables-Pagamentos_previous"><a href="#">Anterior</a></li>
+    <li class="paginate_button next disabled" id="dataTables-Pagamentos_next"><a href="#">Próximo</a></li>
+  </ul></div>
+</div>
+<script>
+(function () {
+  const base = window.location.pathname.replace(/\/$/, '');
+  const token = document.querySelector("input[name='__RequestVerificationToken']").value;
+  const estado = {ano: null, mes: null, inicio: 0, tamanho: 10, total: 0, draw: 0};
+  const loading = document.getElementById('loading');
+  const corpo = document.querySelector('#dataTables-Pagamentos > tbody');
+  const proximo = document.getElementById('dataTables-Pagamentos_next');
+  const anterior = document.getElementById('dataTables-Pagamentos_previous');
+
+  function mostrarCarregando(visivel) { loading.style.display = visivel ? 'block' : 'none'; }
+  function celula(texto) { const td = document.createElement('td'); td.textContent = texto; return td; }
+
+  function desenhar() {
+    mostrarCarregando(true);
+    const corpoRequisicao = new URLSearchParams({draw: ++estado.draw, start: estado.inicio, length: estado.tamanho,
+                                                 ano: estado.ano, mes: estado.mes, __RequestVerificationToken: token});
+    fetch(base + '/pagamentos', {method: 'POST', body: corpoRequisicao})
+      .then(r => { if (!r.ok) throw new Error('HTTP ' + r.status); return r.json(); })
+      .then(resposta => {
+        estado.total = resposta.recordsFiltered;
+        corpo.innerHTML = '';
+        resposta.data.forEach((linha, i) => {
+          const tr = document.createElement('tr');
+          tr.setAttribute('role', 'row');
+          tr.className = i % 2 ? 'even' : 'odd';
+          const controle = document.createElement('td');
+          controle.className = 'details-control';
+          controle.dataset.id = linha[0].match(/data-id="([^"]+)"/)[1];
+          controle.textContent = '+';
+          tr.appendChild(controle);
+          linha.slice(1).forEach(valor => tr.appendChild(celula(valor)));
+          corpo.appendChild(tr);
+        });
+        const fim = estado.tamanho < 0 ? estado.total : Math.min(estado.inicio + estado.tamanho, estado.total);
+        document.getElementById('dataTables-Pagamentos_info').textContent =
+          'Mostrando ' + (estado.total ? estado.inicio + 1 : 0) + ' a ' + fim + ' de ' + estado.total.toLocaleString('pt-BR') + ' registros';
+        proximo.classList.toggle('disabled', fim >= estado.total);
+        anterior.classList.toggle('disabled', estado.inicio === 0);
+      })
+      .catch(() => {})  // Como no portal real, uma falha mantém a página anterior na tela
+      .finally(() => mostrarCarregando(false));
+  }
+
+  document.getElementById('abaPagamentos').addEventListener('click', e => {
+    e.preventDefault();
+    mostrarCarregando(true);
+    setTimeout(() => { document.getElementById('painelPagamentos').style.display = 'block'; mostrarCarregando(false); }, 50);
+  });
+  document.getElementById('btnFiltrarPagamentos').addEventListener('click', () => {
+    estado.ano = document.getElementById('ddlAnoPagamentos').value;
+    estado.mes = document.getElementById('ddlMesPagamentos').value;
+    estado.inicio = 0;
+    desenhar();
+  });
+  document.querySelector("select[name='dataTables-Pagamentos_length']").addEventListener('change', e => {
+    estado.tamanho = parseInt(e.target.value, 10);
+    estado.inicio = 0;
+    desenhar();
+  });
+  proximo.addEventListener('click', e => {
+    e.preventDefault();
+    if (proximo.classList.contains('disabled')) return;
+    estado.inicio += estado.tamanho;
+    desenhar();
+  });
+  anterior.addEventListener('click', e => {
+    e.preventDefault();
+    if (anterior.classList.contains('disabled')) return;
+    estado.inicio = Math.max(0, estado.inicio - estado.tamanho);
+    desenhar();
+  });
+  corpo.addEventListener('click', e => {
+    const controle = e.target.closest('td.details-control');
+    if (!controle) return;
+    const tr = controle.parentElement;
+    if (tr.classList.contains('shown')) {
+      tr.nextElementSibling.remove();
+      tr.classList.remove('shown');
+      return;
+    }
+    fetch(base + '/pagamentos/detalhe?id=' + encodeURIComponent(controle.dataset.id))
+      .then(r => { if (!r.ok) throw new Error('HTTP ' + r.status); return r.text(); })
+      .then(conteudo => {
+        if (tr.classList.contains('shown')) return;
+        const filha = document.createElement('tr');
+        const td = document.createElement('td');
+        td.colSpan = 11;
+        td.innerHTML = conteudo;
+        filha.appendChild(td);
+        tr.after(filha);
+        tr.classList.add('shown');  // Só depois que a linha filha existe, como no DataTables
+      })
+      .catch(() => {});
+  });
+})();
+</script>
+</body></html>
+"""
+
+def _pagina_municipioonline() -> str:
+    ano_atual = time.localtime().tm_year
+    opcoes_ano = "".join(f'<option value="{ano}">{ano}</option>' for ano in range(ano_atual, ano_atual - 8, -1))
+    opcoes_mes = "".join(f'<option value="{mes:02d}">{mes:02d}</option>' for mes in range(1, 13))
+    opcoes_tamanho = "".join(f'<option value="{t}">{"Todos" if t < 0 else t}</option>' for t in TAMANHOS_PAGINA)
+    return (PAGINA_MUNICIPIOONLINE.replace("__OPCOES_ANO__", opcoes_ano)
+            .replace("__OPCOES_MES__", opcoes_mes).replace("__OPCOES_TAMANHO__", opcoes_tamanho))
+
+def _linha_datatables(registro: dict) -> list:
+    return [f'<span data-id="{registro["id"]}"></span>'] + [
+        registro[coluna] for coluna in ("orgao", "unidade", "data", "empenho", "processo", "credor",
+                                        "cpf_cnpj", "pago", "retido", "anulacao")
+    ]
+
+def _detalhe_municipioonline(registro: dict) -> str:
+    pares = [("Fonte de Recurso:", registro["fonte"]), ("Histórico:", registro["historico"]),
+             ("Elemento de Despesa:", "3.3.90.39 - Outros Serviços de Terceiros - PJ"),
+             ("Modalidade de Licitação:", "Pregão Eletrônico")]
+    linhas = "".join(f"<tr><th>{html.escape(chave)}</th><td>{html.escape(valor)}</td></tr>" for chave, valor in pares)
+    return f'<div class="table-responsive"><table class="table"><tbody>{linhas}</tbody></table></div>'
+
+
+# --- Pacatuba ---
+
+def _url_listagem_pacatuba(parametros: dict, pagina: int) -> str:
+    return f"{CAMINHO_PACATUBA}?{urlencode({**parametros, 'pagina': pagina})}"
+
+def _dropdown_select2(nome: str, valores: list, selecionado: str) -> str:
+    opcoes = "".join(f'<option value="{v}"{" selected" if v == selecionado else ""}>{v}</option>' for v in valores)
+    itens = "".join(f'<li class="select2-results__option" data-valor="{v}">{v}</li>' for v in valores)
+    return (
+        f'<select id="{nome}" name="{nome}" style="display:none">{opcoes}</select>'
+        f'<span class="select2 select2-container"><span class="select2-selection" role="combobox" '
+        f'aria-labelledby="select2-{nome}-container" data-alvo="{nome}">'
+        f'<span id="select2-{nome}-container" class="select2-selection__rendered">{selecionado}</span></span></span>'
+        f'<ul class="select2-results__options" data-alvo="{nome}" style="display:none">{itens}</ul>'
+    )
+
+SCRIPT_PACATUBA = r"""
+<script>
+document.querySelectorAll('.select2-selection').forEach(gatilho => gatilho.addEventListener('click', () => {
+  document.querySelectorAll('.select2-results__options').forEach(lista => {
+    lista.style.display = (lista.dataset.alvo === gatilho.dataset.alvo && lista.style.display === 'none') ? 'block' : 'none';
+  });
+}));
+document.querySelectorAll('.select2-results__option').forEach(opcao => opcao.addEventListener('click', () => {
+  const alvo = opcao.parentElement.dataset.alvo;
+  document.getElementById(alvo).value = opcao.dataset.valor;
+  document.getElementById('select2-' + alvo + '-container').textContent = opcao.dataset.valor;
+  opcao.parentElement.style.display = 'none';
+}));
+const rejeitar = document.getElementById('rejectCookie');
+if (rejeitar) rejeitar.addEventListener('click', () => {
+  document.cookie = 'cookieConsent=rejeitado; path=/';
+  document.getElementById('bannerCookies').style.display = 'none';
+});
+</script>
+"""
+
+def _pagina_pacatuba(dados: DadosFalsos, parametros: dict, mostrar_banner: bool, linhas_por_pagina: int,
+                     contadores: Contadores) -> str:
+    ano_atual = time.localtime().tm_year
+    ano = parametros.get("ano") or str(ano_atual)
+    mes = parametros.get("mes") or "01"
+    filtro = parametros.get("filtro", "1")
+
+    filtros = (
+        '<form id="formFiltro" method="get" action="' + CAMINHO_PACATUBA + '">'
+        '<input type="hidden" name="pagina" value="1">'
+        f'<label><input type="radio" id="filtro_1" name="filtro" value="1"{" checked" if filtro != "2" else ""}> Ano</label>'
+        f'<label><input type="radio" id="filtro_2" name="filtro" value="2"{" checked" if filtro == "2" else ""}> Mês</label>'
+        + _dropdown_select2("ano", [str(a) for a in range(ano_atual, ano_atual - 8, -1)], ano)
+        + _dropdown_select2("mes", [f"{m:02d}" for m in range(1, 13)], mes)
+        + '<button type="submit" id="filtrar" class="btn btn-buscar">Buscar</button></form>'
+    )
+
+    tabela = ""
+    if "ano" in parametros:
+        registros = dados.pagamentos("pacatuba", ano, mes) if filtro == "2" else dados.pagamentos_do_ano("pacatuba", ano)
+        total_paginas = max(1, math.ceil(len(registros) / linhas_por_pagina))
+        pagina = max(1, int(parametros.get("pagina", "1") or 1))
+        da_pagina = registros[(pagina - 1) * linhas_por_pagina:pagina * linhas_por_pagina]
+        contadores.somar("paginas")
+        contadores.somar("linhas_listadas", len(da_pagina))
+
+        if da_pagina:
+            linhas = "".join(
+                f'<tr><td>{r["data"]}</td><td>{r["empenho"]}</td><td>{html.escape(r["credor"])}</td><td>{r["pago"]}</td>'
+                f'<td serigyitem="detalhesPagamento"><a href="{CAMINHO_DETALHE_PACATUBA}?id={r["id"]}">Detalhes</a></td></tr>'
+                for r in da_pagina
+            )
+        else:
+            linhas = '<tr><td colspan="5">Nenhum registro encontrado.</td></tr>'
+        numeros = "".join(
+            f'<li class="page-item{" active" if n == pagina else ""}"><a class="page-link" href="{_url_listagem_pacatuba(parametros, n)}">{n}</a></li>'
+            for n in range(max(1, pagina - 2), min(total_paginas, pagina + 2) + 1)
+        )
+        anterior = "disabled" if pagina <= 1 else ""
+        proxima = "disabled" if pagina >= total_paginas else ""
+        tabela = (
+            '<table id="lista" class="table"><thead><tr><th>Data</th><th>Empenho</th><th>Credor</th><th>Valor</th><th></th></tr></thead>'
+            f'<tbody>{linhas}</tbody></table>'
+            '<ul class="pagination">'
+            f'<li class="page-item {anterior}" id="lista_previous"><a class="page-link" href="{_url_listagem_pacatuba(parametros, pagina - 1)}"><i class="fa fa-angle-left prev"></i></a></li>'
+            f'{numeros}'
+            f'<li class="page-item {proxima}" id="lista_next"><a class="page-link" href="{_url_listagem_pacatuba(parametros, pagina + 1)}"><i class="fa fa-angle-right next"></i></a></li>'
+            '</ul>'
+        )
+
+    banner = (
+        '<div id="bannerCookies" style="position:fixed;bottom:0;left:0;right:0;background:#eee;padding:8px">'
+        'Este site usa cookies. <button id="rejectCookie" type="button">Rejeitar</button></div>'
+    ) if mostrar_banner else ""
+    return (
+        '<!DOCTYPE html><html lang="pt-br"><head><meta charset="utf-8"><title>Portal da Transparência - Despesas</title></head>'
+        f'<body>{filtros}{tabela}{banner}{SCRIPT_PACATUBA}</body></html>'
+    )
+
+def _detalhe_pacatuba(registro: dict) -> str:
+    return (
+        '<!DOCTYPE html><html lang="pt-br"><head><meta charset="utf-8"><title>Detalhes do Pagamento</title></head><body>'
+        '<table id="table-dados" class="table"><tbody>'
+        '<tr><th>Empenho</th><th>Credor</th><th>Data da Nota</th></tr>'
+        f'<tr><td>{registro["empenho"]}</td><td>{html.escape(registro["credor"])} - {registro["cpf_cnpj"]}</td><td>{registro["data"]}</td></tr>'
+        '<tr><td>Processo</td><td>Fonte de Recurso</td><td>Número do Documento</td></tr>'
+        f'<tr><th>{registro["processo"]}</th><th>{html.escape(registro["fonte"])}</th><th>{registro["id"]}</th></tr>'
+        '<tr><th>Valor Pago</th><th>Valor Retido</th><th>Forma de Pagamento</th></tr>'
+        f'<tr><td>{registro["pago"]}</td><td>{registro["retido"]}</td><td>Transferência Bancária</td></tr>'
+        '</tbody></table>'
+        f'<table id="table-historico" class="table"><tbody><tr><td>{html.escape(registro["historico"])}</td></tr></tbody></table>'
+        '<table id="table-outras-informacoes" class="table"><tbody><tr><td>Não</td><td>Não</td></tr></tbody></table>'
+        '</body></html>'
+    )
+
+
+# --- Servidor ---
+
+def criar_handler(dados: DadosFalsos, contadores: Contadores, latencia: float, latencia_detalhe: float,
+                  taxa_falhas: float, linhas_por_pagina_pacatuba: int):
+    class HandlerPortalFalso(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, como nos portais reais
+
+        def _enviar(self, corpo: str, tipo: str = "text/html", status: int = 200):
+            conteudo = corpo.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", f"{tipo}; charset=utf-8")
+            self.send_header("Content-Length", str(len(conteudo)))
+            self.end_headers()
+            self.wfile.write(conteudo)
+
+        def _simular_servidor(self, espera: float) -> bool:
+            """Aplica a latência (±50%) e sorteia uma falha. Retorna False se a requisição deve falhar."""
+            if espera > 0:
+                time.sleep(random.uniform(0.5, 1.5) * espera)
+            if taxa_falhas and random.random() < taxa_falhas:
+                contadores.somar("falhas_injetadas")
+                self._enviar("<html><body><h1>500 - Erro interno</h1></body></html>", status=500)
+                return False
+            return True
+
+        def _parametros(self) -> tuple[str, dict]:
+            partes = urlsplit(self.path)
+            parametros = dict(parse_qsl(partes.query))
+            if self.command == "POST":
+                tamanho = int(self.headers.get("Content-Length", 0))
+                parametros.update(parse_qsl(self.rfile.read(tamanho).decode("utf-8")))
+            return partes.path.rstrip("/"), parametros
+
+        def do_GET(self):
+            caminho, parametros = self._parametros()
+            if caminho == CAMINHO_MUNICIPIOONLINE:
+                self._enviar(_pagina_municipioonline())
+            elif caminho == f"{CAMINHO_MUNICIPIOONLINE}/pagamentos/detalhe":
+                registro = dados.por_id("municipioonline", parametros.get("id", ""))
+                if registro is None:
+                    self.send_error(404)
+                elif self._simular_servidor(latencia_detalhe):
+                    contadores.somar("detalhes")
+                    self._enviar(_detalhe_municipioonline(registro))
+            elif caminho == CAMINHO_PACATUBA:
+                if "ano" in parametros and not self._simular_servidor(latencia):
+                    return
+                mostrar_banner = "cookieConsent=" not in self.headers.get("Cookie", "")
+                self._enviar(_pagina_pacatuba(dados, parametros, mostrar_banner, linhas_por_pagina_pacatuba, contadores))
+            elif caminho == CAMINHO_DETALHE_PACATUBA:
+                registro = dados.por_id("pacatuba", parametros.get("id", ""))
+                if registro is None:
+                    self.send_error(404)
+                elif self._simular_servidor(latencia_detalhe):
+                    contadores.somar("detalhes")
+                    self._enviar(_detalhe_pacatuba(registro))
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            caminho, parametros = self._parametros()
+            if caminho != f"{CAMINHO_MUNICIPIOONLINE}/pagamentos":
+                self.send_error(404)
+                return
+            if not self._simular_servidor(latencia):
+                return
+            ano, mes = parametros.get("ano", ""), parametros.get("mes", "")
+            registros = dados.pagamentos("municipioonline", ano, mes) if ano.isdigit() and mes.isdigit() else ()
+            inicio, tamanho = int(parametros.get("start", 0)), int(parametros.get("length", 10))
+            da_pagina = registros[inicio:] if tamanho < 0 else registros[inicio:inicio + tamanho]
+            contadores.somar("paginas")
+            contadores.somar("linhas_listadas", len(da_pagina))
+            self._enviar(json.dumps({
+                "draw": int(parametros.get("draw", 1)),
+                "recordsTotal": len(registros),
+                "recordsFiltered": len(registros),
+                "data": [_linha_datatables(registro) for registro in da_pagina],
+            }, ensure_ascii=False), tipo="application/json")
+
+        def log_message(self, format, *args):
+            pass  # Mantém o console limpo durante os testes
+
+    return HandlerPortalFalso
+
+def criar_servidor(porta: int = 8766, linhas: int = 200, latencia: float = 0.0, latencia_detalhe: float = 0.0,
+                   taxa_falhas: float = 0.0, proporcao_royalties: float = 0.2, linhas_por_pagina_pacatuba: int = 10,
+                   semente: int = 0) -> ThreadingHTTPServer:
+    """Cria o servidor (ainda parado). Os contadores de requisições ficam em 'servidor.contadores'."""
+    dados = DadosFalsos(linhas, proporcao_royalties, semente)
+    contadores = Contadores()
+    handler = criar_handler(dados, contadores, latencia, latencia_detalhe, taxa_falhas, linhas_por_pagina_pacatuba)
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), handler)
+    servidor.daemon_threads = True
+    servidor.contadores = contadores
+    return servidor
+
+def iniciar_em_segundo_plano(**parametros) -> tuple[ThreadingHTTPServer, str]:
+    """Sobe o servidor em uma thread daemon e retorna (servidor, url_base). Use porta=0 para uma porta livre."""
+    servidor = criar_servidor(**parametros)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal local que imita os portais municipioonline e de Pacatuba.")
+    parser.add_argument("--porta", type=int, default=8766)
+    parser.add_argument("--linhas", type=int, default=200, help="Pagamentos por mês, em cada portal.")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latência (s) das páginas da listagem.")
+    parser.add_argument("--latencia-detalhe", type=float, default=0.0, help="Latência (s) de cada detalhe.")
+    parser.add_argument("--taxa-falhas", type=float, default=0.0, help="Fração das requisições que respondem HTTP 500.")
+    parser.add_argument("--proporcao-royalties", type=float, default=0.2)
+    parser.add_argument("--linhas-por-pagina-pacatuba", type=int, default=10)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    servidor = criar_servidor(args.porta, args.linhas, args.latencia, args.latencia_detalhe, args.taxa_falhas,
+                              args.proporcao_royalties, args.linhas_por_pagina_pacatuba, args.semente)
+    print(f"Portal falso em http://127.0.0.1:{args.porta}{CAMINHO_MUNICIPIOONLINE} e http://127.0.0.1:{args.porta}{CAMINHO_PACATUBA}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# tools/servidor_respostas_gravadas.py
+
+"""
+Servidor HTTP local que devolve respostas gravadas dos portais.
+
+Serve para testar o motor HTTP (src/scrapers/municipioonline_http.py) sem
+acessar as prefeituras. O repositório não traz gravações: grave as respostas
+reais do portal (aba Rede do navegador, exportando o corpo de cada requisição)
+para validar o motor, que até lá é experimental. As gravações ficam em uma
+pasta com um 'indice.json':
+
+    [
+      {"metodo": "GET",  "caminho": "/despesa", "arquivo": "despesa.html"},
+      {"metodo": "POST", "caminho": "/despesa/pagamentos",
+       "parametros": {"ano": "2025", "mes": "01", "start": "0"},
+       "arquivo": "pagamentos_2025_01_p0.json"},
+      {"metodo": "GET",  "caminho": "/despesa/pagamentos/detalhe",
+       "parametros": {"id": "123"}, "arquivo": "detalhe_123.html"}
+    ]
+
+A primeira entrada cujo método, caminho e parâmetros (subconjunto da
+query string + corpo do formulário) coincidirem com a requisição é servida.
+
+Uso:
+    python tools/servidor_respostas_gravadas.py caminho/das/gravacoes --porta 8765
+
+e, no config.json, aponte a "url" da cidade para http://127.0.0.1:8765/despesa.
+"""
+
+import argparse
+import json
+import mimetypes
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+def carregar_indice(pasta: str) -> list:
+    with open(os.path.join(pasta, "indice.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def criar_handler(pasta: str, indice: list):
+    class HandlerGravacoes(BaseHTTPRequestHandler):
+        def _responder(self, metodo: str):
+            partes = urlsplit(self.path)
+            parametros = dict(parse_qsl(partes.query))
+            if metodo == "POST":
+                tamanho = int(self.headers.get("Content-Length", 0))
+                parametros.update(parse_qsl(self.rfile.read(tamanho).decode("utf-8")))
+
+            for entrada in indice:
+                if entrada["metodo"] != metodo or entrada["caminho"] != partes.path:
+                    continue
+                if all(parametros.get(k) == str(v) for k, v in entrada.get("parametros", {}).items()):
+                    caminho_arquivo = os.path.join(pasta, entrada["arquivo"])
+                    with open(caminho_arquivo, "rb") as f:
+                        corpo = f.read()
+                    tipo = entrada.get("content_type") or mimetypes.guess_type(caminho_arquivo)[0] or "text/html"
+                    self.send_response(entrada.get("status", 200))
+                    self.send_header("Content-Type", f"{tipo}; charset=utf-8")
+                    self.send_header("Content-Length", str(len(corpo)))
+                    self.end_headers()
+                    self.wfile.write(corpo)
+                    return
+
+            self.send_error(404, f"Nenhuma gravação para {metodo} {self.path}")
+
+        def do_GET(self):
+            self._responder("GET")
+
+        def do_POST(self):
+            self._responder("POST")
+
+        def log_message(self, format, *args):
+            pass  # Mantém o console limpo durante os testes
+
+    return HandlerGravacoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de respostas gravadas dos portais.")
+    parser.add_argument("pasta", help="Pasta com o indice.json e os arquivos gravados.")
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.porta), criar_handler(args.pasta, carregar_indice(args.pasta)))
+    print(f"Servindo gravações de '{args.pasta}' em http://127.0.0.1:{args.porta}")
+    servidor.serve_forever()
+
+if __name__ == "__main__":
+    main()